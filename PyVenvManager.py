@@ -1,833 +1,6837 @@
 import os
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, colorchooser, simpledialog
+from tkinter import font as tkfont
 import subprocess
 import sys
 import json
+import bisect
+import collections
 import shutil
+import stat
+import fnmatch
+import re
+import shlex
+import hashlib
+import functools
+import base64
+import csv
+import errno
+import argparse
 from pathlib import Path
 import threading
 import time
+import ctypes
+import ctypes.util
+import concurrent.futures
+import select
+import struct
+import signal
+import platform
+import urllib.request
+import urllib.parse
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11: JSON manifests only
+    tomllib = None
+
+
+def read_pyvenv_cfg(env_path):
+    """Parse an environment's pyvenv.cfg into a dict (empty if missing)"""
+    cfg = {}
+    try:
+        with open(os.path.join(env_path, "pyvenv.cfg"), 'r', encoding="utf-8") as f:
+            for line in f:
+                key, sep, value = line.partition("=")
+                if sep:
+                    cfg[key.strip().lower()] = value.strip()
+    except OSError:
+        pass
+    return cfg
+
+
+def env_scripts_dir(env_path):
+    """Return the bin (POSIX) or Scripts (Windows) folder of an environment"""
+    return os.path.join(env_path, "Scripts" if os.name == "nt" else "bin")
+
+
+def activated_environ(env_path, environ=None):
+    """Return the environment variables the activate script would set, without running a shell
+
+    Sets VIRTUAL_ENV and VIRTUAL_ENV_PROMPT, puts the scripts folder first
+    on PATH and removes PYTHONHOME, which would point the interpreter at a
+    different standard library.
+    """
+    env = dict(os.environ if environ is None else environ)
+    env.pop("PYTHONHOME", None)
+    env["VIRTUAL_ENV"] = env_path
+    env["VIRTUAL_ENV_PROMPT"] = read_pyvenv_cfg(env_path).get("prompt", "").strip("'\"") or os.path.basename(env_path)
+    env["PATH"] = env_scripts_dir(env_path) + (os.pathsep + env["PATH"] if env.get("PATH") else "")
+    return env
+
+
+def version_tuple(version):
+    """Return the leading numeric release of a version string as a tuple, e.g. (22, 2)"""
+    match = re.match(r"(\d+(?:\.\d+)*)", version or "")
+    return tuple(int(part) for part in match.group(1).split(".")) if match else ()
+
+
+def env_site_packages(env_path):
+    """Return the site-packages folders of an environment"""
+    if os.name == "nt":
+        candidates = [os.path.join(env_path, "Lib", "site-packages")]
+    else:
+        # pyvenv.cfg names the interpreter version, which gives the folder directly
+        cfg = read_pyvenv_cfg(env_path)
+        version = version_tuple(cfg.get("version_info") or cfg.get("version", ""))
+        if len(version) >= 2:
+            site_packages = os.path.join(env_path, "lib", f"python{version[0]}.{version[1]}", "site-packages")
+            if os.path.isdir(site_packages):
+                return [site_packages]
+        candidates = []
+        for lib in ("lib", "lib64"):
+            try:
+                candidates += [os.path.join(env_path, lib, d, "site-packages")
+                               for d in sorted(os.listdir(os.path.join(env_path, lib))) if d.startswith("python")]
+            except OSError:
+                pass
+    # lib64 is often a symlink to lib
+    found, seen = [], set()
+    for path in candidates:
+        real = os.path.realpath(path)
+        if real not in seen and os.path.isdir(path):
+            seen.add(real)
+            found.append(path)
+    return found
+
+
+def detect_env_origin(env_path):
+    """Return the absolute path an environment was created at, as baked into its scripts"""
+    scripts_dir = env_scripts_dir(env_path)
+    # Python 3.13 indents the assignment and exports it; a $(cygpath ...) value is skipped
+    for script, pattern in (("activate", r'^[ \t]*(?:export[ \t]+)?VIRTUAL_ENV=["\']?([^"\'$\n][^"\'\n]*)'),
+                            ("activate.bat", r'^[ \t]*set "?VIRTUAL_ENV=([^"\r\n]+)')):
+        try:
+            with open(os.path.join(scripts_dir, script), 'r', encoding="utf-8", errors="replace") as f:
+                match = re.search(pattern, f.read(), re.MULTILINE)
+            if match:
+                return match.group(1).strip()
+        except OSError:
+            continue
+    # Fall back to the target of "python -m venv <path>" recorded in pyvenv.cfg.
+    # venv writes the path unquoted after its options, so it may contain spaces
+    command = read_pyvenv_cfg(env_path).get("command", "")
+    match = re.search(r'\s-m\s+venv(?:\s+--[\w-]+(?:="[^"]*")?)*\s+(.+)$', command)
+    if match:
+        return match.group(1).strip().strip('"\'')
+    try:
+        parts = shlex.split(command, posix=os.name != "nt")
+    except ValueError:
+        parts = command.split()
+    return parts[-1].strip('"') if parts else None
+
+
+def relocate_env(env_path, old_path=None):
+    """Rewrite absolute references to old_path inside an environment to env_path
+
+    Patches pyvenv.cfg, the activate scripts and the shebangs of console
+    scripts. Binary files are skipped after reading their first kilobyte and
+    only text files that mention the old location are rewritten. Returns the
+    number of files patched.
+    """
+    if old_path is None:
+        old_path = detect_env_origin(env_path)
+    if not old_path or os.path.normcase(old_path) == os.path.normcase(env_path):
+        return 0
+
+    old_b, new_b = os.fsencode(old_path), os.fsencode(env_path)
+    # Only match the old path as a whole path component, not as a prefix of a sibling
+    pattern = re.compile(re.escape(old_b) + rb'(?=[/\\"\'\s:;]|$)', re.MULTILINE)
+
+    old_prompt = b"(" + os.fsencode(os.path.basename(old_path.rstrip("/\\"))) + b") "
+    new_prompt = b"(" + os.fsencode(os.path.basename(env_path.rstrip("/\\"))) + b") "
+
+    scripts_dir = env_scripts_dir(env_path)
+    candidates = [os.path.join(env_path, "pyvenv.cfg")]
+    try:
+        with os.scandir(scripts_dir) as it:
+            candidates.extend(e.path for e in it if e.is_file(follow_symlinks=False))
+    except OSError:
+        pass
+
+    patched = 0
+    for path in candidates:
+        try:
+            with open(path, 'rb') as f:
+                # Skip binaries such as copied interpreters and .exe launchers
+                head = f.read(1024)
+                if b"\0" in head:
+                    continue
+                data = head + f.read()
+            if old_b not in data and old_prompt not in data:
+                continue
+            new_data = pattern.sub(lambda m: new_b, data)
+            if os.path.basename(path).lower().startswith("activate"):
+                # The default prompt is the environment's folder name
+                new_data = new_data.replace(old_prompt, new_prompt)
+            if new_data == data:
+                continue
+            mode = os.stat(path).st_mode
+            tmp_path = path + ".relocate"
+            with open(tmp_path, 'wb') as f:
+                f.write(new_data)
+            os.chmod(tmp_path, stat.S_IMODE(mode))
+            os.replace(tmp_path, path)
+            patched += 1
+        except OSError as e:
+            print(f"Could not relocate {path}: {e}")
+    return patched
+
+
+# Top-level names that make up a venv itself; anything else in an environment folder is the user's
+VENV_LAYOUT = frozenset(("bin", "Scripts", "lib", "lib64", "Lib", "include", "Include", "share", "pyvenv.cfg"))
+
+
+def exchange_dirs(path_a, path_b):
+    """Swap two directories on the same filesystem
+
+    Uses renameat2(RENAME_EXCHANGE) on Linux, which swaps both names in one
+    atomic step; elsewhere (or on filesystems without support) three renames
+    are used, undone if the second one fails. Returns True if the swap was atomic.
+    """
+    if sys.platform.startswith("linux"):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            renameat2 = libc.renameat2
+        except (OSError, AttributeError):
+            renameat2 = None  # glibc older than 2.28
+        if renameat2 is not None:
+            at_fdcwd, rename_exchange = -100, 2
+            if renameat2(at_fdcwd, os.fsencode(path_a), at_fdcwd, os.fsencode(path_b), rename_exchange) == 0:
+                return True
+            error = ctypes.get_errno()
+            if error not in (errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP):
+                raise OSError(error, os.strerror(error), path_a)
+    parked = f"{path_a}.swap-{time.time_ns()}"
+    os.rename(path_a, parked)
+    try:
+        os.rename(path_b, path_a)
+    except OSError:
+        os.rename(parked, path_a)
+        raise
+    os.rename(parked, path_b)
+    return False
+
+
+def read_env_settings(env_path):
+    """Return the manager's per-environment settings (.env_settings/settings.json)"""
+    try:
+        with open(os.path.join(env_path, ".env_settings", "settings.json"), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def update_env_settings(env_path, **values):
+    """Merge values into an environment's .env_settings/settings.json"""
+    settings = read_env_settings(env_path)
+    settings.update(values)
+    settings_dir = os.path.join(env_path, ".env_settings")
+    os.makedirs(settings_dir, exist_ok=True)
+    with open(os.path.join(settings_dir, "settings.json"), 'w') as f:
+        json.dump(settings, f, indent=2)
+
+
+def env_spec(python_path, system_site=False, no_pip=False, packages=()):
+    """Return the normalized creation spec recorded in .env_settings and compared by manifests"""
+    if isinstance(packages, str):
+        packages = packages.split()
+    return {
+        "python": os.path.realpath(python_path) if python_path else "",
+        "system_site": bool(system_site),
+        "no_pip": bool(no_pip),
+        "packages": sorted(p.strip() for p in packages if p.strip())
+    }
+
+
+def template_mismatches(template_path, python_path, system_site=False, no_pip=False):
+    """Return the creation options a template environment does not satisfy (empty if it does)
+
+    A clone keeps the template's interpreter, system site-packages setting
+    and pip, so options that differ from the template would be ignored.
+    """
+    cfg = read_pyvenv_cfg(template_path)
+    mismatches = []
+    base = cfg.get("executable") or os.path.realpath(
+        os.path.join(env_scripts_dir(template_path), "python.exe" if os.name == "nt" else "python"))
+    if python_path and os.path.realpath(python_path) != os.path.realpath(base):
+        version = cfg.get("version") or cfg.get("version_info") or "unknown version"
+        mismatches.append(f"Python: the template uses {base} ({version}), not {python_path}")
+    template_site = cfg.get("include-system-site-packages", "false").lower() == "true"
+    if bool(system_site) != template_site:
+        mismatches.append("System site-packages: the template has them "
+                          + ("enabled" if template_site else "disabled"))
+    has_pip = any(os.path.isdir(os.path.join(site, "pip")) for site in env_site_packages(template_path))
+    if bool(no_pip) == has_pip:
+        mismatches.append("pip: the template " + ("has pip installed" if has_pip else "was created without pip"))
+    return mismatches
+
+
+def load_env_manifest(path):
+    """Read a TOML or JSON manifest of environments to create
+
+    Returns (entries, parallelism) where each entry has name, python,
+    system_site, no_pip and packages. Raises ValueError for bad manifests.
+    """
+    if path.lower().endswith(".toml"):
+        if tomllib is None:
+            raise ValueError("TOML manifests need Python 3.11 or newer; use JSON instead")
+        with open(path, 'rb') as f:
+            data = tomllib.load(f)
+    else:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    if isinstance(data, list):
+        data = {"environments": data}
+    entries, seen = [], set()
+    for item in data.get("environments", []):
+        name = str(item.get("name", "")).strip()
+        if not name or os.sep in name or (os.altsep and os.altsep in name):
+            raise ValueError(f"Invalid environment name in manifest: {name!r}")
+        if name in seen:
+            raise ValueError(f"Environment '{name}' is listed twice in the manifest")
+        seen.add(name)
+        packages = item.get("packages", [])
+        if isinstance(packages, str):
+            packages = packages.split()
+        entries.append({
+            "name": name,
+            "python": item.get("python") or item.get("interpreter") or "",
+            "system_site": bool(item.get("system_site", False)),
+            "no_pip": bool(item.get("no_pip", False)),
+            "packages": [str(p) for p in packages]
+        })
+    if not entries:
+        raise ValueError("The manifest lists no environments")
+    parallelism = data.get("parallelism")
+    return entries, int(parallelism) if parallelism else None
+
+
+def format_size(num_bytes):
+    """Format a byte count for display, e.g. 1.5 GB"""
+    size = float(num_bytes)
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def format_duration(seconds):
+    """Format a duration in seconds as e.g. 1:05 or 2:03:15"""
+    seconds = int(max(0, seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def in_site_packages(rel_path):
+    """Return True if a path inside an environment lies under site-packages"""
+    return "site-packages" in Path(rel_path).parts
+
+
+class CopyCancelled(Exception):
+    """Raised by TreeCopier.run() when the copy was cancelled"""
+
+
+class TreeCopier:
+    """Copy a directory tree with a bounded thread pool and live progress
+
+    plan() walks the source first to total up files and bytes. run() then
+    creates the directories and symlinks and copies regular files in
+    parallel, using copy_file_range or sendfile where the platform has them.
+    Progress counters can be read at any time with snapshot(), and cancel()
+    stops the copy between chunks.
+
+    Files for which link(rel_path) returns True are reflinked where the
+    filesystem supports it and hardlinked otherwise, falling back to a copy
+    across devices. Top-level names in exclude are skipped.
+
+    Linking relies on one invariant: pip never edits an installed file in
+    place, it writes a new file and renames it over the old one (and removes
+    files by unlinking them). A hardlinked copy therefore keeps the old
+    contents when either side is upgraded or uninstalled. Only link files
+    that are managed this way, as site-packages files are.
+    """
+
+    CHUNK = 8 * 1024 * 1024
+    FICLONE = 0x40049409
+
+    def __init__(self, src, dst, workers=8, link=None, exclude=()):
+        self.src = src
+        self.dst = dst
+        self.workers = workers
+        self.link = link
+        self.exclude = set(exclude)
+        self.reflink_ok = fcntl is not None and sys.platform.startswith("linux")
+        self.linked_files = 0
+        self.dirs = []
+        self.files = []
+        self.symlinks = []
+        self.total_bytes = 0
+        self.copied_bytes = 0
+        self.copied_files = 0
+        self.planned = False
+        self.finished = False
+        self.started = None
+        self.lock = threading.Lock()
+        self.cancel_event = threading.Event()
+        self.samples = collections.deque(maxlen=20)
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def plan(self):
+        """Walk the source tree and total up the files and bytes to copy"""
+        stack = [""]
+        while stack:
+            rel_dir = stack.pop()
+            self.dirs.append(rel_dir)
+            with os.scandir(os.path.join(self.src, rel_dir)) as it:
+                for entry in it:
+                    if self.cancel_event.is_set():
+                        raise CopyCancelled()
+                    if not rel_dir and entry.name in self.exclude:
+                        continue
+                    rel_path = os.path.join(rel_dir, entry.name)
+                    if entry.is_symlink():
+                        self.symlinks.append(rel_path)
+                    elif entry.is_dir():
+                        stack.append(rel_path)
+                    else:
+                        size = entry.stat().st_size
+                        self.files.append((rel_path, size))
+                        self.total_bytes += size
+        # Copy large files first so one big file doesn't trail at the end
+        self.files.sort(key=lambda f: f[1], reverse=True)
+        self.planned = True
+
+    def run(self):
+        """Copy the planned tree; raises CopyCancelled if cancel() was called"""
+        if not self.planned:
+            self.plan()
+        self.started = time.monotonic()
+        for rel_dir in self.dirs:
+            os.makedirs(os.path.join(self.dst, rel_dir), exist_ok=True)
+        for rel_path in self.symlinks:
+            os.symlink(os.readlink(os.path.join(self.src, rel_path)), os.path.join(self.dst, rel_path))
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(self._copy_file, rel_path) for rel_path, _size in self.files]
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    future.result()
+            except BaseException:
+                self.cancel_event.set()
+                raise
+
+        # Directory times last, since creating files inside them changes their mtime
+        for rel_dir in reversed(self.dirs):
+            try:
+                shutil.copystat(os.path.join(self.src, rel_dir), os.path.join(self.dst, rel_dir))
+            except OSError:
+                pass
+
+    def _link_file(self, src_path, dst_path):
+        """Reflink or hardlink src_path to dst_path; False if a real copy is needed"""
+        if self.reflink_ok:
+            try:
+                with open(src_path, 'rb') as fsrc, open(dst_path, 'wb') as fdst:
+                    fcntl.ioctl(fdst.fileno(), self.FICLONE, fsrc.fileno())
+                shutil.copystat(src_path, dst_path)
+                return True
+            except OSError:
+                # No copy-on-write support here; use hardlinks for the rest
+                self.reflink_ok = False
+                try:
+                    os.remove(dst_path)
+                except OSError:
+                    pass
+        try:
+            os.link(src_path, dst_path)
+            return True
+        except OSError:
+            return False
+
+    def _copy_file(self, rel_path):
+        if self.cancel_event.is_set():
+            raise CopyCancelled()
+        src_path = os.path.join(self.src, rel_path)
+        dst_path = os.path.join(self.dst, rel_path)
+        if self.link is not None and self.link(rel_path) and self._link_file(src_path, dst_path):
+            with self.lock:
+                self.copied_bytes += os.path.getsize(src_path)
+                self.copied_files += 1
+                self.linked_files += 1
+            return
+        with open(src_path, 'rb') as fsrc, open(dst_path, 'wb') as fdst:
+            copy_chunk = self._fast_copier(fsrc, fdst)
+            while True:
+                if self.cancel_event.is_set():
+                    raise CopyCancelled()
+                n = copy_chunk()
+                if not n:
+                    break
+                with self.lock:
+                    self.copied_bytes += n
+        shutil.copystat(src_path, dst_path)
+        with self.lock:
+            self.copied_files += 1
+
+    def _fast_copier(self, fsrc, fdst):
+        """Return a function copying the next chunk from fsrc to fdst and returning its size"""
+        in_fd, out_fd = fsrc.fileno(), fdst.fileno()
+        state = {"native": hasattr(os, "copy_file_range")
+                 or (hasattr(os, "sendfile") and sys.platform.startswith("linux"))}
+
+        def copy_chunk():
+            if state["native"]:
+                try:
+                    if hasattr(os, "copy_file_range"):
+                        return os.copy_file_range(in_fd, out_fd, self.CHUNK)
+                    return os.sendfile(out_fd, in_fd, None, self.CHUNK)
+                except OSError:
+                    # Unsupported by this filesystem pair; use plain reads from here on
+                    state["native"] = False
+            data = os.read(in_fd, self.CHUNK)
+            view = memoryview(data)
+            while view:
+                view = view[os.write(out_fd, view):]
+            return len(data)
+        return copy_chunk
+
+    def snapshot(self):
+        """Return current progress: bytes, files, rate in bytes/sec and ETA in seconds"""
+        with self.lock:
+            copied_bytes, copied_files = self.copied_bytes, self.copied_files
+        now = time.monotonic()
+        self.samples.append((now, copied_bytes))
+        rate = 0.0
+        first_time, first_bytes = self.samples[0]
+        if now > first_time:
+            rate = (copied_bytes - first_bytes) / (now - first_time)
+        remaining = self.total_bytes - copied_bytes
+        return {
+            "planned": self.planned,
+            "copied_bytes": copied_bytes,
+            "total_bytes": self.total_bytes,
+            "copied_files": copied_files,
+            "total_files": len(self.files),
+            "rate": rate,
+            "eta": remaining / rate if rate > 0 else None,
+        }
+
+
+class TrashReaper:
+    """Instant deletes by renaming into a hidden trash folder, reclaimed in the background
+
+    move_to_trash() renames a directory into a ".pyenvmanager-trash" folder on
+    the same filesystem (inside venv_dir for managed environments, next to the
+    directory otherwise) and returns immediately. A low-priority daemon thread
+    removes trash contents in parallel. Trash folders are recorded in a small
+    registry file so reclamation resumes after a crash or restart. Entries
+    that can't be removed yet (files in use, permissions) are retried with
+    exponential backoff, from RETRY_DELAY up to RETRY_MAX seconds apart.
+    """
+
+    TRASH_NAME = ".pyenvmanager-trash"
+    WORKERS = 4
+    RETRY_DELAY = 30
+    RETRY_MAX = 3600
+
+    def __init__(self, registry_file):
+        self.registry_file = registry_file
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.trash_dirs = []
+        self.failed = {}  # path -> (failed attempts, monotonic time of the next attempt)
+        try:
+            if os.path.exists(registry_file):
+                with open(registry_file, 'r') as f:
+                    self.trash_dirs = json.load(f)
+        except Exception as e:
+            print(f"Error loading trash registry: {e}")
+        self.thread = threading.Thread(target=self._reap_loop, daemon=True)
+        self.thread.start()
+        if self.trash_dirs:
+            self.wakeup.set()
+
+    def _save_registry(self):
+        try:
+            with open(self.registry_file, 'w') as f:
+                json.dump(self.trash_dirs, f)
+        except Exception as e:
+            print(f"Error saving trash registry: {e}")
+
+    def trash_dir_for(self, path, preferred_root=None):
+        """Pick a trash folder on the same filesystem as path"""
+        if preferred_root:
+            try:
+                if os.stat(preferred_root).st_dev == os.stat(path).st_dev:
+                    return os.path.join(preferred_root, self.TRASH_NAME)
+            except OSError:
+                pass
+        return os.path.join(os.path.dirname(os.path.abspath(path)), self.TRASH_NAME)
+
+    def move_to_trash(self, path, preferred_root=None):
+        """Atomically move path out of the way; its contents are deleted later"""
+        path = os.path.abspath(path)
+        trash_dir = self.trash_dir_for(path, preferred_root)
+        target = os.path.join(trash_dir, f"{os.path.basename(path)}-{time.time_ns()}")
+        for attempt in range(3):
+            os.makedirs(trash_dir, exist_ok=True)
+            try:
+                os.rename(path, target)
+                break
+            except FileNotFoundError:
+                # The reaper removed the empty trash folder in between; recreate it
+                if attempt == 2 or not os.path.lexists(path):
+                    raise
+        with self.lock:
+            if trash_dir not in self.trash_dirs:
+                self.trash_dirs.append(trash_dir)
+                self._save_registry()
+        self.wakeup.set()
+        return target
+
+    def pending(self):
+        """Return True while trash folders still hold entries to reclaim"""
+        with self.lock:
+            return bool(self.trash_dirs)
+
+    def _lower_priority(self):
+        # Linux applies nice values per thread and new threads inherit them;
+        # the default I/O priority follows the CPU nice value as well
+        if sys.platform.startswith("linux"):
+            try:
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+            except (AttributeError, OSError):
+                pass
+
+    def _reap_loop(self):
+        self._lower_priority()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            while True:
+                # Sleep until something is trashed or the next failed entry is due
+                self.failed = {path: state for path, state in self.failed.items() if os.path.lexists(path)}
+                retry_at = min((at for _, at in self.failed.values()), default=None)
+                self.wakeup.wait(None if retry_at is None else max(0, retry_at - time.monotonic()))
+                self.wakeup.clear()
+                with self.lock:
+                    trash_dirs = list(self.trash_dirs)
+                for trash_dir in trash_dirs:
+                    try:
+                        self._reap(trash_dir, pool)
+                    except Exception as e:
+                        print(f"Error emptying {trash_dir}: {e}")
+
+    def _waiting(self, path, now):
+        """Return True if path failed to be removed and is not due for another attempt yet"""
+        return path in self.failed and self.failed[path][1] > now
+
+    def _reap(self, trash_dir, pool):
+        now = time.monotonic()
+        try:
+            entries = [e.path for e in os.scandir(trash_dir) if not self._waiting(e.path, now)]
+        except FileNotFoundError:
+            entries = []
+
+        # Fan out over subtrees so large environments are removed in parallel
+        subtrees = []
+        for entry in entries:
+            self._split_subtrees(entry, subtrees, depth=4)
+        list(pool.map(self._remove, subtrees))
+        for entry in entries:
+            self._remove(entry)
+            if os.path.lexists(entry):
+                attempts = self.failed.get(entry, (0, 0))[0] + 1
+                delay = min(self.RETRY_MAX, self.RETRY_DELAY * 2 ** (attempts - 1))
+                self.failed[entry] = (attempts, time.monotonic() + delay)
+            else:
+                self.failed.pop(entry, None)
+
+        try:
+            os.rmdir(trash_dir)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            if any(e.path not in self.failed for e in os.scandir(trash_dir)):
+                # More was trashed while we were working
+                self.wakeup.set()
+            return
+        with self.lock:
+            if not os.path.exists(trash_dir) and trash_dir in self.trash_dirs:
+                self.trash_dirs.remove(trash_dir)
+                self._save_registry()
+
+    def _split_subtrees(self, path, subtrees, depth):
+        """Descend through directories with few children to find units of parallel work"""
+        try:
+            if depth == 0 or os.path.islink(path) or not os.path.isdir(path):
+                subtrees.append(path)
+                return
+            children = [e.path for e in os.scandir(path)]
+        except OSError:
+            subtrees.append(path)
+            return
+        if len(children) >= 8:
+            subtrees.extend(children)
+        else:
+            for child in children:
+                self._split_subtrees(child, subtrees, depth - 1)
+
+    @staticmethod
+    def _remove(path):
+        def make_writable(func, failed_path, _exc):
+            # Read-only files (common on Windows) must be made writable first
+            try:
+                os.chmod(failed_path, stat.S_IWRITE | stat.S_IREAD | stat.S_IEXEC)
+                func(failed_path)
+            except OSError:
+                pass
+        try:
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path, onerror=make_writable)
+            else:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+class EnvSnapshots:
+    """Cheap snapshots of an environment's site-packages and scripts folders
+
+    A snapshot is a reflinked or hardlinked copy of those folders under
+    <env>/.env_settings/snapshots/<id>/, so taking one costs a directory walk
+    rather than a copy of the data; the linked copies keep their contents
+    through later installs (see TreeCopier). restore() swaps the saved
+    folders into place with renames, taking the same time whatever the size
+    of the environment; the snapshot is used up by this.
+    discard(path) removes snapshot folders (the manager moves them to trash).
+    """
+
+    DIR_NAME = "snapshots"
+    META_FILE = "snapshot.json"
+
+    def __init__(self, env_path, discard=None):
+        self.env_path = env_path
+        self.snapshot_dir = os.path.join(env_path, ".env_settings", self.DIR_NAME)
+        self.discard = discard or (lambda path: shutil.rmtree(path, ignore_errors=True))
+
+    def targets(self):
+        """Return the folders a snapshot covers, relative to the environment"""
+        folders = env_site_packages(self.env_path) + [env_scripts_dir(self.env_path)]
+        return [os.path.relpath(path, self.env_path) for path in folders if os.path.isdir(path)]
+
+    def list(self):
+        """Return the metadata of every complete snapshot, newest first"""
+        snapshots = []
+        try:
+            names = os.listdir(self.snapshot_dir)
+        except OSError:
+            return snapshots
+        for name in names:
+            if name.endswith(".partial"):
+                continue  # still being written, or interrupted and removed by prune()
+            path = os.path.join(self.snapshot_dir, name)
+            try:
+                with open(os.path.join(path, self.META_FILE), 'r') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            meta.update(id=name, path=path)
+            snapshots.append(meta)
+        snapshots.sort(key=lambda meta: meta.get("created", 0), reverse=True)
+        return snapshots
+
+    def _new_id(self):
+        return f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 1000000:06d}"
+
+    def _write_meta(self, path, label, paths, files=0):
+        meta = {"created": time.time(), "label": label, "paths": paths, "files": files}
+        with open(os.path.join(path, self.META_FILE), 'w') as f:
+            json.dump(meta, f, indent=2)
+        return meta
+
+    def take(self, label):
+        """Snapshot the environment's current packages and scripts; returns the snapshot id"""
+        snapshot_id = self._new_id()
+        staging = os.path.join(self.snapshot_dir, snapshot_id + ".partial")
+        paths = self.targets()
+        files = 0
+        try:
+            os.makedirs(staging)
+            for rel_path in paths:
+                copier = TreeCopier(os.path.join(self.env_path, rel_path), os.path.join(staging, rel_path),
+                                    link=lambda _rel: True)
+                copier.run()
+                files += len(copier.files)
+            self._write_meta(staging, label, paths, files)
+            os.rename(staging, os.path.join(self.snapshot_dir, snapshot_id))
+        except BaseException:
+            self.discard(staging)
+            raise
+        return snapshot_id
+
+    def restore(self, snapshot_id, keep_current=True):
+        """Swap a snapshot's folders into the environment
+
+        The folders it replaces become a new snapshot when keep_current is
+        True (so the rollback can itself be undone) and are discarded
+        otherwise. Returns the new snapshot's id or None. Every rename is
+        undone if one of them fails.
+        """
+        source = os.path.join(self.snapshot_dir, snapshot_id)
+        try:
+            with open(os.path.join(source, self.META_FILE), 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            raise ValueError(f"Snapshot {snapshot_id} does not exist or is incomplete")
+        new_id = self._new_id()
+        displaced = os.path.join(self.snapshot_dir, new_id + ".partial")
+        moves, displaced_paths = [], []
+        try:
+            for rel_path in meta["paths"]:
+                live_path = os.path.join(self.env_path, rel_path)
+                saved_path = os.path.join(source, rel_path)
+                if not os.path.isdir(saved_path):
+                    continue
+                if os.path.lexists(live_path):
+                    parked_path = os.path.join(displaced, rel_path)
+                    os.makedirs(os.path.dirname(parked_path), exist_ok=True)
+                    os.rename(live_path, parked_path)
+                    moves.append((parked_path, live_path))
+                    displaced_paths.append(rel_path)
+                os.makedirs(os.path.dirname(live_path), exist_ok=True)
+                os.rename(saved_path, live_path)
+                moves.append((live_path, saved_path))
+        except OSError:
+            for moved_path, original_path in reversed(moves):
+                os.rename(moved_path, original_path)
+            raise
+
+        if keep_current and displaced_paths:
+            self._write_meta(displaced, f"Before rollback to '{meta.get('label', snapshot_id)}'",
+                             displaced_paths, meta.get("files", 0))
+            os.rename(displaced, os.path.join(self.snapshot_dir, new_id))
+        else:
+            new_id = None
+            self.discard(displaced)
+        self.discard(source)
+        # The snapshot's scripts still name the old location if the environment was moved since
+        relocate_env(self.env_path)
+        return new_id
+
+    def delete(self, snapshot_id):
+        self.discard(os.path.join(self.snapshot_dir, snapshot_id))
+
+    def prune(self, keep):
+        """Keep only the newest keep snapshots and drop interrupted ones; returns the number removed"""
+        keep_ids = {meta["id"] for meta in self.list()[:max(0, keep)]}
+        removed = 0
+        try:
+            names = os.listdir(self.snapshot_dir)
+        except OSError:
+            return removed
+        for name in names:
+            if name not in keep_ids:
+                self.discard(os.path.join(self.snapshot_dir, name))
+                removed += 1
+        return removed
+
+    def usage(self):
+        """Return ({snapshot id: (size, exclusive size)}, total size held only by snapshots)
+
+        Files are told apart by inode, so hardlinks shared with the live
+        environment or other snapshots cost nothing extra. Exclusive size is
+        what deleting that snapshot alone would free. Reflinked copies share
+        their data blocks on disk but are counted in full.
+        """
+        inodes = {}
+        def walk(top, owner):
+            stack = [top]
+            while stack:
+                try:
+                    with os.scandir(stack.pop()) as it:
+                        for entry in it:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False):
+                                st = entry.stat(follow_symlinks=False)
+                                info = inodes.setdefault((st.st_dev, st.st_ino), [st.st_size, st.st_nlink, []])
+                                info[2].append(owner)
+                except OSError:
+                    pass
+
+        for rel_path in self.targets():
+            walk(os.path.join(self.env_path, rel_path), None)
+        snapshots = self.list()
+        for meta in snapshots:
+            walk(meta["path"], meta["id"])
+
+        sizes = {meta["id"]: [0, 0] for meta in snapshots}
+        total = 0
+        for size, nlink, owners in inodes.values():
+            for owner in owners:
+                if owner is not None:
+                    sizes[owner][0] += size
+            # Linked from outside (the live environment, the package store) it costs nothing here
+            if None in owners or nlink > len(owners):
+                continue
+            total += size
+            if len(set(owners)) == 1:
+                sizes[owners[0]][1] += size
+        return {snapshot_id: tuple(size) for snapshot_id, size in sizes.items()}, total
+
+
+def canonical_name(name):
+    """Normalize a distribution name as pip does (PEP 503)"""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def requirement_name(requirement):
+    """Return the canonical project name of a requirement string, or None for options/paths/URLs"""
+    if requirement.startswith("-") or "/" in requirement or "\\" in requirement or "://" in requirement:
+        return None
+    match = re.match(r"\s*([A-Za-z0-9][A-Za-z0-9._-]*)", requirement)
+    return canonical_name(match.group(1)) if match else None
+
+
+class Wheelhouse:
+    """Managed local directory of wheels used for offline installs
+
+    populate() builds wheels for a requirements file or package list into the
+    directory with "pip wheel", so repeat installs need neither downloads nor
+    source builds. install() tries a --no-index install from the wheelhouse
+    first whenever it has a wheel for every requested project, and otherwise
+    falls back to a normal install that still prefers the local wheels.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    @staticmethod
+    def parse_wheel_name(filename):
+        """Return (canonical name, version, tags) for a wheel filename, or None"""
+        if not filename.endswith(".whl"):
+            return None
+        parts = filename[:-4].split("-")
+        if len(parts) < 5:
+            return None
+        return canonical_name(parts[0]), parts[1], "-".join(parts[-3:])
+
+    def wheels(self):
+        """Return the wheel filenames in the wheelhouse"""
+        try:
+            return {name for name in os.listdir(self.path) if name.endswith(".whl")}
+        except FileNotFoundError:
+            return set()
+
+    def projects(self):
+        """Return the canonical names of the projects that have a wheel here"""
+        return {parsed[0] for parsed in map(self.parse_wheel_name, self.wheels()) if parsed}
+
+    def missing(self, packages, env_path):
+        """Return pinned requirements for the packages installed in env_path that have no wheel here
+
+        Requirements that are paths, URLs or options are left out, as are
+        projects that are not installed.
+        """
+        available = {parsed[:2] for parsed in map(self.parse_wheel_name, self.wheels()) if parsed}
+        missing = []
+        for package in packages:
+            name = requirement_name(package)
+            version = installed_version(env_path, name) if name else None
+            if version and (name, version) not in available:
+                missing.append(f"{name}=={version}")
+        return missing
+
+    def covers(self, packages):
+        """Return True if every requested project has at least one wheel here"""
+        names = [requirement_name(p) for p in packages]
+        if not names or None in names:
+            return False
+        return set(names) <= self.projects()
+
+    @staticmethod
+    def _run(cmd, env=None):
+        subprocess.run(cmd, check=True, capture_output=True, text=True, env=env)
+
+    def populate(self, python_path, requirements_file=None, packages=(), env=None, run=None):
+        """Build wheels for a requirements file and/or packages into the wheelhouse
+
+        run(cmd) replaces the default captured subprocess call, e.g. to stream
+        output. Wheels already here are reused through --find-links rather
+        than built again. Returns the number of wheels added.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        before = self.wheels()
+        cmd = [python_path, "-m", "pip", "wheel", "--wheel-dir", self.path, "--find-links", self.path]
+        if requirements_file:
+            cmd += ["-r", requirements_file]
+        cmd += list(packages)
+        (run or (lambda c: self._run(c, env)))(cmd)
+        return len(self.wheels() - before)
+
+    def install(self, pip_cmd, packages, env=None, run=None, options=()):
+        """Install packages with pip_cmd (e.g. [pip_path]); returns True if no index was needed
+
+        options are extra "pip install" arguments such as --no-deps.
+        """
+        packages = list(packages)
+        options = list(options)
+        run = run or (lambda c: self._run(c, env))
+        if self.covers(packages):
+            try:
+                run(pip_cmd + ["install", "--no-index", "--find-links", self.path] + options + packages)
+                return True
+            except subprocess.CalledProcessError:
+                # Some dependency or version is missing locally
+                pass
+        find_links = ["--find-links", self.path] if os.path.isdir(self.path) else []
+        run(pip_cmd + ["install"] + find_links + options + packages)
+        return False
+
+
+def installed_version(env_path, project):
+    """Return the version of a project installed in an environment, read from its dist-info name"""
+    prefix = canonical_name(project)
+    for site_packages in env_site_packages(env_path):
+        try:
+            for entry in os.listdir(site_packages):
+                if entry.endswith(".dist-info"):
+                    name, _, version = entry[:-len(".dist-info")].partition("-")
+                    if canonical_name(name) == prefix:
+                        return version
+        except OSError:
+            pass
+    return None
+
+
+class JsonCache:
+    """Versioned JSON cache file, loaded on creation and saved atomically
+
+    Subclasses set VERSION, FIELD (the key holding self.entries in the file)
+    and NAME (used in error messages). Changes are made under self.lock and
+    flagged with self.dirty; save() only writes when something changed, to a
+    temporary file first so a crash never leaves a truncated cache behind. A
+    missing, corrupt or older-version file starts the cache empty.
+    """
+
+    VERSION = 1
+    FIELD = "entries"
+    NAME = "cache"
+    INDENT = None
+
+    def __init__(self, cache_file):
+        self.cache_file = cache_file
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Error loading {self.NAME}: {e}")
+            return
+        if isinstance(data, dict) and data.get("version") == self.VERSION:
+            self.entries = data.get(self.FIELD, {})
+
+    def save(self):
+        """Write the cache to disk if anything changed since the last save"""
+        with self.lock:
+            if not self.dirty:
+                return
+            text = json.dumps({"version": self.VERSION, self.FIELD: self.entries}, indent=self.INDENT)
+            self.dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.cache_file) or ".", exist_ok=True)
+            tmp_path = self.cache_file + ".tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(text)
+            os.replace(tmp_path, self.cache_file)
+        except OSError as e:
+            print(f"Error saving {self.NAME}: {e}")
+
+
+class ResolutionCache(JsonCache):
+    """Persistent cache of fully pinned pip resolutions
+
+    Keys combine the target interpreter (version, implementation, platform
+    and extension ABI as reported by the environment's own Python, system
+    site-packages) and pip's index settings (PIP_* variables and the pip
+    configuration files pip would read) with the normalized requirement set.
+    The pins are the requirements' full dependency closure as installed,
+    including packages that were already satisfied before the install, so a
+    hit can run "pip install --no-deps" on the pinned set, skipping the
+    resolver. Entries are evicted least-recently-used beyond max_entries,
+    and can be invalidated one at a time or all at once.
+    """
+
+    VERSION = 2
+    NAME = "resolution cache"
+    TAG_PROBE = ("import sys, sysconfig, platform, json; sys.stdout.write(json.dumps(["
+                 "platform.python_implementation(), sysconfig.get_platform(), "
+                 "sysconfig.get_config_var('EXT_SUFFIX') or '', sys.maxsize > 2**32]))")
+
+    def __init__(self, cache_file, max_entries=200):
+        self.max_entries = max_entries
+        self.tags = {}
+        super().__init__(cache_file)
+
+    @staticmethod
+    def normalize(packages):
+        """Return the sorted, normalized requirement set, or None if any entry can't be cached"""
+        normalized = set()
+        for requirement in packages:
+            name = requirement_name(requirement)
+            if name is None:
+                return None  # options, paths and URLs are resolved fresh every time
+            spec = re.sub(r"\s+", "", requirement)
+            match = re.match(r"[A-Za-z0-9][A-Za-z0-9._-]*", spec)
+            normalized.add(name + spec[match.end():].lower())
+        return sorted(normalized)
+
+    def interpreter_tag(self, env_path):
+        """Return [implementation, platform, extension suffix, 64-bit] of an environment's Python, or None
+
+        Probed once per interpreter binary; CPython and PyPy, or 32- and
+        64-bit builds, of the same version must not share pinned resolutions.
+        """
+        python_path = os.path.join(env_scripts_dir(env_path), "python.exe" if os.name == "nt" else "python")
+        info = InterpreterRegistry._stat(python_path)
+        if info is None:
+            return None
+        stamp = json.dumps(info)
+        with self.lock:
+            tag = self.tags.get(stamp)
+        if tag is None:
+            try:
+                result = subprocess.run([python_path, "-E", "-s", "-c", self.TAG_PROBE], capture_output=True,
+                                        text=True, timeout=InterpreterRegistry.TIMEOUT,
+                                        creationflags=subprocess.CREATE_NO_WINDOW if os.name == "nt" else 0)
+                tag = json.loads(result.stdout) if result.returncode == 0 else None
+            except (OSError, ValueError, subprocess.SubprocessError):
+                tag = None
+            if tag is None:
+                return None
+            with self.lock:
+                self.tags[stamp] = tag
+        return tag
+
+    @staticmethod
+    def pip_config_files(env_path):
+        """Return the pip configuration files pip would read for an environment, in pip's order"""
+        home = os.path.expanduser("~")
+        if os.name == "nt":
+            program_data = os.environ.get("PROGRAMDATA", r"C:\ProgramData")
+            files = [os.path.join(program_data, "pip", "pip.ini"), os.path.join(home, "pip", "pip.ini"),
+                     os.path.join(os.environ.get("APPDATA", ""), "pip", "pip.ini"), os.path.join(env_path, "pip.ini")]
+        else:
+            xdg_dirs = os.environ.get("XDG_CONFIG_DIRS") or "/etc/xdg"
+            files = [os.path.join(d, "pip", "pip.conf") for d in xdg_dirs.split(os.pathsep) if d]
+            files += ["/etc/pip.conf", os.path.join(home, ".pip", "pip.conf")]
+            if sys.platform == "darwin":
+                files.insert(0, "/Library/Application Support/pip/pip.conf")
+                files.append(os.path.join(home, "Library", "Application Support", "pip", "pip.conf"))
+            config_home = os.environ.get("XDG_CONFIG_HOME") or os.path.join(home, ".config")
+            files.append(os.path.join(config_home, "pip", "pip.conf"))
+            files.append(os.path.join(env_path, "pip.conf"))
+        if os.environ.get("PIP_CONFIG_FILE"):
+            files.append(os.environ["PIP_CONFIG_FILE"])
+        return files
+
+    def pip_settings(self, env_path):
+        """Return the PIP_* variables and the contents of the pip configuration files that exist"""
+        settings = {var: value for var, value in os.environ.items() if var.upper().startswith("PIP_")}
+        for path in self.pip_config_files(env_path):
+            try:
+                with open(path, 'rb') as f:
+                    settings[path] = hashlib.sha1(f.read()).hexdigest()
+            except OSError:
+                pass
+        return settings
+
+    def key(self, env_path, packages):
+        """Return the cache key for installing packages into env_path, or None if uncacheable"""
+        requirements = self.normalize(packages)
+        if not requirements:
+            return None
+        tag = self.interpreter_tag(env_path)
+        if tag is None:
+            return None
+        cfg = read_pyvenv_cfg(env_path)
+        interpreter = {
+            "version": cfg.get("version_info") or cfg.get("version", ""),
+            "tag": tag,
+            "system_site": cfg.get("include-system-site-packages", "false").lower() == "true",
+            "pip": self.pip_settings(env_path)
+        }
+        return hashlib.sha1(json.dumps([interpreter, requirements], sort_keys=True).encode()).hexdigest()
+
+    def get(self, key):
+        """Return the pinned requirement list for key, marking it recently used
+
+        The new timestamp is written by the next save(), not here.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            entry["last_used"] = time.time()
+            pins = list(entry["pins"])
+            self.dirty = True
+        return pins
+
+    def put(self, key, requirements, pins):
+        with self.lock:
+            now = time.time()
+            self.entries[key] = {"requirements": requirements, "pins": pins, "created": now, "last_used": now}
+            excess = len(self.entries) - self.max_entries
+            if excess > 0:
+                for old_key in sorted(self.entries, key=lambda k: self.entries[k]["last_used"])[:excess]:
+                    del self.entries[old_key]
+            self.dirty = True
+        self.save()
+
+    def invalidate(self, key=None):
+        """Drop one entry, or every entry when key is None"""
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+            self.dirty = True
+        self.save()
+
+    @staticmethod
+    def resolved_pins(env_path, packages):
+        """Return 'name==version' pins of packages and everything they depend on, as installed now
+
+        Returns None when the set can't be reproduced from names and versions
+        alone: a dependency is only satisfied outside the environment (system
+        site-packages) or was installed from a URL or path.
+        """
+        installed, direct = {}, set()
+        for site_packages in env_site_packages(env_path):
+            try:
+                entries = os.listdir(site_packages)
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.endswith(".dist-info"):
+                    info = read_dist_info(os.path.join(site_packages, entry))
+                    if info is None:
+                        continue
+                    name = canonical_name(info["name"])
+                    installed[name] = info
+                    if os.path.exists(os.path.join(site_packages, entry, "direct_url.json")):
+                        direct.add(name)
+        environment = marker_environment(env_path)
+        wanted = []
+        for requirement in packages:
+            req = split_requirement(requirement)
+            if req["name"] is None:
+                return None
+            if not req["marker"] or marker_applies(req["marker"], environment):
+                wanted.append((req["name"], req["extras"]))
+        closure = dependency_closure(wanted, installed, environment)
+        if any(name not in installed or name in direct for name in closure):
+            return None
+        return sorted(f"{name}=={installed[name]['version']}" for name in closure)
+
+    def install(self, wheelhouse, pip_path, env_path, packages, run=None):
+        """Install packages, using a cached pinned resolution when one exists
+
+        Returns (offline, cached): whether no index was needed and whether
+        the resolver was skipped.
+        """
+        key = self.key(env_path, packages)
+        try:
+            if key is not None:
+                pins = self.get(key)
+                if pins:
+                    try:
+                        return wheelhouse.install([pip_path], pins, run=run, options=["--no-deps"]), True
+                    except subprocess.CalledProcessError:
+                        # A pinned version vanished or the environment changed; resolve again
+                        self.invalidate(key)
+            offline = wheelhouse.install([pip_path], packages, run=run)
+            if key is not None:
+                pins = self.resolved_pins(env_path, packages)
+                if pins:
+                    self.put(key, self.normalize(packages), pins)
+            return offline, False
+        finally:
+            self.save()
+
+
+class InterpreterRegistry(JsonCache):
+    """Python interpreters found on this machine, with cached version probes
+
+    candidates() lists possible interpreters on PATH, in /usr/bin and
+    /usr/local/bin, in pyenv and asdf version folders and in conda prefixes
+    without running anything. refresh() probes the new ones in parallel
+    subprocesses for their version and architecture. Results are cached in a
+    JSON file keyed by the resolved binary path and stamped with its inode,
+    mtime and size, so an unchanged interpreter is never probed twice.
+    """
+
+    VERSION = 1
+    FIELD = "interpreters"
+    NAME = "interpreter cache"
+    INDENT = 2
+    WORKERS = 8
+    TIMEOUT = 10
+    NAME_PATTERN = re.compile(r"^python(\d+(\.\d+)?)?(\.exe)?$", re.IGNORECASE)
+    # Runs on any Python the user may have installed, old ones included
+    PROBE = ("import sys, platform, struct, json; sys.stdout.write(json.dumps({"
+             "'version': '%d.%d.%d' % tuple(sys.version_info[:3]), "
+             "'implementation': platform.python_implementation(), "
+             "'bits': struct.calcsize('P') * 8, 'machine': platform.machine()}))")
+
+    def __init__(self, cache_file):
+        self.refresh_lock = threading.Lock()
+        super().__init__(cache_file)
+
+    def candidates(self):
+        """Return (path, source) pairs of possible interpreters, in order of preference"""
+        found = [(sys.executable, "current")]
+        home = os.path.expanduser("~")
+
+        def add_dir(directory, source):
+            try:
+                names = sorted(os.listdir(directory))
+            except OSError:
+                return
+            found.extend((os.path.join(directory, name), source) for name in names if self.NAME_PATTERN.match(name))
+
+        for directory in os.environ.get("PATH", "").split(os.pathsep):
+            # pyenv/asdf shims are shell scripts, and WindowsApps holds Store install stubs
+            parts = Path(directory).parts
+            if directory and "shims" not in parts and "WindowsApps" not in parts:
+                add_dir(directory, "PATH")
+        if os.name == "nt":
+            programs = os.path.join(os.environ.get("LOCALAPPDATA", ""), "Programs", "Python")
+            try:
+                for name in sorted(os.listdir(programs)):
+                    add_dir(os.path.join(programs, name), "python.org")
+            except OSError:
+                pass
+        else:
+            add_dir("/usr/bin", "system")
+            add_dir("/usr/local/bin", "system")
+
+        version_dirs = [
+            (os.path.join(os.environ.get("PYENV_ROOT") or os.path.join(home, ".pyenv"), "versions"), "pyenv"),
+            (os.path.join(os.environ.get("ASDF_DATA_DIR") or os.path.join(home, ".asdf"), "installs", "python"), "asdf"),
+        ]
+        for versions_dir, source in version_dirs:
+            try:
+                versions = sorted(os.listdir(versions_dir))
+            except OSError:
+                continue
+            for version in versions:
+                add_dir(os.path.join(versions_dir, version, "bin"), source)
+                if os.name == "nt":
+                    # pyenv-win keeps python.exe at the top of each version folder
+                    add_dir(os.path.join(versions_dir, version), source)
+
+        conda_prefixes = [os.environ.get("CONDA_PREFIX", "")]
+        try:
+            with open(os.path.join(home, ".conda", "environments.txt"), 'r') as f:
+                conda_prefixes += [line.strip() for line in f]
+        except OSError:
+            pass
+        for base in ("anaconda3", "miniconda3", "miniforge3", "mambaforge"):
+            for parent in (home, "/opt"):
+                conda_prefixes.append(os.path.join(parent, base))
+        conda_prefixes.append("/opt/conda")
+        for prefix in list(conda_prefixes):
+            try:
+                conda_prefixes += [os.path.join(prefix, "envs", name) for name in sorted(os.listdir(os.path.join(prefix, "envs")))]
+            except OSError:
+                pass
+        for prefix in conda_prefixes:
+            if prefix:
+                add_dir(prefix if os.name == "nt" else os.path.join(prefix, "bin"), "conda")
+
+        # Interpreters the user browsed to stay listed while they exist
+        with self.lock:
+            found += [(entry["path"], "added") for entry in self.entries.values() if entry.get("source") == "added"]
+        return found
+
+    @classmethod
+    def probe(cls, path):
+        """Run an interpreter to read its version and architecture; returns a dict with error on failure"""
+        try:
+            result = subprocess.run([path, "-E", "-s", "-c", cls.PROBE], capture_output=True, text=True,
+                                    timeout=cls.TIMEOUT,
+                                    creationflags=subprocess.CREATE_NO_WINDOW if os.name == "nt" else 0)
+            if result.returncode != 0:
+                return {"error": (result.stderr.strip().splitlines() or [f"exit code {result.returncode}"])[-1]}
+            return json.loads(result.stdout)
+        except (OSError, ValueError, subprocess.SubprocessError) as e:
+            return {"error": str(e)}
+
+    @staticmethod
+    def _stat(path):
+        """Return (resolved path, stamp) for an executable file, or None"""
+        try:
+            real = os.path.realpath(path)
+            st = os.stat(real)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode) or not os.access(real, os.X_OK):
+            return None
+        return real, [st.st_ino, st.st_mtime_ns, st.st_size]
+
+    def refresh(self):
+        """Find the interpreters and probe new or changed ones in parallel; returns interpreters()"""
+        with self.refresh_lock:
+            with self.lock:
+                known = set(self.entries)
+            found, seen = [], set()
+            for path, source in self.candidates():
+                info = self._stat(path)
+                if info is None or info[0] in seen:
+                    continue
+                seen.add(info[0])
+                found.append((info[0], info[1], path, source))
+
+            with self.lock:
+                stale = [item for item in found if (self.entries.get(item[0]) or {}).get("stamp") != item[1]]
+            probes = {}
+            if stale:
+                with concurrent.futures.ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+                    probes = dict(zip((item[0] for item in stale), pool.map(lambda item: self.probe(item[2]), stale)))
+
+            with self.lock:
+                entries = {}
+                for real, stamp, path, source in found:
+                    entry = probes.get(real)
+                    if entry is None:
+                        entry = self.entries[real]
+                    else:
+                        entry = dict(entry, stamp=stamp)
+                    entries[real] = dict(entry, path=path, source=source)
+                # Keep interpreters add() registered while the probes ran
+                for real, entry in self.entries.items():
+                    if entry.get("source") == "added" and real not in entries and real not in known:
+                        entries[real] = entry
+                if entries != self.entries:
+                    self.entries = entries
+                    self.dirty = True
+        self.save()
+        return self.interpreters()
+
+    def add(self, path):
+        """Probe an interpreter picked by hand and keep it listed; returns its entry or None"""
+        info = self._stat(path)
+        if info is None:
+            return None
+        real, stamp = info
+        with self.lock:
+            entry = self.entries.get(real)
+        if entry is None or entry.get("stamp") != stamp:
+            entry = dict(self.probe(path), stamp=stamp, path=path, source="added")
+            with self.lock:
+                self.entries[real] = entry
+                self.dirty = True
+            self.save()
+        return None if "error" in entry else entry
+
+    def interpreters(self):
+        """Return the working interpreters from the cache, newest version first; never probes"""
+        with self.lock:
+            entries = [entry for entry in self.entries.values() if "error" not in entry]
+        entries.sort(key=lambda entry: entry["path"])
+        entries.sort(key=lambda entry: version_tuple(entry.get("version", "")), reverse=True)
+        return entries
+
+    def find(self, path):
+        """Return the cached entry for an interpreter path, or None"""
+        with self.lock:
+            entry = self.entries.get(os.path.realpath(path)) if path else None
+        return entry if entry and "error" not in entry else None
+
+    @staticmethod
+    def describe(entry):
+        """Format an entry for display, e.g. CPython 3.12.1, 64-bit x86_64 (pyenv)"""
+        machine = f" {entry['machine']}" if entry.get("machine") else ""
+        return (f"{entry.get('implementation', 'Python')} {entry.get('version', '?')}, "
+                f"{entry.get('bits', '?')}-bit{machine} ({entry.get('source', '?')})")
+
+
+class SparePool:
+    """Ready-made spare environments kept in a hidden folder of venv_dir
+
+    Spares are grouped by a key derived from the interpreter, the venv flags
+    and an optional package preset. claim() renames a matching spare to the
+    requested location and relocates it, which takes milliseconds instead of
+    running venv and ensurepip. refill() tops every wanted key back up to
+    the configured size on a low-priority background thread.
+    """
+
+    POOL_NAME = ".pyenvmanager-pool"
+
+    def __init__(self, venv_dir, size=0, presets=(), trash=None, wheelhouse=None):
+        self.pool_dir = os.path.join(venv_dir, self.POOL_NAME)
+        self.wheelhouse = wheelhouse
+        self.size = size
+        self.presets = [" ".join(p.split()) for p in presets if p.strip()]
+        self.trash = trash
+        self.wanted = {}
+        self.lock = threading.Lock()
+        self.refilling = False
+        self.refill_pending = False
+        self.stopped = False
+
+    @staticmethod
+    def spec(python_path, system_site=False, no_pip=False, packages=""):
+        return {
+            "python": os.path.realpath(python_path),
+            "system_site": bool(system_site),
+            "no_pip": bool(no_pip),
+            "packages": " ".join(sorted(packages.split())),
+        }
+
+    @staticmethod
+    def key(spec):
+        return hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:16]
+
+    def want_defaults(self, python_path):
+        """Keep spares for python_path bare and for every configured package preset"""
+        for packages in [""] + self.presets:
+            spec = self.spec(python_path, packages=packages)
+            self.wanted[self.key(spec)] = spec
+
+    def ready_spares(self, key):
+        key_dir = os.path.join(self.pool_dir, key)
+        try:
+            return sorted(e.path for e in os.scandir(key_dir)
+                          if e.is_dir() and not e.name.startswith("."))
+        except FileNotFoundError:
+            return []
+
+    def claim(self, spec, env_path):
+        """Move a ready spare matching spec to env_path; returns False if none is ready"""
+        key = self.key(spec)
+        if not spec["packages"]:
+            # Remember bare interpreter/flag combinations so the pool learns them
+            with self.lock:
+                self.wanted.setdefault(key, spec)
+        for spare in self.ready_spares(key):
+            home = read_pyvenv_cfg(spare).get("home")
+            if home and not os.path.isdir(home):
+                # The base interpreter moved or was removed since the spare was built
+                self._discard(spare)
+                continue
+            try:
+                os.rename(spare, env_path)
+            except OSError:
+                continue
+            relocate_env(env_path)
+            return True
+        return False
+
+    def _discard(self, path):
+        try:
+            if self.trash is not None:
+                self.trash.move_to_trash(path)
+            else:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+    def refill(self):
+        """Top up all wanted keys in the background"""
+        with self.lock:
+            if self.size <= 0 or self.stopped:
+                return
+            if self.refilling:
+                self.refill_pending = True
+                return
+            self.refilling = True
+        threading.Thread(target=self._refill_thread, daemon=True).start()
+
+    def _refill_thread(self):
+        try:
+            while True:
+                with self.lock:
+                    wanted = list(self.wanted.items())
+                for key, spec in wanted:
+                    while not self.stopped and len(self.ready_spares(key)) < self.size:
+                        if not self._build_spare(key, spec):
+                            break
+                with self.lock:
+                    if not self.refill_pending or self.stopped:
+                        self.refilling = False
+                        return
+                    self.refill_pending = False
+        except Exception as e:
+            print(f"Error refilling spare environments: {e}")
+            with self.lock:
+                self.refilling = False
+
+    def _build_spare(self, key, spec):
+        key_dir = os.path.join(self.pool_dir, key)
+        os.makedirs(key_dir, exist_ok=True)
+        spare_id = f"{time.time_ns():x}"
+        building = os.path.join(key_dir, f".building-{spare_id}")
+
+        cmd = [spec["python"], "-m", "venv"]
+        if spec["system_site"]:
+            cmd.append("--system-site-packages")
+        if spec["no_pip"]:
+            cmd.append("--without-pip")
+        cmd.append(building)
+        try:
+            self._run_low_priority(cmd)
+            if spec["packages"]:
+                pip_path = os.path.join(env_scripts_dir(building), "pip.exe" if os.name == "nt" else "pip")
+                pip_args = spec["packages"].split()
+                if self.wheelhouse is not None and self.wheelhouse.covers(pip_args):
+                    pip_args = ["--no-index", "--find-links", self.wheelhouse.path] + pip_args
+                self._run_low_priority([pip_path, "install"] + pip_args)
+            with open(os.path.join(key_dir, "spec.json"), 'w') as f:
+                json.dump(spec, f)
+            os.rename(building, os.path.join(key_dir, spare_id))
+            return True
+        except Exception as e:
+            print(f"Could not build spare environment: {e}")
+            self._discard(building)
+            return False
+
+    @staticmethod
+    def _run_low_priority(cmd):
+        process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if hasattr(os, "setpriority"):
+            try:
+                os.setpriority(os.PRIO_PROCESS, process.pid, 10)
+            except OSError:
+                pass
+        _, stderr = process.communicate()
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, cmd, stderr=stderr)
+
+
+class PackageStore:
+    """Content-addressed store of installed distribution files shared by hardlinks
+
+    Files are stored once per distribution name, version and wheel tag under
+    <venv_dir>/.pyenvmanager-store/<name>-<version>-<tag>/, and each
+    environment's copy is replaced by a hardlink to the stored file. A file is
+    only adopted or linked when its content matches the sha256 in the
+    distribution's RECORD, so locally modified files are never shared. Stored
+    files no environment links to any more are removed by collect_garbage().
+    Each dedupe call takes its own cancel_event, so cancelling one run leaves
+    the others going.
+    """
+
+    STORE_NAME = ".pyenvmanager-store"
+    WORKERS = 4
+    CHUNK = 1024 * 1024
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+
+    @staticmethod
+    def record_hash(path):
+        """Return the sha256 of a file in RECORD format (urlsafe base64, unpadded)"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(PackageStore.CHUNK), b""):
+                digest.update(chunk)
+        return "sha256=" + base64.urlsafe_b64encode(digest.digest()).rstrip(b"=").decode("ascii")
+
+    @staticmethod
+    def read_distribution(dist_info):
+        """Return (store key, [(relative path, hash)]) for a .dist-info folder, or None"""
+        def headers(name):
+            values = {}
+            try:
+                with open(os.path.join(dist_info, name), 'r', encoding="utf-8", errors="replace") as f:
+                    for line in f:
+                        if not line.strip():
+                            break  # end of headers
+                        key, _, value = line.partition(":")
+                        values.setdefault(key.strip().lower(), []).append(value.strip())
+            except OSError:
+                pass
+            return values
+        metadata = headers("METADATA")
+        if not metadata.get("name") or not metadata.get("version"):
+            return None
+        tags = ".".join(sorted(headers("WHEEL").get("tag", []))) or "unknown"
+        if len(tags) > 64:
+            tags = hashlib.sha1(tags.encode()).hexdigest()[:16]
+        key = "-".join(re.sub(r"[^A-Za-z0-9._+]", "_", part) for part in
+                       (canonical_name(metadata["name"][0]), metadata["version"][0], tags))
+        files = []
+        try:
+            with open(os.path.join(dist_info, "RECORD"), 'r', encoding="utf-8", newline="") as f:
+                for row in csv.reader(f):
+                    # Skip unhashed entries (RECORD itself, .pyc) and files outside site-packages
+                    if len(row) < 2 or not row[1].startswith("sha256=") or row[0].startswith(("..", "/")):
+                        continue
+                    files.append((row[0], row[1]))
+        except OSError:
+            return None
+        return key, files
+
+    def dedupe_env(self, env_path, cancel_event=None):
+        """Hardlink an environment's distribution files into the store
+
+        Returns a dict with the files linked, files adopted into the store and
+        bytes reclaimed. Environments on another filesystem are skipped.
+        Raises CopyCancelled once cancel_event is set.
+        """
+        stats = {"linked": 0, "adopted": 0, "reclaimed": 0, "skipped": False}
+        os.makedirs(self.store_dir, exist_ok=True)
+        store_dev = os.stat(self.store_dir).st_dev
+        for site_packages in env_site_packages(env_path):
+            if os.stat(site_packages).st_dev != store_dev:
+                stats["skipped"] = True
+                continue
+            for entry in os.listdir(site_packages):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise CopyCancelled()
+                if not entry.endswith(".dist-info"):
+                    continue
+                dist = self.read_distribution(os.path.join(site_packages, entry))
+                if dist is None:
+                    continue
+                key, files = dist
+                for rel_path, file_hash in files:
+                    self._dedupe_file(os.path.join(site_packages, rel_path),
+                                      os.path.join(self.store_dir, key, rel_path), file_hash, stats)
+        return stats
+
+    def _dedupe_file(self, path, store_path, file_hash, stats):
+        """Replace one file with a link to its stored copy, adopting it if the store lacks it"""
+        try:
+            st = os.lstat(path)
+            if not stat.S_ISREG(st.st_mode):
+                return
+            try:
+                store_st = os.stat(store_path)
+            except FileNotFoundError:
+                store_st = None
+            if store_st is not None and (store_st.st_dev, store_st.st_ino) == (st.st_dev, st.st_ino):
+                return  # already shared
+            if store_st is not None and store_st.st_size != st.st_size:
+                return
+            if self.record_hash(path) != file_hash:
+                return  # modified after install
+            # Stored files are keyed by name, version and tag, not content: another
+            # local build of the same version may have stored different bytes
+            if store_st is not None and self.record_hash(store_path) != file_hash:
+                return
+            if store_st is None:
+                os.makedirs(os.path.dirname(store_path), exist_ok=True)
+                try:
+                    os.link(path, store_path)
+                    stats["adopted"] += 1
+                    return
+                except FileExistsError:
+                    pass  # another environment adopted it first
+            tmp_path = path + ".pyenvmanager-link"
+            os.link(store_path, tmp_path)
+            try:
+                os.replace(tmp_path, path)
+            except OSError:
+                os.remove(tmp_path)
+                raise
+            stats["linked"] += 1
+            if st.st_nlink == 1:
+                stats["reclaimed"] += st.st_size
+        except OSError as e:
+            if e.errno == errno.EXDEV:
+                stats["skipped"] = True
+            else:
+                print(f"Could not dedupe {path}: {e}")
+
+    def dedupe(self, env_paths, on_progress=None, cancel_event=None):
+        """Dedupe several environments in parallel and return a combined report
+
+        on_progress(done, total, env_path) is called from worker threads.
+        """
+        report = {"environments": 0, "linked": 0, "adopted": 0, "reclaimed": 0, "skipped": []}
+        env_paths = list(env_paths)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            futures = {pool.submit(self.dedupe_env, path, cancel_event): path for path in env_paths}
+            for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                path = futures[future]
+                try:
+                    stats = future.result()
+                    report["environments"] += 1
+                    for field in ("linked", "adopted", "reclaimed"):
+                        report[field] += stats[field]
+                    if stats["skipped"]:
+                        report["skipped"].append(path)
+                except CopyCancelled:
+                    pass
+                except Exception as e:
+                    print(f"Could not dedupe {path}: {e}")
+                    report["skipped"].append(path)
+                if on_progress:
+                    on_progress(done, len(env_paths), path)
+        report["collected"], report["collected_bytes"] = self.collect_garbage()
+        report["store_bytes"] = self.size()
+        return report
+
+    def collect_garbage(self):
+        """Remove stored files no environment links to; returns (files, bytes) removed"""
+        removed, removed_bytes = 0, 0
+        for dirpath, dirnames, filenames in os.walk(self.store_dir, topdown=False):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.lstat(path)
+                    if st.st_nlink <= 1:
+                        os.remove(path)
+                        removed += 1
+                        removed_bytes += st.st_size
+                except OSError:
+                    pass
+            if dirpath != self.store_dir:
+                try:
+                    os.rmdir(dirpath)
+                except OSError:
+                    pass  # not empty
+        return removed, removed_bytes
+
+    def size(self):
+        """Return the bytes held by the store"""
+        total = 0
+        for dirpath, _dirnames, filenames in os.walk(self.store_dir):
+            for name in filenames:
+                try:
+                    total += os.lstat(os.path.join(dirpath, name)).st_size
+                except OSError:
+                    pass
+        return total
+
+
+def read_dist_info(dist_info):
+    """Return name, version, summary, requirements, file count and size for a .dist-info folder
+
+    Only the METADATA headers and RECORD are read; returns None if METADATA
+    lacks a name or version.
+    """
+    info = {"name": "", "version": "", "summary": "", "requires": [], "files": 0, "size": 0}
+    try:
+        with open(os.path.join(dist_info, "METADATA"), 'r', encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if not line.strip():
+                    break  # the description body follows the headers
+                key, _, value = line.partition(":")
+                key = key.strip().lower()
+                if key in ("name", "version", "summary") and not info[key]:
+                    info[key] = value.strip()
+                elif key == "requires-dist":
+                    info["requires"].append(value.strip())
+    except OSError:
+        return None
+    if not info["name"] or not info["version"]:
+        return None
+    try:
+        with open(os.path.join(dist_info, "RECORD"), 'r', encoding="utf-8", errors="replace") as f:
+            record = f.read()
+        # One line per file; the size is always the last CSV field, so no full CSV parse is needed
+        info["files"] = sum(1 for line in record.splitlines() if line.strip())
+        info["size"] = sum(map(int, re.findall(r",(\d+)\s*$", record, re.MULTILINE)))
+    except OSError:
+        pass
+    return info
+
+
+class PackageInventory(JsonCache):
+    """Installed-package listing per environment read straight from dist-info
+
+    Each environment's inventory is cached in memory and in a JSON file next
+    to settings.json, stamped with the mtimes of its site-packages folders.
+    Installing or removing a distribution adds or removes a .dist-info
+    folder, which changes that mtime, so a warm lookup is a stat per folder.
+    """
+
+    VERSION = 1
+    FIELD = "envs"
+    NAME = "package inventory"
+    WORKERS = 8
+
+    @staticmethod
+    def stamp(site_packages):
+        """Return the mtimes identifying the current contents of the site-packages folders"""
+        stamps = []
+        for path in site_packages:
+            try:
+                stamps.append([path, os.stat(path).st_mtime_ns])
+            except OSError:
+                pass
+        return stamps
+
+    @staticmethod
+    def scan(site_packages):
+        """Read every distribution in the site-packages folders, sorted by name"""
+        packages = []
+        for path in site_packages:
+            try:
+                entries = os.listdir(path)
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.endswith(".dist-info"):
+                    info = read_dist_info(os.path.join(path, entry))
+                    if info is not None:
+                        packages.append(info)
+        packages.sort(key=lambda info: canonical_name(info["name"]))
+        return packages
+
+    def get(self, env_path):
+        """Return the package list of an environment, rescanning only if site-packages changed"""
+        env_path = os.path.abspath(env_path)
+        with self.lock:
+            entry = self.entries.get(env_path)
+        if entry is not None and entry["stamp"] and entry["stamp"] == self.stamp([s for s, _ in entry["stamp"]]):
+            return entry["packages"]
+        site_packages = env_site_packages(env_path)
+        stamp = self.stamp(site_packages)
+        packages = self.scan(site_packages)
+        with self.lock:
+            self.entries[env_path] = {"stamp": stamp, "packages": packages}
+            self.dirty = True
+        return packages
+
+    def get_many(self, env_paths):
+        """Return {env_path: packages} for several environments, scanning cold ones in parallel"""
+        env_paths = [os.path.abspath(path) for path in env_paths]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            result = dict(zip(env_paths, pool.map(self.get, env_paths)))
+        self.save()
+        return result
+
+    def forget(self, env_paths):
+        """Drop cached inventories of environments that no longer exist"""
+        with self.lock:
+            for path in env_paths:
+                if self.entries.pop(os.path.abspath(path), None) is not None:
+                    self.dirty = True
+
+
+VERSION_PATTERN = re.compile(
+    r"^\s*v?(?:(\d+)!)?(\d+(?:\.\d+)*)"                      # epoch, release
+    r"(?:[-_.]?(a|b|c|rc|alpha|beta|pre|preview)[-_.]?(\d*))?"  # pre-release
+    r"(?:-(\d+)|[-_.]?(post|rev|r)[-_.]?(\d*))?"               # post-release
+    r"(?:[-_.]?(dev)[-_.]?(\d*))?"                              # dev release
+    r"(?:\+([a-z0-9]+(?:[-_.][a-z0-9]+)*))?\s*$",               # local version
+    re.IGNORECASE
+)
+PRE_RELEASE_RANK = {"a": 0, "alpha": 0, "b": 1, "beta": 1, "c": 2, "rc": 2, "pre": 2, "preview": 2}
+SPECIFIER_PATTERN = re.compile(r"\s*(~=|===|==|!=|<=|>=|<|>)\s*([^,\s]+)\s*")
+
+
+@functools.lru_cache(maxsize=65536)
+def parse_version(text):
+    """Parse a PEP 440 version into (release, sort key, has local), or None if invalid
+
+    The sort key orders versions the way pip does: dev < pre < final < post,
+    with trailing zeros in the release ignored.
+    """
+    match = VERSION_PATTERN.match(text or "")
+    if not match:
+        return None
+    epoch, release, pre_l, pre_n, post_implicit, post_l, post_n, dev_l, dev_n, local = match.groups()
+    release = tuple(int(part) for part in release.split("."))
+    trimmed = release
+    while len(trimmed) > 1 and trimmed[-1] == 0:
+        trimmed = trimmed[:-1]
+    if pre_l:
+        pre_key = (0, PRE_RELEASE_RANK[pre_l.lower()], int(pre_n or 0))
+    elif dev_l and not (post_implicit or post_l):
+        pre_key = (-1,)  # 1.0.dev0 sorts before 1.0a0
+    else:
+        pre_key = (1,)
+    if post_implicit:
+        post_key = (0, int(post_implicit))
+    elif post_l:
+        post_key = (0, int(post_n or 0))
+    else:
+        post_key = (-1,)
+    dev_key = (0, int(dev_n or 0)) if dev_l else (1,)
+    local_key = tuple((1, int(part), "") if part.isdigit() else (0, 0, part)
+                      for part in re.split(r"[-_.]", local.lower())) if local else ()
+    key = (int(epoch or 0), trimmed, pre_key, post_key, dev_key, local_key)
+    return release, key, bool(local)
+
+
+def version_matches(version, specifiers):
+    """Return True if version satisfies every (operator, version) specifier
+
+    Implements the PEP 440 comparison operators including ~= and == / !=
+    with .* wildcards. Pre-releases are always considered, since searching
+    installed versions should find them.
+    """
+    parsed = parse_version(version)
+    for op, spec in specifiers:
+        if op == "===":
+            if version.strip().lower() != spec.lower():
+                return False
+            continue
+        if parsed is None:
+            return False
+        release, key, _has_local = parsed
+        if op in ("==", "!=") and spec.endswith(".*"):
+            prefix = parse_version(spec[:-2])
+            if prefix is None or prefix[1][2:] != ((1,), (-1,), (1,), ()):
+                return False  # .* may only follow a release segment
+            prefix_release = prefix[0]
+            padded = release + (0,) * max(0, len(prefix_release) - len(release))
+            matched = key[0] == prefix[1][0] and padded[:len(prefix_release)] == prefix_release
+            if matched != (op == "=="):
+                return False
+            continue
+        target = parse_version(spec)
+        if target is None:
+            return False
+        target_release, target_key, target_local = target
+        # Without a local label in the specifier, the candidate's local label is ignored
+        candidate = key if target_local else key[:5] + ((),)
+        if op == "==":
+            ok = candidate == target_key
+        elif op == "!=":
+            ok = candidate != target_key
+        elif op == "<":
+            # <V excludes pre-releases of V's release unless V is a pre-release (as pip's packaging does)
+            ok = candidate < target_key and not (
+                target_key[2] == (1,) and target_key[4] == (1,) and (key[2] != (1,) or key[4] != (1,))
+                and key[:2] == target_key[:2])
+        elif op == "<=":
+            ok = candidate <= target_key
+        elif op == ">":
+            # >V excludes post-releases of V's release unless V is a post-release, and always its local versions
+            ok = candidate > target_key and not (
+                key[:2] == target_key[:2] and ((target_key[3] == (-1,) and key[3] != (-1,)) or key[5]))
+        elif op == ">=":
+            ok = candidate >= target_key
+        else:  # ~=
+            if len(target_release) < 2:
+                return False
+            prefix_release = target_release[:-1]
+            padded = release + (0,) * max(0, len(prefix_release) - len(release))
+            ok = (candidate >= target_key and key[0] == target_key[0]
+                  and padded[:len(prefix_release)] == prefix_release)
+        if not ok:
+            return False
+    return True
+
+
+def parse_package_query(query):
+    """Split a search like "requests<2.31" or "crypto*>=41,<42" into (name pattern, specifiers)
+
+    Raises ValueError for malformed queries.
+    """
+    match = re.match(r"\s*([A-Za-z0-9*?][A-Za-z0-9._*?-]*)\s*(.*)$", query)
+    if not match:
+        raise ValueError("Enter a package name, optionally followed by version specifiers")
+    name, rest = match.groups()
+    specifiers = []
+    for part in filter(None, (p.strip() for p in rest.split(","))):
+        spec = SPECIFIER_PATTERN.fullmatch(part)
+        if not spec:
+            raise ValueError(f"Invalid version specifier: {part}")
+        specifiers.append(spec.groups())
+    return canonical_name(name), specifiers
+
+
+MARKER_TOKEN = re.compile(r"""\s*(\(|\)|\band\b|\bor\b|\bnot\s+in\b|\bin\b|===|==|!=|<=|>=|~=|<|>|"[^"]*"|'[^']*'|[A-Za-z_][A-Za-z0-9_.]*)""")
+
+
+def marker_environment(env_path):
+    """Return the PEP 508 marker variables for an environment (platform values are the host's)"""
+    cfg = read_pyvenv_cfg(env_path)
+    full_version = cfg.get("version_info") or cfg.get("version") or platform.python_version()
+    release = version_tuple(full_version)
+    return {
+        "python_version": ".".join(str(part) for part in release[:2]),
+        "python_full_version": ".".join(str(part) for part in release[:3]),
+        "os_name": os.name,
+        "sys_platform": sys.platform,
+        "platform_system": platform.system(),
+        "platform_machine": platform.machine(),
+        "platform_release": platform.release(),
+        "implementation_name": sys.implementation.name,
+        "platform_python_implementation": platform.python_implementation(),
+        "extra": ""
+    }
+
+
+def marker_applies(marker, environment):
+    """Evaluate a PEP 508 environment marker; unparsable markers count as applying"""
+    tokens = MARKER_TOKEN.findall(marker)
+    if "".join(tokens).replace(" ", "") != re.sub(r"\s+", "", marker):
+        return True
+    pos = [0]
+
+    def peek():
+        return tokens[pos[0]] if pos[0] < len(tokens) else None
+
+    def take():
+        pos[0] += 1
+        return tokens[pos[0] - 1]
+
+    def value():
+        token = take()
+        if token[0] in "\"'":
+            return token[1:-1], False
+        return environment.get(token, ""), token in ("python_version", "python_full_version", "platform_release")
+
+    def compare():
+        if peek() == "(":
+            take()
+            result = either()
+            take()  # ")"
+            return result
+        left, left_is_version = value()
+        op = re.sub(r"\s+", " ", take())
+        right, right_is_version = value()
+        if op in ("in", "not in"):
+            return (left in right) == (op == "in")
+        if (left_is_version or right_is_version) and parse_version(left) and parse_version(right):
+            return version_matches(left, [(op, right)])
+        if op == "==":
+            return left == right
+        if op == "!=":
+            return left != right
+        return version_matches(left, [(op, right)])
+
+    def both():
+        result = compare()
+        while peek() == "and":
+            take()
+            result = compare() and result
+        return result
+
+    def either():
+        result = both()
+        while peek() == "or":
+            take()
+            result = both() or result
+        return result
+
+    try:
+        return either()
+    except (IndexError, TypeError):
+        return True
+
+
+def parse_requirements_file(path, _seen=None):
+    """Return the requirement lines of a requirements or pip-compile lock file
+
+    Comments, continuation lines, --hash options and other pip options are
+    dropped; -r/--requirement includes are followed.
+    """
+    _seen = _seen if _seen is not None else set()
+    path = os.path.abspath(path)
+    if path in _seen:
+        return []
+    _seen.add(path)
+    with open(path, 'r', encoding="utf-8") as f:
+        text = f.read().replace("\\\n", " ")
+    requirements = []
+    for line in text.splitlines():
+        line = re.sub(r"(^|\s)#.*$", "", line).strip()
+        if not line:
+            continue
+        include = re.match(r"(?:-r|--requirement)[\s=]+(\S+)", line)
+        if include:
+            requirements += parse_requirements_file(os.path.join(os.path.dirname(path), include.group(1)), _seen)
+            continue
+        if line.startswith("-e ") or line.startswith("--editable"):
+            requirements.append(line)
+            continue
+        if line.startswith("-"):
+            continue  # index and other global options
+        requirements.append(re.sub(r"\s--hash[=\s]\S+", "", line).strip())
+    return requirements
+
+
+def split_requirement(requirement):
+    """Split a requirement line into name, extras, specifiers, marker and whether it is a direct reference"""
+    line, _, marker = requirement.partition(";")
+    direct = " @ " in line or "@" in line.split("[")[0] or requirement_name(line.strip()) is None
+    match = re.match(r"\s*([A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[([^\]]*)\])?\s*(.*)$", line.split(" @ ")[0])
+    if not match or requirement.startswith("-"):
+        return {"raw": requirement, "name": None, "extras": set(), "specifiers": [], "marker": marker.strip(), "direct": True}
+    name, extras, rest = match.groups()
+    specifiers = []
+    if not direct:
+        for part in filter(None, (p.strip() for p in rest.strip().strip("()").split(","))):
+            spec = SPECIFIER_PATTERN.fullmatch(part)
+            if spec:
+                specifiers.append(spec.groups())
+    return {
+        "raw": requirement.strip(),
+        "name": canonical_name(name),
+        "extras": {canonical_name(e) for e in (extras or "").split(",") if e.strip()},
+        "specifiers": specifiers,
+        "marker": marker.strip(),
+        "direct": direct
+    }
+
+
+# Never removed by a sync
+PROTECTED_PACKAGES = ("pip", "setuptools", "wheel", "distribute")
+
+
+def freeze_requirements(env_path):
+    """Return pip requirements that reinstall an environment's distributions
+
+    Versions are pinned. Distributions installed from a URL or local path
+    (recorded in direct_url.json, PEP 610) become direct references and
+    editable ones "-e <path>". pip comes with venv and is left out;
+    setuptools and wheel are kept unpinned so they match the new interpreter.
+    """
+    requirements = []
+    for site_packages in env_site_packages(env_path):
+        try:
+            entries = sorted(os.listdir(site_packages))
+        except OSError:
+            continue
+        for entry in entries:
+            if not entry.endswith(".dist-info"):
+                continue
+            dist_info = os.path.join(site_packages, entry)
+            info = read_dist_info(dist_info)
+            if info is None or canonical_name(info["name"]) == "pip":
+                continue
+            if canonical_name(info["name"]) in PROTECTED_PACKAGES:
+                requirements.append(info["name"])
+                continue
+            try:
+                with open(os.path.join(dist_info, "direct_url.json"), 'r') as f:
+                    direct = json.load(f)
+            except (OSError, ValueError):
+                direct = {}
+            url = direct.get("url", "")
+            if url and direct.get("dir_info", {}).get("editable"):
+                path = urllib.request.url2pathname(urllib.parse.urlparse(url).path) if url.startswith("file:") else url
+                requirements.append(f"-e {path}")
+            elif url and "vcs_info" in direct:
+                vcs = direct["vcs_info"]
+                revision = f"@{vcs['commit_id']}" if vcs.get("commit_id") else ""
+                requirements.append(f"{info['name']} @ {vcs.get('vcs', 'git')}+{url}{revision}")
+            elif url:
+                requirements.append(f"{info['name']} @ {url}")
+            else:
+                requirements.append(f"{info['name']}=={info['version']}")
+    return requirements
+
+
+def direct_requirement_names(requirements, env_path, base_dir=None):
+    """Map the unnamed direct requirements (-e <path>, local paths, URLs) to installed distributions
+
+    Returns {canonical name: requested extras} for the distributions whose
+    direct_url.json (PEP 610) points at one of the requirements, so their
+    dependencies can be kept by a sync. Relative paths are resolved against
+    base_dir, typically the requirements file's folder.
+    """
+    def normalize_url(url):
+        url = re.sub(r"^[a-z]+\+(?=[a-z]+://)", "", url.split("#")[0].strip())  # git+https:// -> https://
+        return re.sub(r"@[^/@]*$", "", url) if re.match(r"[a-z]+://[^/]*/.*@", url) else url
+
+    targets = {}
+    for requirement in requirements:
+        req = split_requirement(requirement)
+        if not req["direct"] or " @ " in req["raw"].split(";")[0]:
+            continue  # named requirements are kept by name
+        target = re.sub(r"^(?:-e|--editable)[\s=]+", "", req["raw"].split(";")[0]).strip()
+        extras = set()
+        match = re.match(r"(.*?)\[([^\]]*)\]$", target)
+        if match:
+            target = match.group(1)
+            extras = {canonical_name(e) for e in match.group(2).split(",") if e.strip()}
+        egg = re.search(r"#egg=([A-Za-z0-9._-]+)", target)
+        if "://" in target:
+            key = normalize_url(target)
+        else:
+            key = os.path.normcase(os.path.realpath(os.path.join(base_dir or os.getcwd(), target)))
+        targets[key] = (canonical_name(egg.group(1)) if egg else None, extras)
+
+    names = {name: extras for name, extras in targets.values() if name}
+    if not targets:
+        return names
+    for site_packages in env_site_packages(env_path):
+        try:
+            entries = os.listdir(site_packages)
+        except OSError:
+            continue
+        for entry in entries:
+            if not entry.endswith(".dist-info"):
+                continue
+            try:
+                with open(os.path.join(site_packages, entry, "direct_url.json"), 'r') as f:
+                    url = json.load(f).get("url", "")
+            except (OSError, ValueError):
+                continue
+            if url.startswith("file:"):
+                key = os.path.normcase(os.path.realpath(urllib.request.url2pathname(urllib.parse.urlparse(url).path)))
+            else:
+                key = normalize_url(url)
+            if key in targets:
+                name = canonical_name(entry[:-len(".dist-info")].partition("-")[0])
+                names.setdefault(name, set()).update(targets[key][1])
+    return names
+
+
+def dependency_closure(wanted, installed, environment):
+    """Return {name: extras} for the wanted (name, extras) pairs and everything they depend on
+
+    installed maps canonical names to dist-info (read_dist_info()) records.
+    Dependencies follow the installed metadata; a package reached again with
+    new extras is revisited for those extras' dependencies. Names that are
+    not installed are included but not followed.
+    """
+    followed = {}  # name -> extras whose dependencies were added ("" for the base ones)
+    pending = list(wanted)
+    while pending:
+        name, extras = pending.pop()
+        new = ({""} | set(extras)) - followed.get(name, set())
+        if not new:
+            continue
+        followed.setdefault(name, set()).update(new)
+        info = installed.get(name)
+        if info is None:
+            continue
+        for dependency in info.get("requires", []):
+            dep = split_requirement(dependency)
+            if dep["name"] is None:
+                continue
+            if dep["marker"]:
+                if not any(marker_applies(dep["marker"], dict(environment, extra=extra)) for extra in new):
+                    continue
+            elif "" not in new:
+                continue  # unconditional dependencies were followed on the first visit
+            pending.append((dep["name"], dep["extras"]))
+    return followed
+
+
+def plan_sync(requirements, packages, environment, direct_names=None):
+    """Diff installed packages against target requirements
+
+    Returns a plan with "install" (missing), "change" (installed version does
+    not satisfy the target; (requirement, old version)), "remove" (installed,
+    but neither required nor a dependency of something required),
+    "unchanged" and "direct" (URLs, paths and editables, always passed to pip).
+    direct_names ({name: extras}, see direct_requirement_names()) names the
+    distributions behind unnamed direct requirements, whose dependencies are
+    kept as well.
+    """
+    installed = {canonical_name(info["name"]): info for info in packages}
+    plan = {"install": [], "change": [], "remove": [], "unchanged": [], "direct": []}
+    wanted = [(name, set(extras)) for name, extras in (direct_names or {}).items()]
+    for requirement in requirements:
+        req = split_requirement(requirement)
+        if req["marker"] and not marker_applies(req["marker"], environment):
+            continue
+        if req["name"] is not None:
+            wanted.append((req["name"], req["extras"]))
+        if req["direct"]:
+            plan["direct"].append(req["raw"])
+        elif req["name"] not in installed:
+            plan["install"].append(req["raw"])
+        elif not version_matches(installed[req["name"]]["version"], req["specifiers"]):
+            plan["change"].append((req["raw"], installed[req["name"]]["version"]))
+        else:
+            plan["unchanged"].append(req["raw"])
+
+    # Keep everything the wanted packages depend on (per installed metadata)
+    keep = set(dependency_closure(wanted, installed, environment)) | set(PROTECTED_PACKAGES)
+    plan["remove"] = sorted(installed[name]["name"] for name in installed if name not in keep)
+    return plan
+
+
+def sync_removals(planned, requirements, packages, environment, direct_names=None):
+    """Return the planned removals that are still unneeded once the installs are done
+
+    packages is the inventory read after pip ran: packages that an upgraded
+    version or a direct requirement now depends on are kept, and nothing
+    beyond what the user approved in planned is ever removed.
+    """
+    unneeded = {canonical_name(name) for name in plan_sync(requirements, packages, environment, direct_names)["remove"]}
+    return [name for name in planned if canonical_name(name) in unneeded]
+
+
+REPORT_PIP = (22, 2)  # first pip with "install --report"
+
+
+def estimate_download_size(pip_path, requirements, run=None, find_links=None):
+    """Resolve requirements with "pip install --dry-run --report" and estimate the bytes to download
+
+    Returns (resolved "name==version" list, estimated bytes or None if unknown,
+    resolved distributions). The distributions are dicts with name, version,
+    requires, extras and direct, in the shape plan_sync() reads. Local files
+    (e.g. wheelhouse wheels) count as zero; remote sizes are read from HTTP
+    HEAD requests in parallel.
+    """
+    fd, report_file = tempfile.mkstemp(prefix="pip-dry-run-", suffix=".json")
+    os.close(fd)
+    try:
+        cmd = [pip_path, "install", "--dry-run", "--report", report_file]
+        if find_links and os.path.isdir(find_links):
+            cmd += ["--find-links", find_links]
+        (run or Wheelhouse._run)(cmd + list(requirements))
+        with open(report_file, 'r', encoding="utf-8") as f:
+            report = json.load(f)
+    finally:
+        try:
+            os.remove(report_file)
+        except OSError:
+            pass
+
+    resolved, urls, dists = [], [], []
+    for item in report.get("install", []):
+        metadata = item.get("metadata", {})
+        resolved.append(f"{metadata.get('name')}=={metadata.get('version')}")
+        if metadata.get("name"):
+            dists.append({"name": metadata["name"], "version": metadata.get("version", ""),
+                          "requires": metadata.get("requires_dist", []),
+                          "extras": {canonical_name(e) for e in item.get("requested_extras") or []},
+                          "direct": bool(item.get("is_direct"))})
+        url = item.get("download_info", {}).get("url", "")
+        if url.startswith(("http://", "https://")):
+            urls.append(url)
+
+    def head_size(url):
+        try:
+            request = urllib.request.Request(url, method="HEAD")
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return int(response.headers.get("Content-Length"))
+        except Exception:
+            return None
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+        sizes = list(pool.map(head_size, urls))
+    if any(size is None for size in sizes):
+        return resolved, None, dists
+    return resolved, sum(sizes), dists
+
+
+class PackageIndex:
+    """Inverted index from distribution name to the environments that have it
+
+    Built from PackageInventory results and updated per environment: an
+    environment is re-indexed only when its inventory changed, so keeping
+    the index current costs one site-packages stat per environment.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.by_name = {}   # canonical name -> {env_path: (display name, version)}
+        self.by_env = {}    # env_path -> {canonical name: (display name, version)}
+        self.sources = {}   # env_path -> inventory list the entry was built from
+
+    def update_env(self, env_path, packages):
+        """Re-index one environment from its package list, applying only the differences"""
+        new = {canonical_name(info["name"]): (info["name"], info["version"]) for info in packages}
+        with self.lock:
+            old = self.by_env.get(env_path, {})
+            for name in old.keys() - new.keys():
+                envs = self.by_name.get(name, {})
+                envs.pop(env_path, None)
+                if not envs:
+                    self.by_name.pop(name, None)
+            for name, entry in new.items():
+                if old.get(name) != entry:
+                    self.by_name.setdefault(name, {})[env_path] = entry
+            self.by_env[env_path] = new
+            self.sources[env_path] = packages
+
+    def remove_env(self, env_path):
+        with self.lock:
+            for name in self.by_env.pop(env_path, {}):
+                envs = self.by_name.get(name, {})
+                envs.pop(env_path, None)
+                if not envs:
+                    self.by_name.pop(name, None)
+            self.sources.pop(env_path, None)
+
+    def sync(self, inventory, env_paths):
+        """Bring the index in line with the given environments; returns how many were re-indexed"""
+        env_paths = {os.path.abspath(path) for path in env_paths}
+        for env_path in set(self.by_env) - env_paths:
+            self.remove_env(env_path)
+        changed = []
+        for env_path in env_paths:
+            try:
+                packages = inventory.get(env_path)
+            except OSError:
+                continue
+            # PackageInventory returns the same list object while nothing changed
+            if self.sources.get(env_path) is not packages:
+                self.update_env(env_path, packages)
+                changed.append(env_path)
+        if changed:
+            inventory.save()
+        return len(changed)
+
+    def search(self, query):
+        """Return sorted (name, version, env_path) matches for a query like "requests<2.31" """
+        pattern, specifiers = parse_package_query(query)
+        with self.lock:
+            if any(c in pattern for c in "*?"):
+                names = [name for name in self.by_name if fnmatch.fnmatchcase(name, pattern)]
+            else:
+                names = [pattern] if pattern in self.by_name else []
+            candidates = [(entry[0], entry[1], env_path)
+                          for name in names for env_path, entry in self.by_name[name].items()]
+        matches = [c for c in candidates if version_matches(c[1], specifiers)]
+        matches.sort(key=lambda c: (canonical_name(c[0]), c[2]))
+        return matches
+
+
+class PipProgress:
+    """Turns pip's output into a phase, a progress fraction and a detail line
+
+    pip prints no totals up front, so the fraction tracks fetched versus
+    discovered requirements while resolving (the first 60%), wheel builds
+    (up to 75%) and then jumps to installing and done.
+    """
+
+    SIZE_UNITS = {"b": 1, "bytes": 1, "kb": 1000, "mb": 1000 ** 2, "gb": 1000 ** 3}
+
+    def __init__(self, requested=0):
+        self.requested = requested
+        self.phase = "Resolving"
+        self.found = set()
+        self.fetched = 0
+        self.downloaded_bytes = 0
+        self.to_build = 0
+        self.built = 0
+        self.to_install = 0
+        self.fraction = 0.0
+
+    def feed(self, line):
+        """Update the state from one line of pip output"""
+        text = line.strip()
+        if text.startswith(("Collecting ", "Processing ", "Requirement already satisfied: ")):
+            name = requirement_name(text.split(" ", 3)[-1] if text.startswith("Requirement") else text.split(" ", 1)[1])
+            self.found.add(name or text)
+            if not text.startswith("Collecting "):
+                self.fetched += 1
+        elif text.startswith(("Downloading ", "Using cached ")):
+            if ".metadata" not in text.split(" (")[0]:
+                self.fetched += 1
+                match = re.search(r"\(([\d.]+)\s*([kMG]?B|bytes)\)", text)
+                if match and text.startswith("Downloading "):
+                    self.downloaded_bytes += int(float(match.group(1)) * self.SIZE_UNITS[match.group(2).lower()])
+        elif text.startswith("Building wheels for collected packages:"):
+            self.phase = "Building wheels"
+            self.to_build = len(text.split(":", 1)[1].split(","))
+        elif text.startswith("Building wheel for ") and text.endswith(("done", "error")):
+            self.built += 1
+        elif text.startswith("Installing collected packages:"):
+            self.phase = "Installing"
+            self.to_install = len(text.split(":", 1)[1].split(","))
+        elif text.startswith("Successfully installed"):
+            self.phase = "Done"
+        self.fraction = max(self.fraction, self._fraction())
+
+    def _fraction(self):
+        if self.phase == "Done":
+            return 1.0
+        if self.phase == "Installing":
+            return 0.8
+        if self.phase == "Building wheels":
+            return 0.6 + 0.15 * self.built / max(self.to_build, 1)
+        return 0.6 * min(self.fetched, len(self.found)) / max(len(self.found), self.requested, 1)
+
+    def detail(self):
+        if self.phase == "Installing":
+            return f"Installing {self.to_install} packages"
+        if self.phase == "Building wheels":
+            return f"Built {self.built} of {self.to_build} wheels"
+        if self.phase == "Done":
+            return "Finished"
+        return (f"{len(self.found)} requirements found, {self.fetched} fetched, "
+                f"{format_size(self.downloaded_bytes)} downloaded")
+
+
+class ProcessStream:
+    """Runs commands one at a time with their output streamed line by line
+
+    Output is read from a pipe as it is produced and handed to on_line, so
+    nothing accumulates in memory beyond a short tail kept for error
+    messages. The UI polls snapshot() and may call cancel() from the main
+    thread, which kills the whole process tree.
+
+    Tools (venv, pip) get no stdin and run with PYTHONUNBUFFERED set so
+    their output arrives line by line. An interactive stream runs the
+    user's own programs instead: the environment is passed through
+    unchanged and stdin is a pipe fed by send() until close_input().
+    """
+
+    TAIL_LINES = 200
+    KILL_GRACE = 5
+
+    def __init__(self, on_line=None, interactive=False):
+        self.on_line = on_line
+        self.interactive = interactive
+        self.message = ""
+        self.progress = None
+        self.process = None
+        self.started = None
+        self.cancelled = False
+        self.finished = False
+        self.tail = collections.deque(maxlen=self.TAIL_LINES)
+        self.lock = threading.Lock()
+
+    def run(self, cmd, message=None, progress=None, env=None, cwd=None):
+        """Run cmd to completion, raising CalledProcessError or CopyCancelled"""
+        if message is not None:
+            self.message = message
+        self.progress = progress
+        self.tail.clear()
+        if not self.interactive:
+            env = dict(env if env is not None else os.environ, PYTHONUNBUFFERED="1")
+        if os.name == "nt":
+            kwargs = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+        else:
+            kwargs = {"start_new_session": True}
+        if self.on_line:
+            self.on_line("$ " + subprocess.list2cmdline(cmd))
+        with self.lock:
+            if self.cancelled:
+                raise CopyCancelled()
+            self.started = None
+            self.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                            stdin=subprocess.PIPE if self.interactive else subprocess.DEVNULL,
+                                            text=True, errors="replace",
+                                            bufsize=1, env=env, cwd=cwd, **kwargs)
+            self.started = time.perf_counter()
+        try:
+            for line in self.process.stdout:
+                line = line.rstrip("\r\n")
+                self.tail.append(line)
+                if progress is not None:
+                    progress.feed(line)
+                if self.on_line:
+                    self.on_line(line)
+        finally:
+            self.process.stdout.close()
+            self.close_input()
+            returncode = self.process.wait()
+        if self.cancelled:
+            raise CopyCancelled()
+        if returncode != 0:
+            output = "\n".join(self.tail)
+            raise subprocess.CalledProcessError(returncode, cmd, output=output, stderr=output)
+
+    def send(self, text):
+        """Write text to an interactive command's stdin; False if it no longer reads input"""
+        with self.lock:
+            process = self.process
+        if process is None or process.stdin is None or process.poll() is not None:
+            return False
+        try:
+            process.stdin.write(text)
+            process.stdin.flush()
+            return True
+        except (OSError, ValueError):
+            return False  # the program exited or closed its stdin
+
+    def close_input(self):
+        """Close an interactive command's stdin, so its next read sees end of file"""
+        with self.lock:
+            process = self.process
+        if process is not None and process.stdin is not None:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+    def cancel(self):
+        """Stop the current command and everything it started"""
+        with self.lock:
+            self.cancelled = True
+            process = self.process
+        if process is None or process.poll() is not None:
+            return
+        try:
+            if os.name == "nt":
+                subprocess.run(["taskkill", "/T", "/F", "/PID", str(process.pid)], capture_output=True)
+                return
+            os.killpg(process.pid, signal.SIGTERM)
+        except OSError:
+            return
+
+        def force_kill():
+            try:
+                process.wait(self.KILL_GRACE)
+            except subprocess.TimeoutExpired:
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except OSError:
+                    pass
+        threading.Thread(target=force_kill, daemon=True).start()
+
+    def snapshot(self):
+        """Return (message, fraction or None, detail) for the current command"""
+        progress = self.progress
+        if progress is None:
+            return self.message, None, self.tail[-1] if self.tail else ""
+        return self.message, progress.fraction, progress.detail()
+
+
+class Job:
+    """One operation submitted to the JobScheduler"""
+
+    QUEUED, RUNNING, DONE, FAILED, CANCELLED = "Queued", "Running", "Done", "Failed", "Cancelled"
+
+    def __init__(self, job_id, title, func, keys, priority, on_done=None):
+        self.id = job_id
+        self.on_done = on_done
+        self.title = title
+        self.func = func
+        self.keys = keys
+        self.priority = priority
+        self.state = self.QUEUED
+        self.error = ""
+        self.created = time.time()
+        self.started = None
+        self.ended = None
+        self.cancel_requested = False
+        self.cancel_hooks = []
+
+    def on_cancel(self, hook):
+        """Register a callable that stops the running work (e.g. ProcessStream.cancel)"""
+        self.cancel_hooks.append(hook)
+        if self.cancel_requested:
+            hook()
+
+    def check_cancelled(self):
+        if self.cancel_requested:
+            raise CopyCancelled()
+
+    def duration(self):
+        if self.started is None:
+            return None
+        return (self.ended or time.time()) - self.started
+
+
+class JobScheduler:
+    """Bounded worker pool running jobs by priority with per-environment locks
+
+    Each job names the environment paths it touches; a queued job only starts
+    once none of its paths is held by a running job, so e.g. a delete waits
+    for a create of the same environment. Jobs that are blocked don't hold
+    up later jobs on other environments. on_change() is called from worker
+    threads whenever a job changes state.
+    """
+
+    HIGH, NORMAL, LOW = 0, 1, 2
+    HISTORY = 200
+
+    def __init__(self, workers=4, on_change=None):
+        self.workers = max(1, workers)
+        self.on_change = on_change
+        self.cond = threading.Condition()
+        self.queue = []  # sorted (priority, seq, job)
+        self.running = []
+        self.finished = collections.deque(maxlen=self.HISTORY)
+        self.locked = set()
+        self.seq = 0
+        self.thread_count = 0
+        self.stopped = False
+        self._spawn()
+
+    @staticmethod
+    def lock_key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def _spawn(self):
+        with self.cond:
+            while self.thread_count < self.workers:
+                self.thread_count += 1
+                threading.Thread(target=self._worker, daemon=True).start()
+
+    def resize(self, workers):
+        """Change the number of jobs that may run at once"""
+        with self.cond:
+            self.workers = max(1, workers)
+            self.cond.notify_all()
+        self._spawn()
+
+    def submit(self, title, func, envs=(), priority=NORMAL, on_done=None):
+        """Queue func(job) to run on a worker thread and return its Job
+
+        on_done(job) is called once the job has finished, failed or was
+        cancelled, including when it is cancelled before it started.
+        """
+        with self.cond:
+            self.seq += 1
+            job = Job(self.seq, title, func, {self.lock_key(p) for p in envs}, priority, on_done)
+            bisect.insort(self.queue, (priority, self.seq, job))
+            self.cond.notify()
+        self._changed()
+        return job
+
+    def cancel(self, job):
+        """Drop a queued job or ask a running one to stop"""
+        dequeued = False
+        with self.cond:
+            for i, entry in enumerate(self.queue):
+                if entry[2] is job:
+                    del self.queue[i]
+                    job.state = Job.CANCELLED
+                    job.ended = time.time()
+                    self.finished.append(job)
+                    dequeued = True
+                    break
+            else:
+                if job.state != Job.RUNNING:
+                    return
+                job.cancel_requested = True
+        # A running job gets its on_done from the worker, even if it ends as cancelled
+        if dequeued:
+            self._done(job)
+        for hook in list(job.cancel_hooks):
+            try:
+                hook()
+            except Exception as e:
+                print(f"Error cancelling job '{job.title}': {e}")
+        self._changed()
+
+    def is_busy(self, path):
+        """Return True if a queued or running job touches path"""
+        key = self.lock_key(path)
+        with self.cond:
+            return key in self.locked or any(key in entry[2].keys for entry in self.queue)
+
+    def jobs(self):
+        """Return all known jobs: running, then queued, then finished (newest first)"""
+        with self.cond:
+            return list(self.running) + [entry[2] for entry in self.queue] + list(reversed(self.finished))
+
+    def clear_finished(self):
+        with self.cond:
+            self.finished.clear()
+        self._changed()
+
+    def _changed(self):
+        if self.on_change:
+            self.on_change()
+
+    def _done(self, job):
+        if job.on_done:
+            try:
+                job.on_done(job)
+            except Exception as e:
+                print(f"Error finishing job '{job.title}': {e}")
+
+    def _next_job(self):
+        for i, (_priority, _seq, job) in enumerate(self.queue):
+            if not (job.keys & self.locked):
+                del self.queue[i]
+                return job
+        return None
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                job = None
+                while job is None:
+                    if self.stopped or self.thread_count > self.workers:
+                        self.thread_count -= 1
+                        return
+                    job = self._next_job()
+                    if job is None:
+                        self.cond.wait()
+                job.state = Job.RUNNING
+                job.started = time.time()
+                self.locked |= job.keys
+                self.running.append(job)
+            self._changed()
+            try:
+                job.func(job)
+                job.state = Job.DONE
+            except CopyCancelled:
+                job.state = Job.CANCELLED
+            except Exception as e:
+                job.state = Job.FAILED
+                job.error = str(e).strip().splitlines()[0] if str(e).strip() else type(e).__name__
+            finally:
+                with self.cond:
+                    job.ended = time.time()
+                    self.locked -= job.keys
+                    self.running.remove(job)
+                    self.finished.append(job)
+                    self.cond.notify_all()
+                self._done(job)
+                self._changed()
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+
+
+class ProgressWindow:
+    """Non-modal progress dialog with a determinate bar, a detail line and Cancel
+
+    Must be created and updated from the Tk main thread.
+    """
+
+    def __init__(self, root, title, message, on_cancel=None):
+        self.window = tk.Toplevel(root)
+        self.window.title(title)
+        self.window.geometry("420x150")
+        self.window.resizable(False, False)
+        self.window.transient(root)
+        self.window.protocol("WM_DELETE_WINDOW", self.cancel if on_cancel else (lambda: None))
+        self.on_cancel = on_cancel
+
+        self.message_var = tk.StringVar(value=message)
+        ttk.Label(self.window, textvariable=self.message_var, anchor=tk.W, font=("Segoe UI", 10)).pack(
+            fill=tk.X, padx=15, pady=(15, 5))
+        self.progress = ttk.Progressbar(self.window, mode="determinate", maximum=1000)
+        self.progress.pack(fill=tk.X, padx=15, pady=5)
+        self.detail_var = tk.StringVar()
+        ttk.Label(self.window, textvariable=self.detail_var, anchor=tk.W, font=("Courier", 9)).pack(
+            fill=tk.X, padx=15)
+        if on_cancel:
+            self.cancel_button = ttk.Button(self.window, text="Cancel", command=self.cancel)
+            self.cancel_button.pack(side=tk.RIGHT, padx=15, pady=10)
+
+    def update(self, fraction=None, message=None, detail=None):
+        if fraction is None:
+            if str(self.progress["mode"]) != "indeterminate":
+                self.progress.configure(mode="indeterminate")
+                self.progress.start(10)
+        else:
+            if str(self.progress["mode"]) != "determinate":
+                self.progress.stop()
+                self.progress.configure(mode="determinate")
+            self.progress["value"] = int(max(0.0, min(1.0, fraction)) * 1000)
+        if message is not None:
+            self.message_var.set(message)
+        if detail is not None:
+            self.detail_var.set(detail)
+
+    def cancel(self):
+        if self.on_cancel:
+            self.cancel_button.configure(state=tk.DISABLED)
+            self.message_var.set("Cancelling...")
+            self.on_cancel()
+
+    def close(self):
+        try:
+            self.progress.stop()
+            self.window.destroy()
+        except tk.TclError:
+            pass
+
+
+class LogPane:
+    """Collapsible read-only text pane for streamed process output
+
+    write() may be called from any thread; lines are queued and appended to
+    the widget in batches from the Tk main loop, keeping at most MAX_LINES.
+    With collapsible=False the text is always shown and has no toggle.
+    """
+
+    MAX_LINES = 5000
+    FLUSH_MS = 100
+
+    def __init__(self, parent, collapsible=True):
+        self.frame = ttk.Frame(parent)
+        self.toggle_text = tk.StringVar(value="\u25b8 Show Output")
+        if collapsible:
+            ttk.Button(self.frame, textvariable=self.toggle_text, command=self.toggle).pack(anchor=tk.W)
+        self.body = ttk.Frame(self.frame)
+        self.text = tk.Text(self.body, height=10, wrap=tk.NONE, font=("Courier", 9), state=tk.DISABLED)
+        scrollbar = ttk.Scrollbar(self.body, orient=tk.VERTICAL, command=self.text.yview)
+        self.text.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.pending = collections.deque()
+        self.lock = threading.Lock()
+        self.scheduled = False
+        self.expanded = False
+        if not collapsible:
+            self.body.pack(fill=tk.BOTH, expand=True)
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def configure_colors(self, background, text):
+        self.text.configure(background=background, foreground=text, insertbackground=text)
+
+    def toggle(self):
+        self.expanded = not self.expanded
+        if self.expanded:
+            self.body.pack(fill=tk.BOTH, expand=True, pady=(5, 0))
+            self.toggle_text.set("\u25be Hide Output")
+        else:
+            self.body.pack_forget()
+            self.toggle_text.set("\u25b8 Show Output")
+
+    def write(self, line):
+        with self.lock:
+            self.pending.append(line)
+            if self.scheduled:
+                return
+            self.scheduled = True
+        self.frame.after(self.FLUSH_MS, self._flush)
+
+    def _flush(self):
+        with self.lock:
+            lines = list(self.pending)
+            self.pending.clear()
+            self.scheduled = False
+        if not lines or not self.text.winfo_exists():
+            return  # nothing new, or the pane was destroyed (e.g. a closed run console)
+        at_bottom = self.text.yview()[1] >= 0.999
+        self.text.configure(state=tk.NORMAL)
+        self.text.insert(tk.END, "\n".join(lines) + "\n")
+        excess = int(self.text.index("end-1c").split(".")[0]) - 1 - self.MAX_LINES
+        if excess > 0:
+            self.text.delete("1.0", f"{excess + 1}.0")
+        self.text.configure(state=tk.DISABLED)
+        if at_bottom:
+            self.text.see(tk.END)
+
+
+class RunConsole:
+    """Embedded console that runs one program and streams its output
+
+    start() runs the command on a background thread through a ProcessStream
+    and writes the output to a LogPane. The header shows the start latency
+    (from the request to the process being spawned, and to its first output)
+    and the runtime, which keeps ticking while the process runs. Lines typed
+    into the input field below the output go to the program's stdin, and
+    "Send EOF" closes it. Each console owns its process, so several can run
+    side by side.
+    """
+
+    TICK_MS = 250
+
+    def __init__(self, parent, on_close):
+        self.frame = ttk.Frame(parent)
+        header = ttk.Frame(self.frame)
+        header.pack(fill=tk.X, pady=(5, 0))
+        self.status_var = tk.StringVar(value="Starting...")
+        ttk.Label(header, textvariable=self.status_var, anchor=tk.W).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        ttk.Button(header, text="Close", command=on_close).pack(side=tk.RIGHT, padx=5)
+        self.stop_button = ttk.Button(header, text="Stop", command=self.stop)
+        self.stop_button.pack(side=tk.RIGHT)
+        self.log = LogPane(self.frame, collapsible=False)
+        self.log.pack(fill=tk.BOTH, expand=True, pady=5)
+        input_row = ttk.Frame(self.frame)
+        input_row.pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(input_row, text="Input:").pack(side=tk.LEFT, padx=5)
+        self.input_var = tk.StringVar()
+        self.input_entry = ttk.Entry(input_row, textvariable=self.input_var)
+        self.input_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.input_entry.bind("<Return>", lambda e: self.send_input())
+        self.eof_button = ttk.Button(input_row, text="Send EOF", command=self.send_eof)
+        self.eof_button.pack(side=tk.RIGHT, padx=5)
+        self.stream = ProcessStream(on_line=self._on_line, interactive=True)
+        self.requested = None
+        self.first_output = None
+        self.ended = None
+        self.exit_status = None
+        self.tick_id = None
+        self.closed = False
+
+    def start(self, cmd, env=None, cwd=None, requested=None):
+        """Run cmd; requested is the perf_counter() time the user asked for the run"""
+        self.requested = requested or time.perf_counter()
+        threading.Thread(target=self._run, args=(cmd, env, cwd), daemon=True).start()
+        self._tick()
+
+    def _run(self, cmd, env, cwd):
+        try:
+            self.stream.run(cmd, env=env, cwd=cwd)
+            self.exit_status = "exited with code 0"
+        except subprocess.CalledProcessError as e:
+            self.exit_status = f"exited with code {e.returncode}"
+        except CopyCancelled:
+            self.exit_status = "stopped"
+        except OSError as e:
+            self.log.write(f"Could not start: {e}")
+            self.exit_status = "failed to start"
+        finally:
+            self.ended = time.perf_counter()
+            self.stream.finished = True
+
+    def _on_line(self, line):
+        # The command echo comes before the process is spawned and doesn't count as output
+        if self.first_output is None and self.stream.started is not None:
+            self.first_output = time.perf_counter()
+        self.log.write(line)
+
+    @property
+    def running(self):
+        return not self.stream.finished
+
+    def stop(self):
+        self.stream.cancel()
+
+    def send_input(self):
+        """Send the input field's line to the program, echoing it in the output"""
+        line = self.input_var.get()
+        if self.stream.send(line + "\n"):
+            self.log.write(line)
+            self.input_var.set("")
+
+    def send_eof(self):
+        self.stream.close_input()
+        self.input_entry.state(["disabled"])
+        self.eof_button.state(["disabled"])
+
+    def close(self):
+        """Stop the program and destroy the console; callbacks still pending become no-ops"""
+        self.closed = True
+        if self.tick_id is not None:
+            self.frame.after_cancel(self.tick_id)
+            self.tick_id = None
+        self.stop()
+        self.frame.destroy()
+
+    def _tick(self):
+        self.tick_id = None
+        if self.closed:
+            return
+        started = self.stream.started
+        parts = []
+        if started is not None:
+            parts.append(f"started in {(started - self.requested) * 1000:.0f} ms")
+            if self.first_output is not None:
+                parts.append(f"first output after {(self.first_output - self.requested) * 1000:.0f} ms")
+            parts.append(f"runtime {format_duration((self.ended or time.perf_counter()) - started)}")
+        if self.stream.finished:
+            status = (self.exit_status or "finished").capitalize()
+        else:
+            status = "Running" if parts else "Starting..."
+        self.status_var.set(" - ".join([status, ", ".join(parts)]) if parts else status)
+        if self.stream.finished:
+            for widget in (self.stop_button, self.input_entry, self.eof_button):
+                widget.state(["disabled"])
+            return
+        self.tick_id = self.frame.after(self.TICK_MS, self._tick)
+
+
+class DiskUsage(JsonCache):
+    """Disk usage per environment, counting hardlinked files once
+
+    measure() walks an environment with os.scandir. For every directory the
+    cache keeps its mtime, its subdirectory names, its own size and the
+    (inode, size) of every file in it. Totals count each inode once, so a
+    file that gains a hardlink elsewhere later (a clone or a snapshot) is
+    not counted twice even though this directory's mtime did not change. A
+    directory whose mtime is unchanged is not listed again, so a rescan
+    costs one stat per directory and only changed subtrees are revisited.
+    Files rewritten in place keep the directory mtime and are picked up once
+    something else in that directory changes, which pip's installs always
+    do (see TreeCopier). Sizes are allocated blocks where the platform
+    reports them.
+    """
+
+    VERSION = 2
+    FIELD = "envs"
+    NAME = "disk usage cache"
+    WORKERS = 8
+
+    @staticmethod
+    def _list_dir(path, st):
+        """Return the cache entry for one directory, or None if it can't be listed"""
+        # The directory's own blocks count too, as they do for du
+        own_size = st.st_blocks * 512 if hasattr(st, "st_blocks") else 0
+        entry = {"mtime": st.st_mtime_ns, "dev": st.st_dev, "dirs": [], "bytes": own_size, "files": 0, "inodes": []}
+        try:
+            with os.scandir(path) as it:
+                for item in it:
+                    try:
+                        if item.is_dir(follow_symlinks=False):
+                            entry["dirs"].append(item.name)
+                            continue
+                        item_st = item.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    size = item_st.st_blocks * 512 if hasattr(item_st, "st_blocks") else item_st.st_size
+                    entry["files"] += 1
+                    # Link counts change without touching this directory, so every file is recorded
+                    entry["inodes"].append([item_st.st_ino, size])
+        except OSError:
+            return None
+        return entry
+
+    def measure(self, env_path):
+        """Return the bytes used by one environment, relisting only changed directories"""
+        with self.lock:
+            old_dirs = (self.entries.get(env_path) or {}).get("dirs", {})
+        dirs = {}
+        stack = [""]
+        while stack:
+            rel_dir = stack.pop()
+            path = os.path.join(env_path, rel_dir) if rel_dir else env_path
+            try:
+                st = os.lstat(path)
+            except OSError:
+                continue
+            entry = old_dirs.get(rel_dir)
+            if entry is None or entry["mtime"] != st.st_mtime_ns:
+                entry = self._list_dir(path, st)
+                if entry is None:
+                    continue
+            dirs[rel_dir] = entry
+            stack.extend(os.path.join(rel_dir, name) for name in entry["dirs"])
+
+        result = {"dirs": dirs, "bytes": self.total([dirs]), "files": sum(e["files"] for e in dirs.values())}
+        with self.lock:
+            if self.entries.get(env_path) != result:
+                self.entries[env_path] = result
+                self.dirty = True
+        return result["bytes"]
+
+    @staticmethod
+    def total(dir_maps):
+        """Add up directory entries, counting each inode once across all of them"""
+        total, seen = 0, set()
+        for dirs in dir_maps:
+            for entry in dirs.values():
+                total += entry["bytes"]
+                for ino, size in entry["inodes"]:
+                    key = (entry["dev"], ino)
+                    if key not in seen:
+                        seen.add(key)
+                        total += size
+        return total
+
+    def scan(self, env_paths, on_result=None):
+        """Measure several environments concurrently; on_result(env_path, bytes) is called as each finishes"""
+        sizes = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            futures = {pool.submit(self.measure, path): path for path in env_paths}
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    sizes[futures[future]] = future.result()
+                except Exception as e:
+                    print(f"Error measuring {futures[future]}: {e}")
+                    continue
+                if on_result is not None:
+                    on_result(futures[future], sizes[futures[future]])
+        self.save()
+        return sizes
+
+    def get(self, env_path):
+        """Return the last measured size of an environment, or None"""
+        with self.lock:
+            result = self.entries.get(env_path)
+        return result["bytes"] if result else None
+
+    def combined(self, env_paths):
+        """Return the bytes used by several environments together; shared files count once"""
+        with self.lock:
+            dir_maps = [self.entries[path]["dirs"] for path in env_paths if path in self.entries]
+        return self.total(dir_maps)
+
+    def forget(self, env_paths):
+        with self.lock:
+            for path in env_paths:
+                if self.entries.pop(path, None) is not None:
+                    self.dirty = True
+
+
+class HealthCheck(JsonCache):
+    """Health checks of environments, run in parallel and cached until something relevant changes
+
+    diagnose() checks that the environment's interpreter link resolves, that
+    pyvenv.cfg names a home folder that exists and the Python version the
+    interpreter reports, that pip is installed (unless the environment was
+    created without it) and that the interpreter starts and can import
+    PROBE_MODULES. Results are cached in a JSON file, stamped with the
+    mtimes and inodes of pyvenv.cfg, the scripts and site-packages folders,
+    the home folder and the resolved base interpreter, so an environment is
+    only probed again when it or its base interpreter changes.
+    """
+
+    VERSION = 1
+    FIELD = "envs"
+    NAME = "health check cache"
+    WORKERS = 8
+    TIMEOUT = 20
+    PROBE_MODULES = ("json", "ssl")
+    PROBE = ("import sys; " + "".join(f"import {name}; " for name in PROBE_MODULES) +
+             "sys.stdout.write('%d.%d.%d' % tuple(sys.version_info[:3]))")
+
+    @staticmethod
+    def python_path(env_path):
+        return os.path.join(env_scripts_dir(env_path), "python.exe" if os.name == "nt" else "python")
+
+    @classmethod
+    def stamp(cls, env_path):
+        """Return the mtimes and inodes the cached result of an environment depends on"""
+        paths = [os.path.join(env_path, "pyvenv.cfg"), env_scripts_dir(env_path)] + env_site_packages(env_path)
+        paths += [read_pyvenv_cfg(env_path).get("home", ""), os.path.realpath(cls.python_path(env_path))]
+        stamp = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+                stamp.append([path, st.st_mtime_ns, st.st_ino])
+            except OSError:
+                stamp.append([path, None, None])
+        return stamp
+
+    @classmethod
+    def diagnose(cls, env_path):
+        """Run the checks on one environment; returns (problems, warnings)"""
+        problems, warnings = [], []
+        cfg = read_pyvenv_cfg(env_path)
+        if not os.path.isfile(os.path.join(env_path, "pyvenv.cfg")):
+            problems.append("pyvenv.cfg is missing")
+        elif not cfg.get("home"):
+            problems.append("pyvenv.cfg has no home entry")
+        elif not os.path.isdir(cfg["home"]):
+            problems.append(f"The base interpreter folder {cfg['home']} no longer exists")
+
+        python = cls.python_path(env_path)
+        rel_python = os.path.relpath(python, env_path)
+        if os.path.islink(python) and not os.path.exists(python):
+            problems.append(f"{rel_python} is a dangling link to {os.path.realpath(python)}")
+        elif not os.path.exists(python):
+            problems.append(f"{rel_python} is missing")
+        else:
+            try:
+                result = subprocess.run([python, "-E", "-c", cls.PROBE], capture_output=True, text=True,
+                                        timeout=cls.TIMEOUT,
+                                        creationflags=subprocess.CREATE_NO_WINDOW if os.name == "nt" else 0)
+            except subprocess.TimeoutExpired:
+                problems.append(f"The interpreter did not respond within {cls.TIMEOUT} seconds")
+            except OSError as e:
+                problems.append(f"The interpreter cannot be started: {e}")
+            else:
+                if result.returncode != 0:
+                    output = result.stderr.strip().splitlines()
+                    problems.append("The probe import failed: " + (output[-1] if output else f"exit code {result.returncode}"))
+                else:
+                    expected = cfg.get("version_info") or cfg.get("version", "")
+                    actual = result.stdout.strip()
+                    # A different minor version means site-packages is in the wrong folder
+                    if expected and version_tuple(expected)[:2] != version_tuple(actual)[:2]:
+                        problems.append(f"pyvenv.cfg is for Python {expected} but the interpreter is {actual}")
+                    elif expected and version_tuple(expected)[:3] != version_tuple(actual)[:3]:
+                        warnings.append(f"pyvenv.cfg records Python {expected}; the interpreter is now {actual}")
+
+        if not read_env_settings(env_path).get("spec", {}).get("no_pip") and not installed_version(env_path, "pip"):
+            warnings.append("pip is not installed")
+        return problems, warnings
+
+    def check(self, env_path, force=False):
+        """Return the health of an environment, from the cache unless it or its base interpreter changed
+
+        The result has status ("ok", "warning" or "broken"), problems and checked.
+        """
+        stamp = self.stamp(env_path)
+        with self.lock:
+            cached = self.entries.get(env_path)
+        if not force and cached is not None and cached["stamp"] == stamp:
+            return cached
+        problems, warnings = self.diagnose(env_path)
+        result = {
+            "status": "broken" if problems else "warning" if warnings else "ok",
+            "problems": problems + warnings,
+            "checked": time.time(),
+            "stamp": stamp
+        }
+        with self.lock:
+            self.entries[env_path] = result
+            self.dirty = True
+        return result
+
+    def check_many(self, env_paths, on_result=None, force=False):
+        """Check several environments concurrently; on_result(env_path, result) is called as each finishes"""
+        results = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            futures = {pool.submit(self.check, path, force): path for path in env_paths}
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    print(f"Error checking {futures[future]}: {e}")
+                    continue
+                if on_result is not None:
+                    on_result(futures[future], results[futures[future]])
+        self.save()
+        return results
+
+    def get(self, env_path):
+        """Return the last result for an environment without checking, or None"""
+        with self.lock:
+            return self.entries.get(env_path)
+
+    def forget(self, env_paths):
+        with self.lock:
+            for path in env_paths:
+                if self.entries.pop(path, None) is not None:
+                    self.dirty = True
+
+
+class EnvIndex(JsonCache):
+    """Persistent index of environment metadata stored next to settings.json
+
+    Each entry records the environment's name, root, interpreter version,
+    directory mtime and validity. A refresh re-probes only the entries whose
+    directory mtime changed, and skips listing a directory when its own mtime
+    is unchanged. Filesystem work happens outside the lock so several roots
+    can be scanned concurrently.
+    """
+
+    VERSION = 2
+    FIELD = "dirs"
+    NAME = "environment index"
+
+    @staticmethod
+    def probe(root, path, st):
+        """Build a fresh index record for the directory at path"""
+        scripts_dir = os.path.join(path, "Scripts" if os.name == "nt" else "bin")
+        cfg = read_pyvenv_cfg(path)
+        return {
+            "name": os.path.relpath(path, root),
+            "root": root,
+            "path": path,
+            "version": cfg.get("version") or cfg.get("version_info", ""),
+            "mtime": st.st_mtime_ns,
+            "ino": st.st_ino,
+            "dir": True,
+            "valid": os.path.isdir(scripts_dir),
+        }
+
+    def _restat(self, root, path, record):
+        """Return the record for path, re-probing only if its mtime changed"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if record is not None and record["mtime"] == st.st_mtime_ns:
+            return record
+        if stat.S_ISDIR(st.st_mode):
+            return self.probe(root, path, st)
+        return {
+            "name": os.path.relpath(path, root), "root": root, "path": path, "version": "",
+            "mtime": st.st_mtime_ns, "ino": st.st_ino, "dir": False, "valid": False
+        }
+
+    def scan(self, root, depth=1, ignore=(), exclude=()):
+        """Return the valid environment records under root, re-probing only changed entries
+
+        Directories that are not environments are descended into up to depth
+        levels below root. Names matching an ignore pattern and paths listed
+        in exclude (typically other configured roots) are skipped.
+        """
+        found = []
+        self._scan_dir(root, root, depth, ignore, exclude, found)
+        return sorted(found, key=lambda r: r["name"].lower())
+
+    def _scan_dir(self, root, dirpath, depth, ignore, exclude, found):
+        dir_st = os.stat(dirpath)
+        with self.lock:
+            cached = self.entries.get(dirpath, {})
+            entries = dict(cached.get("entries", {}))
+
+        # An unchanged directory mtime means no entries were added, removed or renamed
+        if cached.get("mtime") == dir_st.st_mtime_ns:
+            names = list(entries)
+        else:
+            with os.scandir(dirpath) as it:
+                names = [entry.name for entry in it]
+
+        fresh = {}
+        changed = cached.get("mtime") != dir_st.st_mtime_ns
+        for name in names:
+            old = entries.get(name)
+            record = self._restat(root, os.path.join(dirpath, name), old)
+            if record is not old:
+                changed = True
+            if record is not None:
+                fresh[name] = record
+        if fresh.keys() != entries.keys():
+            changed = True
+
+        if changed:
+            with self.lock:
+                self.entries[dirpath] = {"mtime": dir_st.st_mtime_ns, "entries": fresh}
+                self.dirty = True
+
+        for name, record in fresh.items():
+            if any(fnmatch.fnmatch(name, pattern) for pattern in ignore):
+                continue
+            if record["valid"]:
+                found.append(record)
+            elif depth > 1 and record.get("dir") and record["path"] not in exclude:
+                try:
+                    self._scan_dir(root, record["path"], depth - 1, ignore, exclude, found)
+                except OSError:
+                    pass
+
+    def update(self, root, names):
+        """Re-stat only the named entries directly under root
+
+        Returns (records, removed_paths): the valid records among names and
+        the paths of named entries that are gone or no longer valid.
+        """
+        with self.lock:
+            entries = self.entries.get(root, {}).get("entries", {})
+            previous = {name: entries.get(name) for name in names}
+
+        records, removed_paths = [], []
+        fresh = {}
+        for name in names:
+            old = previous[name]
+            record = self._restat(root, os.path.join(root, name), old)
+            if record is not old:
+                fresh[name] = record
+            if record is None:
+                removed_paths.append(os.path.join(root, name))
+            elif record["valid"]:
+                records.append(record)
+            else:
+                removed_paths.append(record["path"])
+
+        # Merge only the named entries. The root was not listed again, so its
+        # mtime stays as the last scan saw it (unknown if it was never
+        # scanned), and a concurrent scan's entries are left alone
+        if fresh:
+            with self.lock:
+                cached = self.entries.setdefault(root, {"mtime": None, "entries": {}})
+                for name, record in fresh.items():
+                    if record is None:
+                        cached["entries"].pop(name, None)
+                    else:
+                        cached["entries"][name] = record
+                self.dirty = True
+        return records, removed_paths
+
+
+class EnvListModel:
+    """Sorted list of environment records that reports row-level changes
+
+    update() diffs a fresh scan against the current records by path and
+    patch() applies a known set of changed entries. Both pair removed and
+    added paths that share an inode as renames, and return the delete/insert
+    operations that bring a widget showing the list in sync.
+
+    The list is sorted by name, or by the disk usage in sizes (largest first
+    unless descending is False) after set_sort("size").
+    """
+
+    def __init__(self):
+        self.records = []
+        self.keys = []
+        self.by_path = {}
+        self.last_renamed = []
+        self.sizes = {}
+        self.health = {}
+        self.sort_by = "name"
+        self.descending = True
+
+    def sort_key(self, record):
+        if self.sort_by == "size":
+            # Environments not measured yet sort last
+            size = self.sizes.get(record["path"], -1)
+            return (-size if self.descending else size, record["name"].lower(), record["path"])
+        return (record["name"].lower(), record["path"])
+
+    def resort(self):
+        """Re-sort every record after the sort order or the sorted values changed"""
+        self.records.sort(key=self.sort_key)
+        self.keys = [self.sort_key(r) for r in self.records]
+        return [("reset",)]
+
+    def set_sort(self, sort_by, descending=True):
+        self.sort_by = sort_by
+        self.descending = descending
+        return self.resort()
+
+    def update_sizes(self, sizes):
+        """Merge measured sizes and return the ops to show them"""
+        self.sizes.update(sizes)
+        return self.resort() if self.sort_by == "size" else []
+
+    @staticmethod
+    def pair_renames(removed, added):
+        """Pair removed and added records with the same inode as renames"""
+        renamed = []
+        added_by_ino = {r.get("ino"): r for r in added if r.get("ino")}
+        for old in removed:
+            new = added_by_ino.pop(old.get("ino"), None)
+            if new is not None:
+                renamed.append((old, new))
+        return renamed
+
+    def diff(self, new_records, root=None):
+        """Return (removed, added, renamed) between the current and new records
+
+        With root given, only current records from that root are compared.
+        """
+        new_by_path = {r["path"]: r for r in new_records}
+        removed = [r for p, r in self.by_path.items()
+                   if p not in new_by_path and (root is None or r.get("root") == root)]
+        added = [r for p, r in new_by_path.items() if p not in self.by_path]
+        return removed, added, self.pair_renames(removed, added)
+
+    def update(self, new_records, root=None):
+        """Apply a full scan and return the ("delete", i) / ("insert", i, record) ops
+
+        A single ("reset",) op means the whole list was rebuilt. With root
+        given, new_records replace only the records scanned from that root.
+        """
+        removed, added, renamed = self.diff(new_records, root)
+        self.last_renamed = renamed
+        return self._apply(removed, added, new_records)
+
+    def patch(self, records, removed_paths):
+        """Upsert records and drop removed_paths, returning the widget ops"""
+        removed = [self.by_path[p] for p in removed_paths if p in self.by_path]
+        added = [r for r in records if r["path"] not in self.by_path]
+        self.last_renamed = self.pair_renames(removed, added)
+        return self._apply(removed, added, records)
+
+    def _apply(self, removed, added, records):
+        # Large changes (first load, switching directories) are cheaper as one re-sort
+        if len(removed) + len(added) > max(256, len(self.records) // 8):
+            for record in removed:
+                del self.by_path[record["path"]]
+            for record in records:
+                self.by_path[record["path"]] = record
+            self.records = sorted(self.by_path.values(), key=self.sort_key)
+            self.keys = [self.sort_key(r) for r in self.records]
+            return [("reset",)]
+
+        ops = []
+
+        # Delete from the bottom up so earlier indices stay valid
+        remove_idx = sorted((bisect.bisect_left(self.keys, self.sort_key(r)) for r in removed), reverse=True)
+        for i in remove_idx:
+            del self.by_path[self.records[i]["path"]]
+            del self.records[i]
+            del self.keys[i]
+            ops.append(("delete", i))
+
+        added_paths = set()
+        for record in sorted(added, key=self.sort_key):
+            key = self.sort_key(record)
+            i = bisect.bisect_left(self.keys, key)
+            self.records.insert(i, record)
+            self.keys.insert(i, key)
+            self.by_path[record["path"]] = record
+            added_paths.add(record["path"])
+            ops.append(("insert", i, record))
+
+        # Entries that stayed put but were re-probed get their fresh metadata
+        for record in records:
+            path = record["path"]
+            if path not in added_paths and self.by_path.get(path) is not record:
+                i = bisect.bisect_left(self.keys, self.sort_key(record))
+                self.records[i] = record
+                self.by_path[path] = record
+
+        return ops
+
+
+class EnvWatcher:
+    """Background watcher that reports which entries of a directory tree changed
+
+    The directories a scan of the given depth lists (the root, and below it
+    the subdirectories that are not environments) are watched for added and
+    removed entries; their children are watched for bin/Scripts and
+    pyvenv.cfg appearing or disappearing. Uses inotify on Linux; elsewhere,
+    or once inotify runs out of watches (fs.inotify.max_user_watches), it
+    polls the mtimes of those directories plus those of recently added
+    entries. Bursts of events are debounced and delivered to callback(names)
+    on the watcher thread as a set of paths relative to the root (plain
+    entry names at depth 1); None means events may have been lost and the
+    caller should rescan. Names matching an ignore pattern and paths in
+    exclude are not descended into.
+    """
+
+    DEBOUNCE = 0.3
+    MAX_DELAY = 2.0
+    POLL_INTERVAL = 2.0
+    YOUNG_SECONDS = 30
+
+    # inotify event masks from <sys/inotify.h>
+    IN_MODIFY = 0x002
+    IN_ATTRIB = 0x004
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_MOVE_SELF = 0x800
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_ONLYDIR = 0x1000000
+    IN_ISDIR = 0x40000000
+
+    ROOT_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_ATTRIB | IN_ONLYDIR
+    CHILD_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_MODIFY | IN_ONLYDIR
+
+    def __init__(self, root, callback, depth=1, ignore=(), exclude=()):
+        self.root = root
+        self.callback = callback
+        self.depth = depth
+        self.ignore = ignore
+        self.exclude = exclude
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.libc = None
+        self.fd = None
+        self.wakeup = None
+        self.watches = {}  # wd -> (path relative to the root, listed)
+
+        if sys.platform.startswith("linux"):
+            try:
+                self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+                self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+                if self.fd < 0:
+                    raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+            except Exception as e:
+                print(f"inotify unavailable, polling instead: {e}")
+                self.fd = None
+
+    def start(self):
+        """Start watching on a daemon thread"""
+        target = self._inotify_loop if self.fd is not None else self._poll_loop
+        self.thread = threading.Thread(target=target, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the watcher thread and release the inotify descriptor"""
+        self.stop_event.set()
+        wakeup = self.wakeup
+        if wakeup is not None:
+            try:
+                os.write(wakeup[1], b"x")
+            except OSError:
+                pass
+
+    def _skipped(self, rel_path):
+        name = os.path.basename(rel_path)
+        return (any(fnmatch.fnmatch(name, pattern) for pattern in self.ignore)
+                or os.path.join(self.root, rel_path) in self.exclude)
+
+    def _add_watch(self, rel_path, level):
+        """Watch one directory; raises OSError when the watch limit is reached"""
+        listed = level < self.depth
+        mask = self.ROOT_MASK if level == 0 else self.CHILD_MASK | (self.ROOT_MASK if listed else 0)
+        path = os.path.join(self.root, rel_path) if rel_path else self.root
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error in (errno.ENOSPC, errno.ENOMEM) or level == 0:
+                raise OSError(error, f"Cannot watch {path}: {os.strerror(error)}")
+            return  # gone already, or not a directory
+        self.watches[wd] = (rel_path, listed)
+        if listed:
+            try:
+                with os.scandir(path) as it:
+                    children = [entry.name for entry in it if entry.is_dir()]
+            except OSError:
+                return
+            for name in children:
+                child = os.path.join(rel_path, name)
+                if not self._skipped(child):
+                    self._add_watch(child, level + 1)
+
+    def _inotify_loop(self):
+        self.wakeup = os.pipe()
+        try:
+            self._watch_events()
+            error = None
+        except Exception as e:
+            error = e
+        finally:
+            os.close(self.fd)
+            self.watches.clear()
+            wakeup, self.wakeup = self.wakeup, None
+            for fd in wakeup:
+                os.close(fd)
+        if error is not None and not self.stop_event.is_set():
+            print(f"Watcher error, polling instead: {error}")
+            self.callback(None)  # events may have been missed while switching
+            self._poll_loop()
+
+    def _watch_events(self):
+        self._add_watch("", 0)
+        pending = set()
+        first_event = last_event = None
+        while not self.stop_event.is_set():
+            # Block indefinitely when idle, otherwise until the debounce expires
+            timeout = None
+            if first_event is not None:
+                now = time.monotonic()
+                timeout = max(0, min(last_event + self.DEBOUNCE, first_event + self.MAX_DELAY) - now)
+            ready, _, _ = select.select([self.fd, self.wakeup[0]], [], [], timeout)
+            if self.wakeup[0] in ready:
+                break
+            now = time.monotonic()
+            if self.fd in ready:
+                if not self._read_events(pending):
+                    pending = None
+                last_event = now
+                if first_event is None:
+                    first_event = now
+            if first_event is not None and (now >= last_event + self.DEBOUNCE
+                                            or now >= first_event + self.MAX_DELAY):
+                self.callback(pending)
+                pending = set()
+                first_event = last_event = None
+
+    def _read_events(self, pending):
+        """Drain queued inotify events into pending; False on queue overflow"""
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return True
+        offset = 0
+        overflow = False
+        while offset < len(data):
+            wd, mask, _cookie, length = struct.unpack_from("iIII", data, offset)
+            name = os.fsdecode(data[offset + 16:offset + 16 + length].rstrip(b"\0"))
+            offset += 16 + length
+            if mask & self.IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            if mask & self.IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            if wd not in self.watches:
+                continue
+            rel_path, listed = self.watches[wd]
+            if not listed:
+                # A change inside an entry: report the entry itself
+                if pending is not None:
+                    pending.add(rel_path)
+            elif name:
+                child = os.path.join(rel_path, name)
+                if pending is not None:
+                    pending.add(child)
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO) and mask & self.IN_ISDIR and not self._skipped(child):
+                    self._add_watch(child, child.count(os.sep) + 1)
+        return not overflow
+
+    def _poll_loop(self):
+        listings = {}  # relative path -> (mtime, {name: is_dir}) of the directories whose entries are watched
+        young = {}
+        while not self.stop_event.is_set():
+            changed = set()
+            now = time.monotonic()
+            try:
+                seen = set()
+                stack = [("", 0)]
+                while stack:
+                    rel_dir, level = stack.pop()
+                    path = os.path.join(self.root, rel_dir) if rel_dir else self.root
+                    try:
+                        mtime = os.stat(path).st_mtime_ns
+                        cached = listings.get(rel_dir)
+                        if cached is None or cached[0] != mtime:
+                            with os.scandir(path) as it:
+                                names = {entry.name: entry.is_dir() for entry in it}
+                            if cached is not None:
+                                added = names.keys() - cached[1].keys()
+                                changed |= {os.path.join(rel_dir, n) for n in added | (cached[1].keys() - names.keys())}
+                                for name in added:
+                                    young[os.path.join(rel_dir, name)] = (now, None)
+                            listings[rel_dir] = (mtime, names)
+                        else:
+                            names = cached[1]
+                    except OSError:
+                        if level == 0:
+                            raise
+                        continue  # removed since its parent was listed
+                    seen.add(rel_dir)
+                    if level + 1 < self.depth:
+                        stack.extend((os.path.join(rel_dir, name), level + 1) for name, is_dir in names.items()
+                                     if is_dir and not self._skipped(os.path.join(rel_dir, name)))
+                for rel_dir in set(listings) - seen:
+                    del listings[rel_dir]
+
+                # Entries created recently may still be gaining their bin folder
+                for rel_path, (since, last_mtime) in list(young.items()):
+                    parent = listings.get(os.path.dirname(rel_path))
+                    if now - since > self.YOUNG_SECONDS or parent is None or os.path.basename(rel_path) not in parent[1]:
+                        del young[rel_path]
+                        continue
+                    try:
+                        child_mtime = os.stat(os.path.join(self.root, rel_path)).st_mtime_ns
+                    except OSError:
+                        continue
+                    if last_mtime is not None and child_mtime != last_mtime:
+                        changed.add(rel_path)
+                    young[rel_path] = (since, child_mtime)
+            except OSError as e:
+                print(f"Watcher poll error: {e}")
+
+            if changed:
+                self.callback(changed)
+            self.stop_event.wait(self.POLL_INTERVAL)
+
+
+class VirtualEnvList:
+    """Treeview that materializes only the visible rows of an EnvListModel
+
+    The Treeview holds a fixed pool of row items, one per visible line, that
+    are refilled from the model whenever the list scrolls or changes. The
+    scrollbar is driven from the model size, so scrolling, selection and
+    redraws cost O(visible rows) regardless of how many environments exist.
+    Selection is tracked by environment path so it survives list changes.
+    """
+
+    COLUMNS = (
+        ("name", "Environment", 240),
+        ("version", "Python", 70),
+        ("size", "Size", 80),
+        ("location", "Location", 220),
+    )
+
+    def __init__(self, parent, model, on_activate):
+        self.model = model
+        self.on_activate = on_activate
+        self.top = 0
+        self.rows = 0
+        self.selected_path = None
+        self.font = tkfont.Font(family="Courier", size=10)
+        self.row_height = self.font.metrics("linespace") + 4
+
+        self.frame = ttk.Frame(parent)
+        self.tree = ttk.Treeview(
+            self.frame,
+            columns=[c[0] for c in self.COLUMNS],
+            show="headings",
+            selectmode="browse",
+            style="Env.Treeview",
+            height=1
+        )
+        for column, heading, width in self.COLUMNS:
+            self.tree.heading(column, text=heading, anchor=tk.W)
+            self.tree.column(column, width=width, anchor=tk.E if column == "size" else tk.W,
+                             stretch=(column == "name"))
+        # Clicking Size sorts by disk usage (again to flip the order), Environment back by name
+        self.tree.heading("name", command=lambda: self.sort_by("name"))
+        self.tree.heading("size", anchor=tk.E, command=lambda: self.sort_by("size"))
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.tree.bind("<Configure>", self.on_resize)
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+        self.tree.bind("<Double-1>", self.on_double_click)
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll(-1 if e.delta > 0 else 1, "units"))
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-1, "units"))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(1, "units"))
+        self.tree.bind("<Up>", lambda e: self.move_selection(-1))
+        self.tree.bind("<Down>", lambda e: self.move_selection(1))
+        self.tree.bind("<Prior>", lambda e: self.move_selection(-max(1, self.rows - 1)))
+        self.tree.bind("<Next>", lambda e: self.move_selection(max(1, self.rows - 1)))
+        self.tree.bind("<Return>", lambda e: self.on_activate())
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def configure_colors(self, background, text, selected, stripe):
+        """Apply theme colors; striping is a tag setting, not a per-row call"""
+        style = ttk.Style()
+        style.configure("Env.Treeview", background=background, fieldbackground=background,
+                        foreground=text, font=self.font, rowheight=self.row_height)
+        style.map("Env.Treeview", background=[("selected", selected)], foreground=[("selected", "#ffffff")])
+        self.tree.tag_configure("odd", background=stripe)
+        self.tree.tag_configure("even", background=background)
+        self.tree.tag_configure("broken", foreground="#e74c3c")
+        self.tree.tag_configure("warning", foreground="#e67e22")
+
+    def on_resize(self, event=None):
+        """Grow or shrink the row item pool to the number of visible lines"""
+        if not self.tree.get_children():
+            self.tree.insert("", tk.END, iid="r0")
+            self.rows = 1
+        # The first row's offset is the heading height once the tree is drawn
+        bbox = self.tree.bbox("r0")
+        header = bbox[1] if bbox else self.row_height + 8
+        rows = max(1, (self.tree.winfo_height() - header) // self.row_height)
+        while self.rows < rows:
+            self.tree.insert("", tk.END, iid=f"r{self.rows}")
+            self.rows += 1
+        while self.rows > rows:
+            self.rows -= 1
+            self.tree.delete(f"r{self.rows}")
+        self.redraw()
+
+    def apply(self, ops):
+        """Keep the viewport anchored while model operations shift rows, then redraw"""
+        for op in ops:
+            if op[0] != "reset" and op[1] < self.top:
+                self.top += -1 if op[0] == "delete" else 1
+        self.redraw()
+
+    def redraw(self):
+        """Refill the row items from the model window starting at self.top"""
+        count = len(self.model.records)
+        self.top = max(0, min(self.top, count - self.rows))
+        selected_item = None
+        for i in range(self.rows):
+            idx = self.top + i
+            if idx < count:
+                record = self.model.records[idx]
+                values = self.row_values(record)
+                tags = ("odd",) if idx % 2 else ("even",)
+                status = self.model.health.get(record["path"])
+                if status in ("broken", "warning"):
+                    tags += (status,)
+                if record["path"] == self.selected_path:
+                    selected_item = f"r{i}"
+            else:
+                values, tags = ("",) * len(self.COLUMNS), ()
+            self.tree.item(f"r{i}", values=values, tags=tags)
+
+        if selected_item:
+            self.tree.selection_set(selected_item)
+        elif self.tree.selection():
+            self.tree.selection_remove(self.tree.selection())
+
+        if count:
+            self.scrollbar.set(self.top / count, min(1.0, (self.top + self.rows) / count))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def row_values(self, record):
+        location = record.get("root", "")
+        home = os.path.expanduser("~")
+        if location.startswith(home):
+            location = "~" + location[len(home):]
+        size = self.model.sizes.get(record["path"])
+        name = record["name"] + (" (broken)" if self.model.health.get(record["path"]) == "broken" else "")
+        return (name, record.get("version", ""), "" if size is None else format_size(size), location)
+
+    def sort_by(self, column):
+        """Sort the list by name or by size, keeping the selection in view"""
+        descending = not (column == self.model.sort_by == "size" and self.model.descending)
+        self.model.set_sort(column, descending)
+        arrow = " \u25bc" if descending else " \u25b2"
+        self.tree.heading("size", text="Size" + (arrow if column == "size" else ""))
+        idx = self.selected_index()
+        if idx is not None:
+            self.top = max(0, idx - self.rows // 2)
+        self.redraw()
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.top = int(float(amount) * len(self.model.records))
+            self.redraw()
+        else:
+            self.scroll(int(amount), unit)
+
+    def scroll(self, amount, unit):
+        self.top += amount * (max(1, self.rows - 1) if unit == "pages" else 1)
+        self.redraw()
+        return "break"
+
+    def index_of_item(self, item):
+        if not item or not item.startswith("r"):
+            return None
+        idx = self.top + int(item[1:])
+        return idx if idx < len(self.model.records) else None
+
+    def on_select(self, event=None):
+        selection = self.tree.selection()
+        if selection:
+            idx = self.index_of_item(selection[0])
+            if idx is None:
+                self.tree.selection_remove(selection)
+            else:
+                self.selected_path = self.model.records[idx]["path"]
+
+    def on_double_click(self, event):
+        idx = self.index_of_item(self.tree.identify_row(event.y))
+        if idx is not None:
+            self.selected_path = self.model.records[idx]["path"]
+            self.redraw()
+            self.on_activate()
+
+    def selected_index(self):
+        """Return the model index of the selected environment, or None"""
+        record = self.model.by_path.get(self.selected_path)
+        if record is None:
+            return None
+        return bisect.bisect_left(self.model.keys, self.model.sort_key(record))
+
+    def selected_record(self):
+        """Return the selected environment record, or None"""
+        return self.model.by_path.get(self.selected_path)
+
+    def move_selection(self, delta):
+        """Move the selection by delta rows, scrolling it into view"""
+        count = len(self.model.records)
+        if not count:
+            return "break"
+        idx = self.selected_index()
+        idx = 0 if idx is None else max(0, min(count - 1, idx + delta))
+        self.selected_path = self.model.records[idx]["path"]
+        if idx < self.top:
+            self.top = idx
+        elif idx >= self.top + self.rows:
+            self.top = idx - self.rows + 1
+        self.redraw()
+        return "break"
+
 
 class VirtualEnvManager:
     # Application version
     VERSION = "1.0.0"
     
-    def __init__(self, root):
-        self.root = root
-        self.root.title("Python Virtual Environment Manager")
-        self.root.geometry("600x500")
-        self.root.resizable(True, True)
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Python Virtual Environment Manager")
+        self.root.geometry("700x600")
+        self.root.resizable(True, True)
+        
+        # Set icon if it exists
+        try:
+            # When running as exe, the icon is at the same level as the executable
+            icon_path = os.path.join(os.path.dirname(sys.executable), "icon.ico")
+            if not os.path.exists(icon_path):
+                # When running as script, the icon might be at the same level
+                icon_path = os.path.join(os.path.dirname(__file__), "icon.ico")
+            
+            if os.path.exists(icon_path):
+                self.root.iconbitmap(icon_path)
+        except Exception as e:
+            print(f"Could not set icon: {e}")
+        
+        # Create a menu
+        self.menu = tk.Menu(self.root)
+        self.root.config(menu=self.menu)
+        
+        # Tools menu
+        self.tools_menu = tk.Menu(self.menu, tearoff=0)
+        self.menu.add_cascade(label="Tools", menu=self.tools_menu)
+        self.tools_menu.add_command(label="Create Environments from Manifest...", command=self.create_from_manifest)
+        self.tools_menu.add_command(label="Sync Environment to Requirements...", command=self.sync_environment)
+        self.tools_menu.add_command(label="Populate Wheelhouse from Requirements...", command=self.populate_wheelhouse)
+        self.tools_menu.add_command(label="Deduplicate Environments...", command=self.dedupe_environments)
+        self.tools_menu.add_command(label="Environment Snapshots...", command=self.show_snapshots)
+        self.tools_menu.add_command(label="Check Environment Health...",
+                                    command=lambda: self.check_environment_health(force=True, report=True))
+        self.tools_menu.add_command(label="Rebuild Environments...", command=self.rebuild_environments)
+        self.tools_menu.add_separator()
+        self.tools_menu.add_command(label="Clear Resolution Cache", command=self.clear_resolution_cache)
+        
+        # Help menu
+        help_menu = tk.Menu(self.menu, tearoff=0)
+        self.menu.add_cascade(label="Help", menu=help_menu)
+        help_menu.add_command(label="About", command=self.show_about)
+        
+        # Set theme colors
+        self.colors = {
+            "primary": "#3498db",
+            "secondary": "#2ecc71",
+            "background": "#f5f5f5",
+            "text": "#333333",
+            "accent": "#e74c3c"
+        }
+        
+        # Initialize animation variables
+        self.animation_running = False
+        self.animation_thread = None
+        self.loading = False
+        self.loading_thread = None
+        
+        # Load settings or set defaults
+        self.settings_file = os.path.join(os.path.expanduser("~"), ".pyenvmanager", "settings.json")
+        self.load_settings()
+        
+        # Deleted environments are renamed into trash and reclaimed in the background
+        self.trash = TrashReaper(os.path.join(os.path.dirname(self.settings_file), "trash.json"))
+        
+        # Local wheelhouse used for offline installs
+        self.wheelhouse = Wheelhouse(self.settings.get("wheelhouse_dir") or default_wheelhouse_dir())
+        
+        # Pinned pip resolutions reused by later installs of the same requirements
+        self.resolution_cache = ResolutionCache(
+            os.path.join(os.path.dirname(self.settings_file), "resolution_cache.json"),
+            max_entries=int(self.settings.get("resolution_cache_size", 200))
+        )
+        
+        # Installed packages per environment, read from dist-info metadata
+        self.package_inventory = PackageInventory(
+            os.path.join(os.path.dirname(self.settings_file), "package_inventory.json"))
+        
+        # Disk usage per environment, cached per directory by mtime
+        self.disk_usage = DiskUsage(os.path.join(os.path.dirname(self.settings_file), "disk_usage.json"))
+        self.usage_scan_running = False
+        self.usage_scan_pending = None
+        
+        # Cached health checks that flag broken environments in the list
+        self.health = HealthCheck(os.path.join(os.path.dirname(self.settings_file), "health.json"))
+        self.health_check_running = False
+        self.health_check_pending = False
+        
+        # Package name -> (environment, version) index behind the package search
+        self.package_index = PackageIndex()
+        self.index_sync_running = False
+        self.index_sync_pending = False
+        
+        # Interpreters found on this machine; probed once, then served from the cache
+        self.interpreters = InterpreterRegistry(
+            os.path.join(os.path.dirname(self.settings_file), "interpreters.json"))
+        threading.Thread(target=self.interpreters.refresh, daemon=True).start()
+        
+        # Package files shared across environments by hardlinks
+        self.package_store = PackageStore(os.path.join(self.venv_dir, PackageStore.STORE_NAME))
+        
+        # All long-running operations go through one bounded, env-locking scheduler
+        self.jobs_refresh_scheduled = False
+        self.jobs = JobScheduler(int(self.settings.get("max_parallel_jobs", 4)), on_change=self._jobs_changed)
+        
+        # Pre-built spare environments make Create New near-instant
+        self.spare_pool = None
+        self.setup_spare_pool()
+        
+        # Environment metadata index lives next to settings.json
+        self.env_index = EnvIndex(os.path.join(os.path.dirname(self.settings_file), "env_index.json"))
+        self.env_model = EnvListModel()
+        self.refresh_running = False
+        self.refresh_pending = False
+        
+        # Create GUI components
+        self.setup_ui()
+        
+        # Populate the listbox with available environments
+        self.refresh_env_list()
+        
+        # Keep the list live when environments change on disk
+        self.env_watchers = {}
+        self.start_env_watchers()
+    
+    def setup_spare_pool(self):
+        """(Re)create the spare environment pool for venv_dir from the settings"""
+        if self.spare_pool is not None:
+            self.spare_pool.stopped = True
+        self.spare_pool = SparePool(
+            self.venv_dir,
+            size=int(self.settings.get("spare_pool_size", 0)),
+            presets=self.settings.get("spare_pool_presets", []),
+            trash=self.trash,
+            wheelhouse=self.wheelhouse
+        )
+        self.spare_pool.want_defaults(self.settings["python_path"])
+        self.spare_pool.refill()
+    
+    def get_env_roots(self):
+        """Return venv_dir plus the configured extra roots as scan configs"""
+        # Trashed, spare and half-rebuilt environments and the package store must never show up as environments
+        internal = [TrashReaper.TRASH_NAME, SparePool.POOL_NAME, PackageStore.STORE_NAME, ".*.rebuild-*"]
+        roots = [{"path": os.path.abspath(self.venv_dir), "depth": 1, "ignore": internal}]
+        seen = {roots[0]["path"]}
+        for root in self.settings.get("env_roots", []):
+            path = os.path.abspath(os.path.expanduser(root.get("path", "")))
+            if path in seen:
+                continue
+            seen.add(path)
+            roots.append({
+                "path": path,
+                "depth": max(1, int(root.get("depth", 1))),
+                "ignore": list(root.get("ignore", [])) + internal
+            })
+        return roots
+    
+    def load_settings(self):
+        """Load settings from JSON file or create defaults"""
+        # Create app data directory in AppData/Local (Windows) or .local/share (Linux)
+        if os.name == 'nt':
+            app_data_dir = os.path.join(os.getenv('LOCALAPPDATA'), "PyVenvManager")
+        else:
+            app_data_dir = os.path.join(os.path.expanduser("~"), ".local", "share", "PyVenvManager")
+        
+        # Create directory if it doesn't exist
+        os.makedirs(app_data_dir, exist_ok=True)
+        
+        # Default settings
+        self.settings = {
+            "venv_dir": app_data_dir,
+            "python_path": sys.executable,
+            "theme": "light"
+        }
+        
+        # Create settings directory if it doesn't exist
+        os.makedirs(os.path.dirname(self.settings_file), exist_ok=True)
+        
+        # Try to load existing settings
+        try:
+            if os.path.exists(self.settings_file):
+                with open(self.settings_file, 'r') as f:
+                    loaded_settings = json.load(f)
+                    self.settings.update(loaded_settings)
+        except Exception as e:
+            print(f"Error loading settings: {e}")
+        
+        # Ensure venv directory exists
+        os.makedirs(self.settings["venv_dir"], exist_ok=True)
+        
+        # Set working directory
+        self.venv_dir = self.settings["venv_dir"]
+    
+    def save_settings(self):
+        """Save current settings to JSON file"""
+        try:
+            with open(self.settings_file, 'w') as f:
+                json.dump(self.settings, f)
+            return True
+        except Exception as e:
+            messagebox.showerror("Save Error", f"Could not save settings: {e}")
+            return False
+    
+    def setup_ui(self):
+        # Set style
+        self.style = ttk.Style()
+        self.apply_theme()
+        
+        # Main frame
+        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        # Title with animation effect
+        self.title_frame = ttk.Frame(main_frame)
+        self.title_frame.pack(fill=tk.X, pady=5)
+        
+        self.title_label = ttk.Label(
+            self.title_frame, 
+            text="Python Virtual Environment Manager", 
+            font=("Helvetica", 16, "bold"),
+            foreground=self.colors["primary"]
+        )
+        self.title_label.pack(pady=5)
+        
+        # Path display
+        path_frame = ttk.Frame(main_frame)
+        path_frame.pack(fill=tk.X, pady=5)
+        
+        ttk.Label(path_frame, text="Environments Path:").pack(side=tk.LEFT)
+        self.path_label = ttk.Label(path_frame, text=self.venv_dir, font=("Courier", 9))
+        self.path_label.pack(side=tk.LEFT, padx=5)
+        
+        # Notebook for tabs
+        self.notebook = ttk.Notebook(main_frame)
+        self.notebook.pack(fill=tk.BOTH, expand=True, pady=10)
+        
+        # Environments tab
+        env_tab = ttk.Frame(self.notebook)
+        self.notebook.add(env_tab, text="Environments")
+        
+        # Environment listbox with scrollbar
+        list_frame = ttk.LabelFrame(env_tab, text="Available Environments")
+        list_frame.pack(fill=tk.BOTH, expand=True, pady=5, padx=5)
+        
+        self.env_view = VirtualEnvList(list_frame, self.env_model, self.activate_environment)
+        self.usage_var = tk.StringVar()
+        ttk.Label(list_frame, textvariable=self.usage_var, anchor=tk.W).pack(side=tk.BOTTOM, fill=tk.X, padx=5)
+        self.env_view.pack(fill=tk.BOTH, expand=True)
+        self.apply_env_view_colors()
+        
+        # Buttons frame for environment actions
+        btn_frame = ttk.Frame(env_tab)
+        btn_frame.pack(fill=tk.X, pady=5)
+        
+        tk.Button(
+            btn_frame, 
+            text="Activate",
+            command=self.activate_environment,
+            bg=self.colors["primary"],
+            fg="white",
+            relief=tk.RAISED,
+            padx=10
+        ).pack(side=tk.LEFT, padx=5, pady=2)
+        
+        tk.Button(
+            btn_frame, 
+            text="Run",
+            command=self.run_main_file,
+            bg=self.colors["primary"],
+            fg="white",
+            relief=tk.RAISED,
+            padx=10
+        ).pack(side=tk.LEFT, padx=5, pady=2)
+        
+        tk.Button(
+            btn_frame, 
+            text="Create New",
+            command=self.show_create_dialog,
+            bg=self.colors["secondary"],
+            fg="white",
+            relief=tk.RAISED,
+            padx=10
+        ).pack(side=tk.LEFT, padx=5, pady=2)
+        
+        tk.Button(
+            btn_frame, 
+            text="Clone",
+            command=self.clone_environment,
+            bg=self.colors["secondary"],
+            fg="white",
+            relief=tk.RAISED,
+            padx=10
+        ).pack(side=tk.LEFT, padx=5, pady=2)
+        
+        tk.Button(
+            btn_frame, 
+            text="Packages",
+            command=self.show_packages,
+            bg=self.colors["secondary"],
+            fg="white",
+            relief=tk.RAISED,
+            padx=10
+        ).pack(side=tk.LEFT, padx=5, pady=2)
+        
+        tk.Button(
+            btn_frame, 
+            text="Import",
+            command=self.import_environment,
+            bg=self.colors["secondary"],
+            fg="white",
+            relief=tk.RAISED,
+            padx=10
+        ).pack(side=tk.LEFT, padx=5, pady=2)
+        
+        tk.Button(
+            btn_frame, 
+            text="Delete",
+            command=self.delete_environment,
+            bg=self.colors["accent"],
+            fg="white",
+            relief=tk.RAISED,
+            padx=10
+        ).pack(side=tk.LEFT, padx=5, pady=2)
+        
+        tk.Button(
+            btn_frame, 
+            text="Refresh",
+            command=self.refresh_env_list,
+            bg=self.colors["background"],
+            fg=self.colors["text"],
+            relief=tk.RAISED,
+            padx=10
+        ).pack(side=tk.LEFT, padx=5, pady=2)
+        
+        # Package search tab
+        search_tab = ttk.Frame(self.notebook)
+        self.notebook.add(search_tab, text="Package Search")
+        
+        search_frame = ttk.Frame(search_tab)
+        search_frame.pack(fill=tk.X, pady=5, padx=5)
+        ttk.Label(search_frame, text="Package:").pack(side=tk.LEFT)
+        self.package_query_var = tk.StringVar()
+        search_entry = ttk.Entry(search_frame, textvariable=self.package_query_var)
+        search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        search_entry.bind("<Return>", self.search_packages)
+        tk.Button(
+            search_frame,
+            text="Search",
+            command=self.search_packages,
+            bg=self.colors["primary"],
+            fg="white",
+            relief=tk.RAISED,
+            padx=10
+        ).pack(side=tk.LEFT, padx=5)
+        ttk.Label(search_tab, text='Examples: requests<2.31   cryptography>=41,<42.0.4   django~=4.2   types-*',
+                  font=("Courier", 9)).pack(anchor=tk.W, padx=5)
+        
+        results_frame = ttk.LabelFrame(search_tab, text="Matching Environments")
+        results_frame.pack(fill=tk.BOTH, expand=True, pady=5, padx=5)
+        self.search_tree = ttk.Treeview(results_frame, columns=("package", "version", "location"), selectmode="browse")
+        self.search_tree.heading("#0", text="Environment", anchor=tk.W)
+        self.search_tree.heading("package", text="Package", anchor=tk.W)
+        self.search_tree.heading("version", text="Version", anchor=tk.W)
+        self.search_tree.heading("location", text="Location", anchor=tk.W)
+        self.search_tree.column("#0", width=180)
+        self.search_tree.column("package", width=140)
+        self.search_tree.column("version", width=80, stretch=False)
+        self.search_tree.column("location", width=220)
+        search_scrollbar = ttk.Scrollbar(results_frame, orient=tk.VERTICAL, command=self.search_tree.yview)
+        self.search_tree.configure(yscrollcommand=search_scrollbar.set)
+        search_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.search_tree.pack(fill=tk.BOTH, expand=True)
+        
+        self.search_status_var = tk.StringVar()
+        ttk.Label(search_tab, textvariable=self.search_status_var, anchor=tk.W).pack(fill=tk.X, padx=5)
+        
+        # Jobs tab
+        jobs_tab = ttk.Frame(self.notebook)
+        self.notebook.add(jobs_tab, text="Jobs")
+        
+        jobs_frame = ttk.LabelFrame(jobs_tab, text="Queued, Running and Finished Operations")
+        jobs_frame.pack(fill=tk.BOTH, expand=True, pady=5, padx=5)
+        
+        self.jobs_tree = ttk.Treeview(jobs_frame, columns=("status", "duration", "info"), selectmode="browse")
+        self.jobs_tree.heading("#0", text="Job", anchor=tk.W)
+        self.jobs_tree.heading("status", text="Status", anchor=tk.W)
+        self.jobs_tree.heading("duration", text="Duration", anchor=tk.W)
+        self.jobs_tree.heading("info", text="Details", anchor=tk.W)
+        self.jobs_tree.column("#0", width=250)
+        self.jobs_tree.column("status", width=80, stretch=False)
+        self.jobs_tree.column("duration", width=70, stretch=False)
+        self.jobs_tree.column("info", width=200)
+        jobs_scrollbar = ttk.Scrollbar(jobs_frame, orient=tk.VERTICAL, command=self.jobs_tree.yview)
+        self.jobs_tree.configure(yscrollcommand=jobs_scrollbar.set)
+        jobs_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.jobs_tree.pack(fill=tk.BOTH, expand=True)
+        
+        jobs_btn_frame = ttk.Frame(jobs_tab)
+        jobs_btn_frame.pack(fill=tk.X, pady=5)
+        
+        tk.Button(
+            jobs_btn_frame,
+            text="Cancel Job",
+            command=self.cancel_selected_job,
+            bg=self.colors["accent"],
+            fg="white",
+            relief=tk.RAISED,
+            padx=10
+        ).pack(side=tk.LEFT, padx=5, pady=2)
+        
+        tk.Button(
+            jobs_btn_frame,
+            text="Clear Finished",
+            command=self.jobs.clear_finished,
+            bg=self.colors["background"],
+            fg=self.colors["text"],
+            relief=tk.RAISED,
+            padx=10
+        ).pack(side=tk.LEFT, padx=5, pady=2)
+        
+        # Run tab: one console per started program
+        self.run_tab = ttk.Frame(self.notebook)
+        self.notebook.add(self.run_tab, text="Run")
+        self.run_consoles = {}
+        self.run_notebook = ttk.Notebook(self.run_tab)
+        self.run_notebook.pack(fill=tk.BOTH, expand=True, pady=5, padx=5)
+        
+        # Settings tab
+        settings_tab = ttk.Frame(self.notebook)
+        self.notebook.add(settings_tab, text="Settings")
+        
+        # Environment directory settings
+        dir_frame = ttk.LabelFrame(settings_tab, text="Environment Directory")
+        dir_frame.pack(fill=tk.X, expand=False, pady=10, padx=10)
+        
+        ttk.Label(dir_frame, text="Current Directory:").pack(anchor=tk.W, padx=5, pady=5)
+        ttk.Label(dir_frame, text=self.venv_dir, font=("Courier", 9)).pack(anchor=tk.W, padx=15, pady=2)
+        
+        tk.Button(
+            dir_frame,
+            text="Change Directory",
+            command=self.change_venv_dir,
+            bg=self.colors["primary"],
+            fg="white",
+            relief=tk.RAISED,
+            padx=10
+        ).pack(anchor=tk.W, padx=5, pady=5)
+        
+        # Additional environment roots
+        roots_frame = ttk.LabelFrame(settings_tab, text="Additional Environment Roots")
+        roots_frame.pack(fill=tk.X, expand=False, pady=10, padx=10)
+        
+        self.roots_listbox = tk.Listbox(roots_frame, height=3, font=("Courier", 9))
+        self.roots_listbox.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5, pady=5)
+        
+        roots_btn_frame = ttk.Frame(roots_frame)
+        roots_btn_frame.pack(side=tk.RIGHT, padx=5)
+        
+        tk.Button(
+            roots_btn_frame,
+            text="Add Root",
+            command=self.add_env_root,
+            bg=self.colors["primary"],
+            fg="white",
+            relief=tk.RAISED,
+            padx=10
+        ).pack(fill=tk.X, pady=2)
+        
+        tk.Button(
+            roots_btn_frame,
+            text="Remove",
+            command=self.remove_env_root,
+            bg=self.colors["accent"],
+            fg="white",
+            relief=tk.RAISED,
+            padx=10
+        ).pack(fill=tk.X, pady=2)
+        
+        self.populate_roots_listbox()
+        
+        # Python executable settings
+        py_frame = ttk.LabelFrame(settings_tab, text="Python Executable")
+        py_frame.pack(fill=tk.X, expand=False, pady=10, padx=10)
+        
+        self.python_path_var = tk.StringVar(value=self.settings["python_path"])
+        self._interpreter_combobox(py_frame, self.python_path_var, width=50).pack(
+            side=tk.LEFT, fill=tk.X, expand=True, padx=5, pady=10)
+        
+        tk.Button(
+            py_frame, 
+            text="Browse",
+            command=self.browse_python_executable,
+            bg=self.colors["background"],
+            fg=self.colors["text"],
+            relief=tk.RAISED,
+            padx=10
+        ).pack(side=tk.RIGHT, padx=5)
+        
+        # Spare environment pool settings
+        pool_frame = ttk.LabelFrame(settings_tab, text="Spare Environment Pool")
+        pool_frame.pack(fill=tk.X, expand=False, pady=10, padx=10)
+        
+        ttk.Label(pool_frame, text="Spares per interpreter:").pack(side=tk.LEFT, padx=5, pady=5)
+        self.spare_pool_size_var = tk.IntVar(value=int(self.settings.get("spare_pool_size", 0)))
+        ttk.Spinbox(pool_frame, from_=0, to=10, width=4, textvariable=self.spare_pool_size_var).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(pool_frame, text="Presets (; separated):").pack(side=tk.LEFT, padx=5)
+        self.spare_pool_presets_var = tk.StringVar(value="; ".join(self.settings.get("spare_pool_presets", [])))
+        ttk.Entry(pool_frame, textvariable=self.spare_pool_presets_var, width=25).pack(
+            side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        
+        # Job scheduler settings
+        jobs_settings_frame = ttk.LabelFrame(settings_tab, text="Background Jobs")
+        jobs_settings_frame.pack(fill=tk.X, expand=False, pady=10, padx=10)
+        
+        ttk.Label(jobs_settings_frame, text="Operations running at once:").pack(side=tk.LEFT, padx=5, pady=5)
+        self.max_jobs_var = tk.IntVar(value=self.jobs.workers)
+        ttk.Spinbox(jobs_settings_frame, from_=1, to=16, width=4, textvariable=self.max_jobs_var).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(jobs_settings_frame, text="Snapshots kept per environment (0 = off):").pack(side=tk.LEFT, padx=5)
+        self.snapshot_retention_var = tk.IntVar(value=int(self.settings.get("snapshot_retention", 3)))
+        ttk.Spinbox(jobs_settings_frame, from_=0, to=20, width=4, textvariable=self.snapshot_retention_var).pack(side=tk.LEFT, padx=5)
+        
+        # Wheelhouse settings
+        wheelhouse_frame = ttk.LabelFrame(settings_tab, text="Wheelhouse (Offline Installs)")
+        wheelhouse_frame.pack(fill=tk.X, expand=False, pady=10, padx=10)
+        
+        self.wheelhouse_dir_var = tk.StringVar(value=self.wheelhouse.path)
+        ttk.Entry(wheelhouse_frame, textvariable=self.wheelhouse_dir_var).pack(
+            side=tk.LEFT, fill=tk.X, expand=True, padx=5, pady=5)
+        tk.Button(
+            wheelhouse_frame,
+            text="Browse",
+            command=lambda: self.wheelhouse_dir_var.set(
+                filedialog.askdirectory(initialdir=self.wheelhouse_dir_var.get()) or self.wheelhouse_dir_var.get()),
+            bg=self.colors["background"],
+            fg=self.colors["text"],
+            relief=tk.RAISED,
+            padx=10
+        ).pack(side=tk.RIGHT, padx=5)
+        
+        # Theme settings
+        theme_frame = ttk.LabelFrame(settings_tab, text="Theme Settings")
+        theme_frame.pack(fill=tk.X, expand=False, pady=10, padx=10)
+        
+        ttk.Label(theme_frame, text="Choose Theme:").pack(anchor=tk.W, padx=5, pady=5)
+        
+        self.theme_var = tk.StringVar(value=self.settings.get("theme", "light"))
+        ttk.Radiobutton(
+            theme_frame, 
+            text="Light", 
+            variable=self.theme_var, 
+            value="light",
+            command=self.change_theme
+        ).pack(anchor=tk.W, padx=20, pady=2)
+        
+        ttk.Radiobutton(
+            theme_frame, 
+            text="Dark", 
+            variable=self.theme_var, 
+            value="dark",
+            command=self.change_theme
+        ).pack(anchor=tk.W, padx=20, pady=2)
+        
+        tk.Button(
+            theme_frame,
+            text="Customize Colors",
+            command=self.customize_colors,
+            bg=self.colors["background"],
+            fg=self.colors["text"],
+            relief=tk.RAISED,
+            padx=10
+        ).pack(anchor=tk.W, padx=5, pady=10)
+        
+        tk.Button(
+            settings_tab,
+            text="Save Settings",
+            command=self.save_settings_from_ui,
+            bg=self.colors["primary"],
+            fg="white",
+            relief=tk.RAISED,
+            padx=10
+        ).pack(side=tk.BOTTOM, pady=10)
+        
+        # Collapsible pane with streamed pip/venv output
+        self.log_pane = LogPane(main_frame)
+        
+        # Status bar with animation capability
+        self.status_var = tk.StringVar()
+        self.status_var.set("Ready")
+        self.status_bar = ttk.Label(
+            main_frame, 
+            textvariable=self.status_var, 
+            relief=tk.SUNKEN, 
+            anchor=tk.W
+        )
+        self.status_bar.pack(fill=tk.X, side=tk.BOTTOM, pady=5)
+        self.log_pane.pack(fill=tk.X, side=tk.BOTTOM)
+        self.apply_env_view_colors()
+
+        # Remove the inline progress bar from the main window
+        self.progress = None
+        self.progress_dialog = None
+
+        # Start title animation
+        self.start_title_animation()
+    
+    def apply_theme(self):
+        """Apply the current theme to the UI"""
+        if self.settings.get("theme") == "dark":
+            self.colors = {
+                "primary": "#3498db",
+                "secondary": "#2ecc71",
+                "background": "#333333",
+                "text": "#f5f5f5",
+                "accent": "#e74c3c"
+            }
+        else:  # Light theme
+            self.colors = {
+                "primary": "#3498db",
+                "secondary": "#2ecc71",
+                "background": "#f5f5f5",
+                "text": "#333333",
+                "accent": "#e74c3c"
+            }
         
-        # Set icon if it exists
-        try:
-            # When running as exe, the icon is at the same level as the executable
-            icon_path = os.path.join(os.path.dirname(sys.executable), "icon.ico")
-            if not os.path.exists(icon_path):
-                # When running as script, the icon might be at the same level
-                icon_path = os.path.join(os.path.dirname(__file__), "icon.ico")
+        # Override with custom colors if they exist
+        if "custom_colors" in self.settings:
+            self.colors.update(self.settings["custom_colors"])
+        
+        # Configure styles
+        self.style.configure("TFrame", background=self.colors["background"])
+        self.style.configure("TLabel", background=self.colors["background"], foreground=self.colors["text"])
+        
+        # Fix button styling to ensure text is visible
+        self.style.configure("TButton", 
+                             background=self.colors["background"], 
+                             foreground=self.colors["text"])
+        
+        # Create button styles with explicit foreground colors
+        self.style.configure("Primary.TButton", 
+                             background=self.colors["primary"], 
+                             foreground="#ffffff")
+        
+        self.style.map("Primary.TButton",
+                       foreground=[('active', '#ffffff'), ('pressed', '#ffffff')],
+                       background=[('active', self.colors["primary"]), ('pressed', self.colors["primary"])])
+        
+        self.style.configure("Secondary.TButton", 
+                             background=self.colors["secondary"], 
+                             foreground="#ffffff")
+        
+        self.style.map("Secondary.TButton",
+                       foreground=[('active', '#ffffff'), ('pressed', '#ffffff')],
+                       background=[('active', self.colors["secondary"]), ('pressed', self.colors["secondary"])])
+        
+        self.style.configure("Accent.TButton", 
+                             background=self.colors["accent"], 
+                             foreground="#ffffff")
+        
+        self.style.map("Accent.TButton",
+                       foreground=[('active', '#ffffff'), ('pressed', '#ffffff')],
+                       background=[('active', self.colors["accent"]), ('pressed', self.colors["accent"])])
+        
+        # Apply to root window
+        self.root.configure(bg=self.colors["background"])
+        
+        # If the environment list exists, update its colors
+        if hasattr(self, "env_view"):
+            self.apply_env_view_colors()
+        
+        # Update button colors
+        self.update_button_colors()
+    
+    def apply_env_view_colors(self):
+        """Apply the theme colors and row striping to the environment list"""
+        self.env_view.configure_colors(
+            self.colors["background"],
+            self.colors["text"],
+            self.colors["primary"],
+            "#f0f0f0" if self.settings.get("theme") == "light" else "#3a3a3a"
+        )
+        if getattr(self, "log_pane", None) is not None:
+            self.log_pane.configure_colors(self.colors["background"], self.colors["text"])
+        for console in getattr(self, "run_consoles", {}).values():
+            console.log.configure_colors(self.colors["background"], self.colors["text"])
+    
+    def update_button_colors(self):
+        """Update colors for all tk buttons when theme changes"""
+        def update_buttons(widget):
+            if isinstance(widget, tk.Button):
+                if "primary" in str(widget["bg"]):
+                    widget.configure(bg=self.colors["primary"], fg="white")
+                elif "secondary" in str(widget["bg"]):
+                    widget.configure(bg=self.colors["secondary"], fg="white")
+                elif "accent" in str(widget["bg"]):
+                    widget.configure(bg=self.colors["accent"], fg="white")
+                else:
+                    widget.configure(bg=self.colors["background"], fg=self.colors["text"])
             
-            if os.path.exists(icon_path):
-                self.root.iconbitmap(icon_path)
-        except Exception as e:
-            print(f"Could not set icon: {e}")
+            # Recursively update children
+            for child in widget.winfo_children():
+                update_buttons(child)
         
-        # Create a menu
-        self.menu = tk.Menu(self.root)
-        self.root.config(menu=self.menu)
+        # Start the recursive update from the root window
+        update_buttons(self.root)
+    
+    def change_theme(self):
+        """Change the UI theme"""
+        self.settings["theme"] = self.theme_var.get()
+        self.apply_theme()
+    
+    def customize_colors(self):
+        """Let the user customize UI colors"""
+        color_window = tk.Toplevel(self.root)
+        color_window.title("Customize Colors")
+        color_window.geometry("400x300")
         
-        # Help menu
-        help_menu = tk.Menu(self.menu, tearoff=0)
-        self.menu.add_cascade(label="Help", menu=help_menu)
-        help_menu.add_command(label="About", command=self.show_about)
+        color_frame = ttk.Frame(color_window, padding=10)
+        color_frame.pack(fill=tk.BOTH, expand=True)
         
-        # Set theme colors
-        self.colors = {
-            "primary": "#3498db",
-            "secondary": "#2ecc71",
-            "background": "#f5f5f5",
-            "text": "#333333",
-            "accent": "#e74c3c"
-        }
+        # Create color pickers for each color
+        color_keys = ["primary", "secondary", "background", "text", "accent"]
+        color_vars = {}
         
-        # Initialize animation variables
-        self.animation_running = False
-        self.animation_thread = None
-        self.loading = False
-        self.loading_thread = None
+        for i, key in enumerate(color_keys):
+            row_frame = ttk.Frame(color_frame)
+            row_frame.pack(fill=tk.X, pady=5)
+            
+            ttk.Label(row_frame, text=f"{key.capitalize()} Color:").pack(side=tk.LEFT, padx=5)
+            
+            color_vars[key] = tk.StringVar(value=self.colors[key])
+            color_entry = ttk.Entry(row_frame, textvariable=color_vars[key], width=10)
+            color_entry.pack(side=tk.LEFT, padx=5)
+            
+            color_button = ttk.Button(
+                row_frame, 
+                text="Pick Color",
+                command=lambda k=key, v=color_vars[key]: self.pick_color(v)
+            )
+            color_button.pack(side=tk.LEFT, padx=5)
+            
+            # Color preview
+            preview = tk.Canvas(row_frame, width=20, height=20, bg=self.colors[key])
+            preview.pack(side=tk.LEFT, padx=5)
+            
+            # Update preview when color changes
+            color_vars[key].trace_add("write", lambda *args, c=preview, v=color_vars[key]: c.config(bg=v.get()))
         
-        # Load settings or set defaults
-        self.settings_file = os.path.join(os.path.expanduser("~"), ".pyenvmanager", "settings.json")
-        self.load_settings()
+        button_frame = ttk.Frame(color_frame)
+        button_frame.pack(side=tk.BOTTOM, fill=tk.X, pady=10)
         
-        # Create GUI components
-        self.setup_ui()
+        tk.Button(
+            button_frame,
+            text="Apply Colors",
+            command=lambda: self.apply_custom_colors(color_vars, color_window),
+            bg=self.colors["primary"],
+            fg="white",
+            relief=tk.RAISED,
+            padx=10
+        ).pack(side=tk.RIGHT, padx=5)
         
-        # Populate the listbox with available environments
-        self.refresh_env_list()
+        tk.Button(
+            button_frame,
+            text="Cancel",
+            command=color_window.destroy,
+            bg=self.colors["background"],
+            fg=self.colors["text"],
+            relief=tk.RAISED,
+            padx=10
+        ).pack(side=tk.RIGHT, padx=5)
+    
+    def pick_color(self, color_var):
+        """Open color chooser and update the color variable"""
+        color = colorchooser.askcolor(color_var.get())[1]
+        if color:
+            color_var.set(color)
+    
+    def apply_custom_colors(self, color_vars, window):
+        """Apply the custom colors to the UI"""
+        custom_colors = {k: v.get() for k, v in color_vars.items()}
+        self.settings["custom_colors"] = custom_colors
+        self.colors.update(custom_colors)
+        self.apply_theme()
+        window.destroy()
+    
+    def start_title_animation(self):
+        """Start an animation for the title"""
+        if not self.animation_running:
+            self.animation_running = True
+            self.animation_thread = threading.Thread(target=self.run_title_animation)
+            self.animation_thread.daemon = True
+            self.animation_thread.start()
+    
+    def run_title_animation(self):
+        """Run the title animation"""
+        colors = [self.colors["primary"], self.colors["secondary"], self.colors["accent"]]
+        i = 0
+        try:
+            while self.animation_running and hasattr(self, "title_label"):
+                color = colors[i % len(colors)]
+                self.root.after(0, lambda c=color: self.title_label.config(foreground=c))
+                time.sleep(2)
+                i += 1
+        except Exception as e:
+            print(f"Animation error: {e}")
+        finally:
+            self.animation_running = False
+    
+    def show_loading(self, message="Loading..."):
+        """Show a modal progress dialog with a progress bar"""
+        if getattr(self, 'progress_dialog', None) is not None:
+            return  # Already showing
+        def create_dialog():
+            self.progress_dialog = tk.Toplevel(self.root)
+            self.progress_dialog.title("Please Wait")
+            self.progress_dialog.geometry("350x100")
+            self.progress_dialog.resizable(False, False)
+            self.progress_dialog.transient(self.root)
+            self.progress_dialog.grab_set()
+            self.progress_dialog.protocol("WM_DELETE_WINDOW", lambda: None)  # Disable close
+            label = ttk.Label(self.progress_dialog, text=message, anchor=tk.CENTER, font=("Segoe UI", 11))
+            label.pack(pady=(20, 10), padx=10)
+            self.progress = ttk.Progressbar(self.progress_dialog, mode="indeterminate")
+            self.progress.pack(fill=tk.X, padx=20, pady=(0, 15))
+            self.progress.start(10)
+        self.root.after(0, create_dialog)
+        self.loading = True
+        self.loading_thread = threading.Thread(target=self.run_loading_animation, args=(message,))
+        self.loading_thread.daemon = True
+        self.loading_thread.start()
+
+    def stop_loading(self):
+        """Stop the loading animation and close the progress dialog"""
+        self.loading = False
+        def close_dialog():
+            if getattr(self, 'progress', None) is not None:
+                self.progress.stop()
+            if getattr(self, 'progress_dialog', None) is not None:
+                self.progress_dialog.grab_release()
+                self.progress_dialog.destroy()
+                self.progress_dialog = None
+            self.progress = None
+        self.root.after(0, close_dialog)
     
-    def load_settings(self):
-        """Load settings from JSON file or create defaults"""
-        # Create app data directory in AppData/Local (Windows) or .local/share (Linux)
-        if os.name == 'nt':
-            app_data_dir = os.path.join(os.getenv('LOCALAPPDATA'), "PyVenvManager")
-        else:
-            app_data_dir = os.path.join(os.path.expanduser("~"), ".local", "share", "PyVenvManager")
-        
-        # Create directory if it doesn't exist
-        os.makedirs(app_data_dir, exist_ok=True)
-        
-        # Default settings
-        self.settings = {
-            "venv_dir": app_data_dir,
-            "python_path": sys.executable,
-            "theme": "light"
-        }
+    def run_loading_animation(self, message):
+        """Run the loading animation for the modal progress dialog"""
+        dots = [".", "..", "..."]
+        i = 0
+        try:
+            while self.loading and getattr(self, 'progress_dialog', None) is not None:
+                if getattr(self, 'progress_dialog', None) is not None:
+                    for widget in self.progress_dialog.winfo_children():
+                        if isinstance(widget, ttk.Label):
+                            widget.config(text=f"{message} {dots[i % len(dots)]}")
+                time.sleep(0.3)
+                i += 1
+        except Exception:
+            pass
+    
+    def refresh_env_list(self):
+        """Refresh the list of available virtual environments"""
+        # Coalesce refresh requests that arrive while a scan is running
+        if self.refresh_running:
+            self.refresh_pending = True
+            return
+        self.refresh_running = True
+        roots = self.get_env_roots()
         
-        # Create settings directory if it doesn't exist
-        os.makedirs(os.path.dirname(self.settings_file), exist_ok=True)
+        # Drop rows from roots that are no longer configured
+        root_paths = {r["path"] for r in roots}
+        for stale_root in {r.get("root") for r in self.env_model.records} - root_paths:
+            self._apply_list_ops(self.env_model.update([], root=stale_root))
         
-        # Try to load existing settings
+        self.status_var.set(f"Refreshing environment list ({len(roots)} roots)...")
+        threading.Thread(target=self._refresh_env_thread, args=(roots,), daemon=True).start()
+    
+    def _refresh_env_thread(self, roots):
+        """Thread function to scan every root concurrently through the index"""
+        root_paths = {r["path"] for r in roots}
+        problems = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(8, len(roots))) as pool:
+            futures = {
+                pool.submit(self.env_index.scan, r["path"], r["depth"], r["ignore"], root_paths - {r["path"]}): r
+                for r in roots
+            }
+            # Stream each root into the list as soon as it finishes
+            for future in concurrent.futures.as_completed(futures):
+                root_path = futures[future]["path"]
+                try:
+                    records = future.result()
+                except FileNotFoundError:
+                    records = []
+                    problems.append(f"Directory not found: {root_path}")
+                except Exception as e:
+                    records = []
+                    problems.append(f"Error scanning {root_path}: {e}")
+                    if root_path == os.path.abspath(self.venv_dir):
+                        error_msg = str(e)
+                        self.root.after(0, lambda: messagebox.showerror("Error", f"Failed to list environments: {error_msg}"))
+                self.root.after(0, lambda p=root_path, r=records: self._apply_env_list(p, r))
+        self.env_index.save()
+        self.root.after(0, lambda: self._finish_refresh("; ".join([self._env_list_status()] + problems)))
+    
+    def _apply_env_list(self, root_path, records):
+        """Apply only the added, removed and renamed rows of one root to the list"""
+        self._apply_list_ops(self.env_model.update(records, root=root_path))
+        if self.refresh_running:
+            self.status_var.set(f"Scanned {root_path}: {self._env_list_status()}")
+    
+    def _apply_list_ops(self, ops):
+        """Redraw the visible rows after list model operations"""
+        self.env_view.apply(ops)
+    
+    def _env_list_status(self):
+        """Describe the latest list change for the status bar"""
+        count = len(self.env_model.records)
+        if len(self.env_model.last_renamed) == 1:
+            old, new = self.env_model.last_renamed[0]
+            return f"Environment '{old['name']}' renamed to '{new['name']}'"
+        if not count:
+            return "No virtual environments found"
+        return f"Found {count} virtual environments"
+    
+    def start_env_watchers(self):
+        """Watch every root so environments created elsewhere appear without a Refresh"""
+        for watcher in self.env_watchers.values():
+            watcher.stop()
+        self.env_watchers = {}
+        roots = self.get_env_roots()
+        root_paths = {root["path"] for root in roots}
+        for root in roots:
+            if os.path.isdir(root["path"]):
+                watcher = EnvWatcher(root["path"], lambda names, r=root: self._on_env_dir_changed(r, names),
+                                     depth=root["depth"], ignore=root["ignore"], exclude=root_paths - {root["path"]})
+                watcher.start()
+                self.env_watchers[root["path"]] = watcher
+    
+    def _on_env_dir_changed(self, root, names):
+        """Watcher callback: re-stat only the changed entries and patch the list"""
+        if names is None:
+            # Events were lost (queue overflow, or the switch to polling), so fall back to a regular refresh
+            self.root.after(0, self.refresh_env_list)
+            return
+        root_path, ignore = root["path"], root["ignore"]
+        if root["depth"] > 1:
+            self._rescan_env_root(root)
+            return
+        names = [n for n in names if not any(fnmatch.fnmatch(n, pattern) for pattern in ignore)]
         try:
-            if os.path.exists(self.settings_file):
-                with open(self.settings_file, 'r') as f:
-                    loaded_settings = json.load(f)
-                    self.settings.update(loaded_settings)
+            records, removed_paths = self.env_index.update(root_path, names)
+            self.env_index.save()
         except Exception as e:
-            print(f"Error loading settings: {e}")
-        
-        # Ensure venv directory exists
-        os.makedirs(self.settings["venv_dir"], exist_ok=True)
-        
-        # Set working directory
-        self.venv_dir = self.settings["venv_dir"]
+            print(f"Error updating environment index: {e}")
+            return
+        self.root.after(0, lambda: self._patch_env_list(root_path, records, removed_paths))
     
-    def save_settings(self):
-        """Save current settings to JSON file"""
+    def _rescan_env_root(self, root):
+        """Watcher callback for a nested root: rescan it through the index and update its rows
+
+        Changes below the first level can add or remove whole subtrees, so
+        the root is scanned again; the index only relists directories whose
+        mtime changed.
+        """
+        exclude = {r["path"] for r in self.get_env_roots()} - {root["path"]}
         try:
-            with open(self.settings_file, 'w') as f:
-                json.dump(self.settings, f)
-            return True
+            records = self.env_index.scan(root["path"], root["depth"], root["ignore"], exclude)
+            self.env_index.save()
         except Exception as e:
-            messagebox.showerror("Save Error", f"Could not save settings: {e}")
-            return False
+            print(f"Error rescanning {root['path']}: {e}")
+            return
+        self.root.after(0, lambda: self._apply_watched_root(root["path"], records))
     
-    def setup_ui(self):
-        # Set style
-        self.style = ttk.Style()
-        self.apply_theme()
+    def _apply_watched_root(self, root_path, records):
+        """Apply a nested root's rescan to the environment list"""
+        if root_path not in self.env_watchers:
+            return
+        added = [record["path"] for record in records if record["path"] not in self.env_model.by_path]
+        self._apply_list_ops(self.env_model.update(records, root=root_path))
+        if not self.refresh_running:
+            self.status_var.set(self._env_list_status())
+        self.sync_package_index()
+        self.measure_disk_usage(added)
+        self.check_environment_health(added)
+    
+    def _patch_env_list(self, root_path, records, removed_paths):
+        """Apply a watcher update to the environment list"""
+        if root_path not in self.env_watchers:
+            return
+        self._apply_list_ops(self.env_model.patch(records, removed_paths))
+        if not self.refresh_running:
+            self.status_var.set(self._env_list_status())
+        self.sync_package_index()
+        self.measure_disk_usage([record["path"] for record in records])
+        self.check_environment_health([record["path"] for record in records])
+    
+    def _finish_refresh(self, status):
+        """Update the status bar and run any refresh requested during the scan"""
+        self.status_var.set(status)
+        self.refresh_running = False
+        self.sync_package_index()
+        self.measure_disk_usage()
+        self.check_environment_health()
+        if self.refresh_pending:
+            self.refresh_pending = False
+            self.refresh_env_list()
+    
+    def measure_disk_usage(self, env_paths=None):
+        """Measure environments in the background, filling in the Size column as results arrive
+
+        With env_paths None every listed environment is measured. The
+        per-root totals count files shared between environments once.
+        """
+        if self.usage_scan_running:
+            # Coalesce into one follow-up scan
+            if env_paths is None or self.usage_scan_pending is True:
+                self.usage_scan_pending = True
+            else:
+                self.usage_scan_pending = (self.usage_scan_pending or set()) | set(env_paths)
+            return
+        if env_paths is None:
+            env_paths = [record["path"] for record in self.env_model.records]
+            # Show the last known sizes right away
+            cached = {}
+            for path in env_paths:
+                size = self.disk_usage.get(path)
+                if size is not None:
+                    cached[path] = size
+            self._apply_list_ops(self.env_model.update_sizes(cached))
+        if not env_paths:
+            return
+        self.usage_scan_running = True
+        roots = {}
+        for record in self.env_model.records:
+            roots.setdefault(record.get("root", ""), []).append(record["path"])
+        lock = threading.Lock()
+        state = {"results": {}, "totals": None}
         
-        # Main frame
-        main_frame = ttk.Frame(self.root, padding="10")
-        main_frame.pack(fill=tk.BOTH, expand=True)
+        def on_result(path, size):
+            with lock:
+                state["results"][path] = size
         
-        # Title with animation effect
-        self.title_frame = ttk.Frame(main_frame)
-        self.title_frame.pack(fill=tk.X, pady=5)
+        def scan():
+            try:
+                self.disk_usage.scan(env_paths, on_result)
+                state["totals"] = {root: (self.disk_usage.combined(paths), len(paths)) for root, paths in roots.items()}
+            except Exception as e:
+                print(f"Error measuring disk usage: {e}")
+                state["totals"] = {}
         
-        self.title_label = ttk.Label(
-            self.title_frame, 
-            text="Python Virtual Environment Manager", 
-            font=("Helvetica", 16, "bold"),
-            foreground=self.colors["primary"]
-        )
-        self.title_label.pack(pady=5)
+        def flush():
+            with lock:
+                results, state["results"] = state["results"], {}
+            if results:
+                self._apply_list_ops(self.env_model.update_sizes(results))
+            if state["totals"] is None:
+                self.root.after(300, flush)
+                return
+            self._show_root_usage(state["totals"])
+            self.usage_scan_running = False
+            pending, self.usage_scan_pending = self.usage_scan_pending, None
+            if pending:
+                self.measure_disk_usage(None if pending is True else sorted(pending))
         
-        # Path display
-        path_frame = ttk.Frame(main_frame)
-        path_frame.pack(fill=tk.X, pady=5)
+        threading.Thread(target=scan, daemon=True).start()
+        self.root.after(300, flush)
+    
+    def _show_root_usage(self, totals):
+        """Show the disk usage of each root below the environment list"""
+        home = os.path.expanduser("~")
+        parts = []
+        for root, (size, count) in sorted(totals.items()):
+            location = "~" + root[len(home):] if root.startswith(home) else root
+            parts.append(f"{location}: {format_size(size)} ({count} environments)")
+        self.usage_var.set("Disk usage - " + "; ".join(parts) if parts else "")
+    
+    def check_environment_health(self, env_paths=None, force=False, report=False):
+        """Check environments in parallel in the background and flag broken ones in the list
+
+        With env_paths None every listed environment is checked. Cached
+        results are reused unless force is True or the environment or its
+        base interpreter changed. With report True a summary window is shown.
+        """
+        if self.health_check_running:
+            if report:
+                self.root.after(500, lambda: self.check_environment_health(env_paths, force, report))
+            else:
+                self.health_check_pending = True
+            return
+        if env_paths is None:
+            env_paths = [record["path"] for record in self.env_model.records]
+        # Show the last known results right away
+        for path in env_paths:
+            result = self.health.get(path)
+            if result is not None:
+                self.env_model.health[path] = result["status"]
+        self.env_view.redraw()
+        if not env_paths:
+            return
+        self.health_check_running = True
+        if report:
+            self.status_var.set(f"Checking {len(env_paths)} environments...")
+        lock = threading.Lock()
+        state = {"results": {}, "done": None}
         
-        ttk.Label(path_frame, text="Environments Path:").pack(side=tk.LEFT)
-        self.path_label = ttk.Label(path_frame, text=self.venv_dir, font=("Courier", 9))
-        self.path_label.pack(side=tk.LEFT, padx=5)
+        def on_result(path, result):
+            with lock:
+                state["results"][path] = result["status"]
         
-        # Notebook for tabs
-        self.notebook = ttk.Notebook(main_frame)
-        self.notebook.pack(fill=tk.BOTH, expand=True, pady=10)
+        def check():
+            try:
+                state["done"] = self.health.check_many(env_paths, on_result, force)
+            except Exception as e:
+                print(f"Error checking environments: {e}")
+                state["done"] = {}
         
-        # Environments tab
-        env_tab = ttk.Frame(self.notebook)
-        self.notebook.add(env_tab, text="Environments")
+        def flush():
+            with lock:
+                results, state["results"] = state["results"], {}
+            if results:
+                self.env_model.health.update(results)
+                self.env_view.redraw()
+            if state["done"] is None:
+                self.root.after(300, flush)
+                return
+            self.health_check_running = False
+            broken = sum(1 for result in state["done"].values() if result["status"] == "broken")
+            if broken:
+                self.status_var.set(f"{broken} broken environment{'s' if broken != 1 else ''} found "
+                                    "(Tools > Check Environment Health for details)")
+            if report:
+                self._show_health_report(state["done"])
+            if self.health_check_pending:
+                self.health_check_pending = False
+                self.check_environment_health()
         
-        # Environment listbox with scrollbar
-        list_frame = ttk.LabelFrame(env_tab, text="Available Environments")
-        list_frame.pack(fill=tk.BOTH, expand=True, pady=5, padx=5)
+        threading.Thread(target=check, daemon=True).start()
+        self.root.after(300, flush)
+    
+    def _show_health_report(self, results):
+        """List the environments with problems and what is wrong with them"""
+        names = {record["path"]: record["name"] for record in self.env_model.records}
+        unhealthy = sorted((path for path, result in results.items() if result["status"] != "ok"),
+                           key=lambda path: (results[path]["status"] != "broken", names.get(path, path).lower()))
+        if not unhealthy:
+            self.status_var.set(f"All {len(results)} environments are healthy")
+            messagebox.showinfo("Environment Health", f"All {len(results)} environments passed the health check")
+            return
         
-        self.env_listbox = tk.Listbox(
-            list_frame, 
-            font=("Courier", 10), 
-            height=10,
-            bg=self.colors["background"],
-            fg=self.colors["text"],
-            selectbackground=self.colors["primary"],
-            activestyle="dotbox"
-        )
-        self.env_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
+        report_window = tk.Toplevel(self.root)
+        report_window.title("Environment Health")
+        report_window.geometry("650x350")
+        report_window.transient(self.root)
+        
+        frame = ttk.Frame(report_window, padding=10)
+        frame.pack(fill=tk.BOTH, expand=True)
         
-        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.env_listbox.yview)
+        tree_frame = ttk.Frame(frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True)
+        tree = ttk.Treeview(tree_frame, columns=("status", "problem"))
+        tree.heading("#0", text="Environment", anchor=tk.W)
+        tree.heading("status", text="Status", anchor=tk.W)
+        tree.heading("problem", text="Problem", anchor=tk.W)
+        tree.column("#0", width=150)
+        tree.column("status", width=70, stretch=False)
+        tree.column("problem", width=380)
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.env_listbox.configure(yscrollcommand=scrollbar.set)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
-        # Double-click to activate
-        self.env_listbox.bind("<Double-1>", lambda e: self.activate_environment())
+        for path in unhealthy:
+            result = results[path]
+            item = tree.insert("", tk.END, text=names.get(path, path), open=True,
+                               values=(result["status"], result["problems"][0] if result["problems"] else ""))
+            for problem in result["problems"][1:]:
+                tree.insert(item, tk.END, text="", values=("", problem))
         
-        # Buttons frame for environment actions
-        btn_frame = ttk.Frame(env_tab)
-        btn_frame.pack(fill=tk.X, pady=5)
+        broken = sum(1 for path in unhealthy if results[path]["status"] == "broken")
+        ttk.Label(frame, text=f"{broken} broken, {len(unhealthy) - broken} with warnings, "
+                              f"{len(results) - len(unhealthy)} healthy", anchor=tk.W).pack(fill=tk.X, pady=(5, 0))
+        self.status_var.set(f"Health check: {broken} broken, {len(unhealthy) - broken} with warnings")
+    
+    def activate_environment(self):
+        """Activate the selected virtual environment"""
+        record = self.env_view.selected_record()
+        if record is None:
+            messagebox.showinfo("Selection Required", "Please select a virtual environment to activate")
+            return
         
-        tk.Button(
-            btn_frame, 
-            text="Activate",
-            command=self.activate_environment,
-            bg=self.colors["primary"],
-            fg="white",
-            relief=tk.RAISED,
-            padx=10
-        ).pack(side=tk.LEFT, padx=5, pady=2)
+        env_name = record["name"]
+        env_path = record["path"]
         
-        tk.Button(
-            btn_frame, 
-            text="Create New",
-            command=self.show_create_dialog,
-            bg=self.colors["secondary"],
-            fg="white",
-            relief=tk.RAISED,
-            padx=10
-        ).pack(side=tk.LEFT, padx=5, pady=2)
+        # Warn before opening a terminal on an environment known to be broken
+        health = self.health.get(env_path)
+        if health is not None and health["status"] == "broken":
+            if not messagebox.askyesno("Broken Environment",
+                                       f"'{env_name}' failed its health check:\n\n" + "\n".join(health["problems"]) +
+                                       "\n\nActivate it anyway?"):
+                return
         
-        tk.Button(
-            btn_frame, 
-            text="Import",
-            command=self.import_environment,
-            bg=self.colors["secondary"],
-            fg="white",
-            relief=tk.RAISED,
-            padx=10
-        ).pack(side=tk.LEFT, padx=5, pady=2)
+        # Find activation script based on OS
+        if os.name == "nt":  # Windows
+            activate_script = os.path.join(env_path, "Scripts", "activate.bat")
+        else:  # Unix/Linux/Mac
+            activate_script = os.path.join(env_path, "bin", "activate")
         
-        tk.Button(
-            btn_frame, 
-            text="Delete",
-            command=self.delete_environment,
-            bg=self.colors["accent"],
-            fg="white",
-            relief=tk.RAISED,
-            padx=10
-        ).pack(side=tk.LEFT, padx=5, pady=2)
+        if not os.path.exists(activate_script):
+            messagebox.showerror("Error", f"Activation script not found at:\n{activate_script}")
+            return
         
-        tk.Button(
-            btn_frame, 
-            text="Refresh",
-            command=self.refresh_env_list,
-            bg=self.colors["background"],
-            fg=self.colors["text"],
-            relief=tk.RAISED,
-            padx=10
-        ).pack(side=tk.LEFT, padx=5, pady=2)
+        try:
+            self.show_loading(f"Activating {env_name}")
+            
+            # Check if environment has a main file
+            env_settings_file = os.path.join(env_path, ".env_settings", "settings.json")
+            main_file = None
+            
+            if os.path.exists(env_settings_file):
+                try:
+                    with open(env_settings_file, 'r') as f:
+                        env_settings = json.load(f)
+                        main_file = env_settings.get("main_file")
+                except:
+                    pass
+            
+            # Start a new terminal window with the activated environment
+            if os.name == "nt":  # Windows
+                if main_file and os.path.exists(main_file):
+                    # Run with main file
+                    cmd_command = f'start cmd.exe /K "{activate_script} && echo Virtual environment \'{env_name}\' activated. && python "{main_file}""'
+                else:
+                    # Normal activation without main file
+                    cmd_command = f'start cmd.exe /K "{activate_script} && echo Virtual environment \'{env_name}\' activated. Type \'deactivate\' to exit."'
+                
+                subprocess.run(cmd_command, shell=True)
+            else:  # Unix/Linux/Mac
+                terminal_cmd = f"gnome-terminal --" if shutil.which("gnome-terminal") else "xterm -e"
+                
+                if main_file and os.path.exists(main_file):
+                    # Run with main file
+                    cmd = f'{terminal_cmd} bash -c \'source "{activate_script}"; echo "Virtual environment \'{env_name}\' activated."; python "{main_file}"; exec bash\''
+                else:
+                    # Normal activation without main file
+                    cmd = f'{terminal_cmd} bash -c \'source "{activate_script}"; echo "Virtual environment \'{env_name}\' activated. Type \'deactivate\' to exit."; exec bash\''
+                
+                subprocess.run(cmd, shell=True)
+            
+            self.stop_loading()
+            self.status_var.set(f"Activated '{env_name}' environment")
+            
+            # Add message if main file was executed
+            if main_file and os.path.exists(main_file):
+                self.status_var.set(f"Activated '{env_name}' and running {os.path.basename(main_file)}")
+                
+        except Exception as e:
+            self.stop_loading()
+            self.status_var.set(f"Error: {str(e)}")
+            messagebox.showerror("Activation Error", f"Failed to activate environment: {str(e)}")
+    
+    def run_main_file(self, record=None):
+        """Run the selected environment's main file in a console on the Run tab
+
+        The interpreter is started directly with the variables the activate
+        script would set, so no shell or terminal is involved.
+        """
+        requested = time.perf_counter()
+        record = record or self.env_view.selected_record()
+        if record is None:
+            messagebox.showinfo("Selection Required", "Please select a virtual environment to run")
+            return
         
-        # Settings tab
-        settings_tab = ttk.Frame(self.notebook)
-        self.notebook.add(settings_tab, text="Settings")
+        env_name = record["name"]
+        env_path = record["path"]
+        python_path = HealthCheck.python_path(env_path)
+        if not os.path.exists(python_path):
+            messagebox.showerror("Error", f"Python interpreter not found at:\n{python_path}")
+            return
+        
+        main_file = read_env_settings(env_path).get("main_file")
+        if not main_file or not os.path.exists(main_file):
+            main_file = filedialog.askopenfilename(
+                title=f"Select Main File for '{env_name}'",
+                filetypes=[("Python files", "*.py *.pyw"), ("All files", "*.*")]
+            )
+            if not main_file:
+                return
+            try:
+                update_env_settings(env_path, main_file=main_file)
+            except OSError as e:
+                print(f"Error saving main file for {env_name}: {e}")
+        
+        console = RunConsole(self.run_notebook, lambda: self.close_run_console(console))
+        console.log.configure_colors(self.colors["background"], self.colors["text"])
+        self.run_consoles[str(console.frame)] = console
+        self.run_notebook.add(console.frame, text=f"{env_name}: {os.path.basename(main_file)}")
+        self.run_notebook.select(console.frame)
+        self.notebook.select(self.run_tab)
+        console.start([python_path, main_file], env=activated_environ(env_path),
+                      cwd=os.path.dirname(main_file) or None, requested=requested)
+        self.status_var.set(f"Running {os.path.basename(main_file)} in '{env_name}'")
+    
+    def close_run_console(self, console):
+        """Close a Run tab console, stopping its program if it is still running"""
+        if console.running:
+            if not messagebox.askyesno("Program Running", "The program is still running. Stop it and close the console?"):
+                return
+            console.stop()
+        self.run_consoles.pop(str(console.frame), None)
+        self.run_notebook.forget(console.frame)
+        console.close()
+    
+    def show_create_dialog(self):
+        """Show dialog to create a new virtual environment"""
+        create_window = tk.Toplevel(self.root)
+        create_window.title("Create New Virtual Environment")
+        create_window.geometry("450x410")
+        create_window.transient(self.root)
+        create_window.grab_set()
         
-        # Environment directory settings
-        dir_frame = ttk.LabelFrame(settings_tab, text="Environment Directory")
-        dir_frame.pack(fill=tk.X, expand=False, pady=10, padx=10)
+        frame = ttk.Frame(create_window, padding=10)
+        frame.pack(fill=tk.BOTH, expand=True)
         
-        ttk.Label(dir_frame, text="Current Directory:").pack(anchor=tk.W, padx=5, pady=5)
-        ttk.Label(dir_frame, text=self.venv_dir, font=("Courier", 9)).pack(anchor=tk.W, padx=15, pady=2)
+        # Environment name
+        ttk.Label(frame, text="Environment Name:").pack(anchor=tk.W, pady=(10, 5))
+        name_var = tk.StringVar()
+        name_entry = ttk.Entry(frame, textvariable=name_var, width=40)
+        name_entry.pack(fill=tk.X, padx=5, pady=5)
+        name_entry.focus()
         
-        tk.Button(
-            dir_frame,
-            text="Change Directory",
-            command=self.change_venv_dir,
-            bg=self.colors["primary"],
-            fg="white",
-            relief=tk.RAISED,
-            padx=10
-        ).pack(anchor=tk.W, padx=5, pady=5)
+        # Python version selection
+        ttk.Label(frame, text="Python Executable:").pack(anchor=tk.W, pady=(10, 5))
         
-        # Python executable settings
-        py_frame = ttk.LabelFrame(settings_tab, text="Python Executable")
-        py_frame.pack(fill=tk.X, expand=False, pady=10, padx=10)
+        path_frame = ttk.Frame(frame)
+        path_frame.pack(fill=tk.X, pady=5)
         
-        self.python_path_var = tk.StringVar(value=self.settings["python_path"])
-        py_entry = ttk.Entry(py_frame, textvariable=self.python_path_var, width=50)
-        py_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5, pady=10)
+        py_path_var = tk.StringVar(value=self.settings["python_path"])
+        self._interpreter_combobox(path_frame, py_path_var, width=40).pack(side=tk.LEFT, fill=tk.X, expand=True)
         
-        tk.Button(
-            py_frame, 
+        ttk.Button(
+            path_frame,
             text="Browse",
-            command=self.browse_python_executable,
-            bg=self.colors["background"],
-            fg=self.colors["text"],
-            relief=tk.RAISED,
-            padx=10
+            command=lambda: self.browse_python_executable(py_path_var)
         ).pack(side=tk.RIGHT, padx=5)
         
-        # Theme settings
-        theme_frame = ttk.LabelFrame(settings_tab, text="Theme Settings")
-        theme_frame.pack(fill=tk.X, expand=False, pady=10, padx=10)
+        py_info_var = tk.StringVar()
+        ttk.Label(frame, textvariable=py_info_var).pack(anchor=tk.W, padx=5)
         
-        ttk.Label(theme_frame, text="Choose Theme:").pack(anchor=tk.W, padx=5, pady=5)
+        def describe_python(*_):
+            entry = self.interpreters.find(py_path_var.get().strip())
+            py_info_var.set(InterpreterRegistry.describe(entry) if entry else "")
+        py_path_var.trace_add("write", describe_python)
+        describe_python()
         
-        self.theme_var = tk.StringVar(value=self.settings.get("theme", "light"))
-        ttk.Radiobutton(
-            theme_frame, 
-            text="Light", 
-            variable=self.theme_var, 
-            value="light",
-            command=self.change_theme
-        ).pack(anchor=tk.W, padx=20, pady=2)
+        # Optional template environment to clone instead of running venv
+        ttk.Label(frame, text="Clone From Template (optional):").pack(anchor=tk.W, pady=(10, 5))
+        template_var = tk.StringVar()
+        ttk.Combobox(
+            frame,
+            textvariable=template_var,
+            values=[""] + [r["name"] for r in self.env_model.records[:1000]],
+            width=40
+        ).pack(fill=tk.X, padx=5, pady=5)
         
-        ttk.Radiobutton(
-            theme_frame, 
-            text="Dark", 
-            variable=self.theme_var, 
-            value="dark",
-            command=self.change_theme
-        ).pack(anchor=tk.W, padx=20, pady=2)
+        # Packages to install
+        ttk.Label(frame, text="Packages to Install (space separated):").pack(anchor=tk.W, pady=(10, 5))
+        packages_var = tk.StringVar()
+        packages_entry = ttk.Entry(frame, textvariable=packages_var, width=40)
+        packages_entry.pack(fill=tk.X, padx=5, pady=5)
         
-        tk.Button(
-            theme_frame,
-            text="Customize Colors",
-            command=self.customize_colors,
-            bg=self.colors["background"],
-            fg=self.colors["text"],
-            relief=tk.RAISED,
-            padx=10
-        ).pack(anchor=tk.W, padx=5, pady=10)
+        # Options
+        options_frame = ttk.Frame(frame)
+        options_frame.pack(fill=tk.X, pady=10)
+        
+        system_site_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            options_frame, 
+            text="System site packages", 
+            variable=system_site_var
+        ).pack(side=tk.LEFT, padx=5)
+        
+        no_pip_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            options_frame, 
+            text="Without pip", 
+            variable=no_pip_var
+        ).pack(side=tk.LEFT, padx=5)
+        
+        # Buttons
+        btn_frame = ttk.Frame(frame)
+        btn_frame.pack(fill=tk.X, pady=10, side=tk.BOTTOM)
         
         tk.Button(
-            settings_tab,
-            text="Save Settings",
-            command=self.save_settings_from_ui,
+            btn_frame,
+            text="Create",
             bg=self.colors["primary"],
             fg="white",
             relief=tk.RAISED,
-            padx=10
-        ).pack(side=tk.BOTTOM, pady=10)
+            padx=10,
+            command=lambda: self.create_environment(
+                name_var.get().strip(),
+                py_path_var.get(),
+                packages_var.get(),
+                system_site_var.get(),
+                no_pip_var.get(),
+                create_window,
+                template_var.get().strip()
+            )
+        ).pack(side=tk.RIGHT, padx=5)
         
-        # Status bar with animation capability
-        self.status_var = tk.StringVar()
-        self.status_var.set("Ready")
-        self.status_bar = ttk.Label(
-            main_frame, 
-            textvariable=self.status_var, 
-            relief=tk.SUNKEN, 
-            anchor=tk.W
-        )
-        self.status_bar.pack(fill=tk.X, side=tk.BOTTOM, pady=5)
-
-        # Remove the inline progress bar from the main window
-        self.progress = None
-        self.progress_dialog = None
-
-        # Start title animation
-        self.start_title_animation()
+        tk.Button(
+            btn_frame,
+            text="Cancel",
+            command=create_window.destroy,
+            bg=self.colors["background"],
+            fg=self.colors["text"],
+            relief=tk.RAISED,
+            padx=10
+        ).pack(side=tk.RIGHT, padx=5)
     
-    def apply_theme(self):
-        """Apply the current theme to the UI"""
-        if self.settings.get("theme") == "dark":
-            self.colors = {
-                "primary": "#3498db",
-                "secondary": "#2ecc71",
-                "background": "#333333",
-                "text": "#f5f5f5",
-                "accent": "#e74c3c"
-            }
-        else:  # Light theme
-            self.colors = {
-                "primary": "#3498db",
-                "secondary": "#2ecc71",
-                "background": "#f5f5f5",
-                "text": "#333333",
-                "accent": "#e74c3c"
-            }
-        
-        # Override with custom colors if they exist
-        if "custom_colors" in self.settings:
-            self.colors.update(self.settings["custom_colors"])
-        
-        # Configure styles
-        self.style.configure("TFrame", background=self.colors["background"])
-        self.style.configure("TLabel", background=self.colors["background"], foreground=self.colors["text"])
-        
-        # Fix button styling to ensure text is visible
-        self.style.configure("TButton", 
-                             background=self.colors["background"], 
-                             foreground=self.colors["text"])
+    def create_environment(self, name, python_path, packages, system_site, no_pip, window, template=None):
+        """Create a new virtual environment"""
+        if not name:
+            messagebox.showerror("Error", "Please enter a name for the environment")
+            return
         
-        # Create button styles with explicit foreground colors
-        self.style.configure("Primary.TButton", 
-                             background=self.colors["primary"], 
-                             foreground="#ffffff")
+        # Check if environment already exists (or is being created by a queued job)
+        env_path = os.path.join(self.venv_dir, name)
+        if os.path.exists(env_path) or self.jobs.is_busy(env_path):
+            messagebox.showerror("Error", f"Environment '{name}' already exists")
+            return
         
-        self.style.map("Primary.TButton",
-                       foreground=[('active', '#ffffff'), ('pressed', '#ffffff')],
-                       background=[('active', self.colors["primary"]), ('pressed', self.colors["primary"])])
+        template_path = None
+        if template:
+            template_path = self.find_env_path(template)
+            if template_path is None:
+                messagebox.showerror("Error", f"Template environment '{template}' not found")
+                return
+            mismatches = template_mismatches(template_path, python_path, system_site, no_pip)
+            if mismatches and not messagebox.askyesno(
+                    "Template Mismatch",
+                    f"'{template}' does not match the selected options, and a clone keeps the template's:\n\n"
+                    + "\n".join(mismatches) + "\n\nClone it anyway?",
+                    parent=window):
+                return
         
-        self.style.configure("Secondary.TButton", 
-                             background=self.colors["secondary"], 
-                             foreground="#ffffff")
+        # Build command
+        cmd = [python_path, "-m", "venv"]
         
-        self.style.map("Secondary.TButton",
-                       foreground=[('active', '#ffffff'), ('pressed', '#ffffff')],
-                       background=[('active', self.colors["secondary"]), ('pressed', self.colors["secondary"])])
+        if system_site:
+            cmd.append("--system-site-packages")
+            
+        if no_pip:
+            cmd.append("--without-pip")
+            
+        cmd.append(env_path)
         
-        self.style.configure("Accent.TButton", 
-                             background=self.colors["accent"], 
-                             foreground="#ffffff")
+        # Close the window
+        window.destroy()
         
-        self.style.map("Accent.TButton",
-                       foreground=[('active', '#ffffff'), ('pressed', '#ffffff')],
-                       background=[('active', self.colors["accent"]), ('pressed', self.colors["accent"])])
+        spare_spec = SparePool.spec(python_path, system_site, no_pip)
         
-        # Apply to root window
-        self.root.configure(bg=self.colors["background"])
+        # Start creation as a job; the template is locked so it can't be deleted mid-clone
+        self.jobs.submit(
+            f"Create '{name}'",
+            lambda job: self._create_env_thread(cmd, name, packages, template_path, spare_spec, job,
+                                                spec=None if template_path else env_spec(python_path, system_site, no_pip, packages)),
+            envs=[env_path] + ([template_path] if template_path else [])
+        )
+        self.status_var.set(f"Creating environment '{name}'...")
+    
+    def _create_env_thread(self, cmd, name, packages, template_path=None, spare_spec=None, job=None, spec=None):
+        """Job function to create environment and install packages"""
+        # venv and pip output is streamed to the log pane as it is produced
+        stream = ProcessStream(on_line=self.log_pane.write)
+        try:
+            self._build_env(cmd, name, packages, stream, template_path, spare_spec, job, spec)
+            self.root.after(0, lambda: self.status_var.set(f"Environment '{name}' created successfully"))
+            self.root.after(0, self.refresh_env_list)
+            
+        except subprocess.CalledProcessError as e:
+            error_msg = f"Error creating environment: {e}\n{e.stderr}"
+            self.root.after(0, lambda: messagebox.showerror("Creation Failed", error_msg))
+            self.root.after(0, lambda: self.status_var.set("Environment creation failed"))
+            raise
+        except CopyCancelled:
+            self.root.after(0, lambda: self.status_var.set(f"Creation of '{name}' cancelled"))
+            raise
+        except Exception as e:
+            error_msg = str(e)
+            self.root.after(0, lambda: messagebox.showerror("Error", error_msg))
+            self.root.after(0, lambda: self.status_var.set("Environment creation failed"))
+            raise
+        finally:
+            stream.finished = True
+    
+    def _build_env(self, cmd, name, packages, stream, template_path=None, spare_spec=None, job=None,
+                   spec=None, track=True, pip_env=None):
+        """Create an environment and install its packages; raises on failure
+
+        Runs on a job worker. With track=False no progress dialogs are opened
+        (used by batch creation). spec is recorded in .env_settings so later
+        manifests can recognize the environment.
+        """
+        env_path = os.path.join(self.venv_dir, name)
+        if job is not None:
+            job.on_cancel(stream.cancel)
+        try:
+            if template_path:
+                # Clone the template with linked site-packages instead of running venv
+                self._clone_env(template_path, env_path, name, job)
+            else:
+                claimed = False
+                if spare_spec is not None:
+                    # A spare with the packages preinstalled needs no pip run at all
+                    preset_spec = dict(spare_spec, packages=" ".join(sorted(packages.split())))
+                    if packages.strip() and self.spare_pool.claim(preset_spec, env_path):
+                        packages = ""
+                        claimed = True
+                    else:
+                        claimed = self.spare_pool.claim(spare_spec, env_path)
+                    self.spare_pool.refill()
+                if not claimed:
+                    # Create the environment
+                    if track:
+                        self.root.after(0, lambda: self._track_process(stream, "Creating Environment"))
+                    stream.run(cmd, f"Creating environment '{name}'")
+            
+            # Install packages if specified
+            if packages.strip():
+                self.root.after(0, lambda: self.status_var.set(f"Installing packages in '{name}'..."))
+                if track and stream.process is None:
+                    self.root.after(0, lambda: self._track_process(stream, "Creating Environment"))
+                
+                # Get pip path
+                if os.name == "nt":
+                    pip_path = os.path.join(self.venv_dir, name, "Scripts", "pip.exe")
+                else:
+                    pip_path = os.path.join(self.venv_dir, name, "bin", "pip")
+                
+                package_list = packages.split()
+                
+                def run_pip(pip_cmd):
+                    stream.run(pip_cmd, f"Installing packages in '{name}'", PipProgress(len(package_list)), env=pip_env)
+                
+                # A failed install is rolled back to this snapshot instead of leaving a half-installed environment
+                snapshot_id = self._snapshot_env(env_path, f"Before installing {' '.join(package_list)}")
+                
+                # Install a cached pinned resolution when there is one, from the local
+                # wheelhouse when it covers the request
+                try:
+                    offline, cached = self.resolution_cache.install(self.wheelhouse, pip_path, env_path, package_list, run=run_pip)
+                except subprocess.CalledProcessError:
+                    self._roll_back_env(env_path, snapshot_id)
+                    raise
+                if cached:
+                    stream.on_line("Installed the cached pinned resolution (resolver skipped)")
+                if not offline:
+                    self._fill_wheelhouse_later(env_path, package_list)
+                
+                # Share the installed files with other environments through the package store
+                self._dedupe_later(env_path)
+            
+            if spec is not None:
+                update_env_settings(env_path, spec=spec)
+        except CopyCancelled:
+            self._discard_partial(env_path)
+            raise
+    
+    def create_from_manifest(self):
+        """Create every environment listed in a TOML/JSON manifest"""
+        manifest_file = filedialog.askopenfilename(
+            title="Select Environment Manifest",
+            filetypes=[("Manifests", "*.toml *.json"), ("All files", "*.*")]
+        )
+        if not manifest_file:
+            return
+        try:
+            entries, parallelism = load_env_manifest(manifest_file)
+        except Exception as e:
+            messagebox.showerror("Manifest Error", f"Could not read manifest: {e}")
+            return
         
-        # If env_listbox exists, update its colors
-        if hasattr(self, "env_listbox"):
-            self.env_listbox.configure(
-                bg=self.colors["background"],
-                fg=self.colors["text"],
-                selectbackground=self.colors["primary"]
-            )
+        parallelism = simpledialog.askinteger(
+            "Parallel Creations",
+            f"The manifest lists {len(entries)} environments.\nHow many should be created at once?\n\n"
+            f"Background jobs are limited to {self.jobs.workers} at once (Settings > Background Jobs).",
+            initialvalue=parallelism or int(self.settings.get("batch_parallelism", 2)),
+            minvalue=1, maxvalue=16
+        )
+        if not parallelism:
+            return
+        self.settings["batch_parallelism"] = parallelism
+        self.save_settings()
         
-        # Update button colors
-        self.update_button_colors()
+        # All pip processes of the batch share one download cache
+        cache_dir = os.path.join(os.path.dirname(self.settings_file), "pip-cache")
+        batch = {
+            "manifest": manifest_file,
+            "title": f"Batch Create - {os.path.basename(manifest_file)}",
+            "report_name": os.path.splitext(os.path.basename(manifest_file))[0],
+            "job_title": "Create '{name}' (manifest)",
+            "work": self._batch_create,
+            "entries": entries,
+            "pending": collections.deque(entries),
+            "results": {entry["name"]: {"status": "Pending", "duration": None, "detail": ""} for entry in entries},
+            "running": 0,
+            "jobs": [],
+            "cap": parallelism,
+            "lock": threading.Lock(),
+            "pip_env": dict(os.environ, PIP_CACHE_DIR=cache_dir),
+            "started": time.time(),
+            "summary": lambda counts, elapsed: (f"Manifest finished in {elapsed}: {counts['Created']} created, "
+                                                f"{counts['Skipped']} skipped, "
+                                                f"{counts['Failed'] + counts['Conflict']} need attention")
+        }
+        self._show_batch_report(batch)
+        self._batch_next(batch)
+        self.status_var.set(f"Creating {len(entries)} environments from {os.path.basename(manifest_file)}...")
     
-    def update_button_colors(self):
-        """Update colors for all tk buttons when theme changes"""
-        def update_buttons(widget):
-            if isinstance(widget, tk.Button):
-                if "primary" in str(widget["bg"]):
-                    widget.configure(bg=self.colors["primary"], fg="white")
-                elif "secondary" in str(widget["bg"]):
-                    widget.configure(bg=self.colors["secondary"], fg="white")
-                elif "accent" in str(widget["bg"]):
-                    widget.configure(bg=self.colors["accent"], fg="white")
+    def _batch_next(self, batch):
+        """Submit batch entries as jobs until the batch's parallelism cap is reached"""
+        with batch["lock"]:
+            while batch["pending"] and batch["running"] < batch["cap"]:
+                entry = batch["pending"].popleft()
+                batch["running"] += 1
+                env_path = entry.get("path") or os.path.join(self.venv_dir, entry["name"])
+                batch["jobs"].append(self.jobs.submit(
+                    batch["job_title"].format(name=entry["name"]),
+                    lambda job, entry=entry: batch["work"](batch, entry, job),
+                    envs=[env_path],
+                    on_done=lambda job, entry=entry: self._batch_job_done(batch, entry, job)
+                ))
+            finished = not batch["pending"] and batch["running"] == 0
+        if finished:
+            self.root.after(0, lambda: self._finish_batch(batch))
+    
+    def _batch_create(self, batch, entry, job):
+        """Job function creating one manifest entry and recording its result"""
+        name = entry["name"]
+        env_path = os.path.join(self.venv_dir, name)
+        python_path = entry["python"] or self.settings["python_path"]
+        spec = env_spec(python_path, entry["system_site"], entry["no_pip"], entry["packages"])
+        result = batch["results"][name]
+        result["status"] = "Running"
+        self.root.after(0, lambda: self._update_batch_report(batch))
+        started = time.time()
+        try:
+            if os.path.exists(env_path):
+                # Never touch existing environments; only report whether they match
+                if read_env_settings(env_path).get("spec") == spec:
+                    result["status"], result["detail"] = "Skipped", "Already exists and matches the manifest"
                 else:
-                    widget.configure(bg=self.colors["background"], fg=self.colors["text"])
+                    result["status"], result["detail"] = "Conflict", "Exists with a different spec; left unchanged"
+                return
             
-            # Recursively update children
-            for child in widget.winfo_children():
-                update_buttons(child)
+            cmd = [python_path, "-m", "venv"]
+            if entry["system_site"]:
+                cmd.append("--system-site-packages")
+            if entry["no_pip"]:
+                cmd.append("--without-pip")
+            cmd.append(env_path)
+            
+            stream = ProcessStream(on_line=lambda line: self.log_pane.write(f"[{name}] {line}"))
+            try:
+                self._build_env(cmd, name, " ".join(entry["packages"]), stream,
+                                spare_spec=SparePool.spec(python_path, entry["system_site"], entry["no_pip"]),
+                                job=job, spec=spec, track=False, pip_env=batch["pip_env"])
+            finally:
+                stream.finished = True
+            result["status"], result["detail"] = "Created", f"{len(entry['packages'])} packages requested"
+        except CopyCancelled:
+            result["status"], result["detail"] = "Cancelled", ""
+            raise
+        except subprocess.CalledProcessError as e:
+            output = (e.stderr or "").strip().splitlines()
+            result["status"], result["detail"] = "Failed", output[-1] if output else str(e)
+            raise
+        except Exception as e:
+            result["status"], result["detail"] = "Failed", str(e)
+            raise
+        finally:
+            result["duration"] = time.time() - started
+    
+    def _batch_job_done(self, batch, entry, job):
+        """Account for a finished batch job (also called for jobs cancelled while queued)"""
+        result = batch["results"][entry["name"]]
+        if job.state == Job.CANCELLED and result["status"] in ("Pending", "Running"):
+            result["status"] = "Cancelled"
+        with batch["lock"]:
+            batch["running"] -= 1
+        self.root.after(0, lambda: self._update_batch_report(batch))
+        self._batch_next(batch)
+    
+    def _cancel_batch(self, batch):
+        """Drop the batch's pending entries and cancel its queued and running jobs"""
+        with batch["lock"]:
+            for entry in batch["pending"]:
+                batch["results"][entry["name"]]["status"] = "Cancelled"
+            batch["pending"].clear()
+            jobs = list(batch["jobs"])
+        for job in jobs:
+            self.jobs.cancel(job)
+        self._update_batch_report(batch)
+    
+    def _show_batch_report(self, batch):
+        """Open the live per-environment report window for a batch"""
+        window = tk.Toplevel(self.root)
+        window.title(batch["title"])
+        window.geometry("600x350")
+        window.transient(self.root)
         
-        # Start the recursive update from the root window
-        update_buttons(self.root)
+        tree = ttk.Treeview(window, columns=("status", "duration", "detail"), selectmode="browse")
+        tree.heading("#0", text="Environment", anchor=tk.W)
+        tree.heading("status", text="Result", anchor=tk.W)
+        tree.heading("duration", text="Time", anchor=tk.W)
+        tree.heading("detail", text="Details", anchor=tk.W)
+        tree.column("#0", width=150)
+        tree.column("status", width=80, stretch=False)
+        tree.column("duration", width=60, stretch=False)
+        tree.column("detail", width=280)
+        for entry in batch["entries"]:
+            tree.insert("", tk.END, iid=entry["name"], text=entry["name"], values=("Pending", "", ""))
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 5))
+        
+        summary_var = tk.StringVar()
+        ttk.Label(window, textvariable=summary_var, anchor=tk.W).pack(fill=tk.X, padx=10)
+        
+        btn_frame = ttk.Frame(window)
+        btn_frame.pack(fill=tk.X, padx=10, pady=10)
+        ttk.Button(btn_frame, text="Cancel Remaining", command=lambda: self._cancel_batch(batch)).pack(side=tk.LEFT)
+        ttk.Button(btn_frame, text="Save Report...", command=lambda: self._save_batch_report(batch)).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="Close", command=window.destroy).pack(side=tk.RIGHT)
+        
+        batch["tree"] = tree
+        batch["summary_var"] = summary_var
+        self._update_batch_report(batch)
     
-    def change_theme(self):
-        """Change the UI theme"""
-        self.settings["theme"] = self.theme_var.get()
-        self.apply_theme()
+    def _update_batch_report(self, batch):
+        """Refresh the batch report window from the recorded results"""
+        counts = collections.Counter(result["status"] for result in batch["results"].values())
+        try:
+            for name, result in batch["results"].items():
+                duration = format_duration(result["duration"]) if result["duration"] is not None else ""
+                batch["tree"].item(name, values=(result["status"], duration, result["detail"]))
+            # Batch jobs share the scheduler's workers, which may allow fewer than the batch cap
+            cap = min(batch["cap"], self.jobs.workers)
+            batch["summary_var"].set(", ".join(f"{count} {status.lower()}" for status, count in sorted(counts.items()))
+                                     + f" - up to {cap} at once")
+        except tk.TclError:
+            pass  # report window was closed
     
-    def customize_colors(self):
-        """Let the user customize UI colors"""
-        color_window = tk.Toplevel(self.root)
-        color_window.title("Customize Colors")
-        color_window.geometry("400x300")
+    def _finish_batch(self, batch):
+        """Called on the main thread once every entry of a batch has a result"""
+        self._update_batch_report(batch)
+        counts = collections.Counter(result["status"] for result in batch["results"].values())
+        self.status_var.set(batch["summary"](counts, format_duration(time.time() - batch["started"])))
+        self.refresh_env_list()
+    
+    def _save_batch_report(self, batch):
+        """Write the batch results to a JSON file"""
+        report_file = filedialog.asksaveasfilename(
+            title="Save Batch Report",
+            defaultextension=".json",
+            initialfile=batch["report_name"] + "-report.json",
+            filetypes=[("JSON", "*.json")]
+        )
+        if not report_file:
+            return
+        try:
+            with open(report_file, 'w') as f:
+                json.dump({"batch": batch["title"], "manifest": batch.get("manifest"),
+                           "results": [dict(name=name, **result) for name, result in batch["results"].items()]},
+                          f, indent=2)
+            self.status_var.set(f"Batch report saved to {report_file}")
+        except Exception as e:
+            messagebox.showerror("Save Error", f"Could not save report: {e}")
+    
+    def rebuild_environments(self):
+        """Rebuild selected environments against another interpreter, e.g. after a Python upgrade"""
+        records = list(self.env_model.records)
+        if not records:
+            messagebox.showinfo("No Environments", "There are no environments to rebuild")
+            return
         
-        color_frame = ttk.Frame(color_window, padding=10)
-        color_frame.pack(fill=tk.BOTH, expand=True)
+        rebuild_window = tk.Toplevel(self.root)
+        rebuild_window.title("Rebuild Environments")
+        rebuild_window.geometry("600x450")
+        rebuild_window.transient(self.root)
         
-        # Create color pickers for each color
-        color_keys = ["primary", "secondary", "background", "text", "accent"]
-        color_vars = {}
+        frame = ttk.Frame(rebuild_window, padding=10)
+        frame.pack(fill=tk.BOTH, expand=True)
         
-        for i, key in enumerate(color_keys):
-            row_frame = ttk.Frame(color_frame)
-            row_frame.pack(fill=tk.X, pady=5)
-            
-            ttk.Label(row_frame, text=f"{key.capitalize()} Color:").pack(side=tk.LEFT, padx=5)
-            
-            color_vars[key] = tk.StringVar(value=self.colors[key])
-            color_entry = ttk.Entry(row_frame, textvariable=color_vars[key], width=10)
-            color_entry.pack(side=tk.LEFT, padx=5)
-            
-            color_button = ttk.Button(
-                row_frame, 
-                text="Pick Color",
-                command=lambda k=key, v=color_vars[key]: self.pick_color(v)
-            )
-            color_button.pack(side=tk.LEFT, padx=5)
-            
-            # Color preview
-            preview = tk.Canvas(row_frame, width=20, height=20, bg=self.colors[key])
-            preview.pack(side=tk.LEFT, padx=5)
-            
-            # Update preview when color changes
-            color_vars[key].trace_add("write", lambda *args, c=preview, v=color_vars[key]: c.config(bg=v.get()))
+        ttk.Label(frame, text="Rebuild against interpreter:").pack(anchor=tk.W, pady=(0, 5))
+        py_path_var = tk.StringVar(value=self.settings["python_path"])
+        self._interpreter_combobox(frame, py_path_var, width=60).pack(fill=tk.X, padx=5, pady=(0, 10))
         
-        button_frame = ttk.Frame(color_frame)
-        button_frame.pack(side=tk.BOTTOM, fill=tk.X, pady=10)
+        ttk.Label(frame, text="Environments (broken ones are preselected):").pack(anchor=tk.W, pady=(0, 5))
+        tree_frame = ttk.Frame(frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True)
+        tree = ttk.Treeview(tree_frame, columns=("version", "health"), selectmode="extended")
+        tree.heading("#0", text="Environment", anchor=tk.W)
+        tree.heading("version", text="Python", anchor=tk.W)
+        tree.heading("health", text="Health", anchor=tk.W)
+        tree.column("#0", width=300)
+        tree.column("version", width=80, stretch=False)
+        tree.column("health", width=80, stretch=False)
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        by_path = {}
+        for record in records:
+            by_path[record["path"]] = record
+            status = self.env_model.health.get(record["path"], "")
+            tree.insert("", tk.END, iid=record["path"], text=record["name"], values=(record.get("version", ""), status))
+        broken = [path for path in by_path if self.env_model.health.get(path) == "broken"]
+        if broken:
+            tree.selection_set(broken)
+            tree.see(broken[0])
+        
+        options_frame = ttk.Frame(frame)
+        options_frame.pack(fill=tk.X, pady=(10, 0))
+        ttk.Label(options_frame, text="Rebuilds at once:").pack(side=tk.LEFT, padx=5)
+        parallel_var = tk.IntVar(value=int(self.settings.get("batch_parallelism", 2)))
+        ttk.Spinbox(options_frame, from_=1, to=16, width=4, textvariable=parallel_var).pack(side=tk.LEFT, padx=5)
+        ttk.Label(options_frame, text=f"(at most {self.jobs.workers}, see Settings)").pack(side=tk.LEFT)
+        
+        def start():
+            python_path = py_path_var.get().strip()
+            selected = [by_path[path] for path in tree.selection()]
+            if not selected:
+                messagebox.showinfo("Selection Required", "Please select the environments to rebuild",
+                                    parent=rebuild_window)
+                return
+            if not os.path.isfile(python_path):
+                messagebox.showerror("Error", f"Interpreter not found:\n{python_path}", parent=rebuild_window)
+                return
+            try:
+                parallelism = max(1, int(parallel_var.get()))
+            except (tk.TclError, ValueError):
+                parallelism = 2
+            self.settings["batch_parallelism"] = parallelism
+            self.save_settings()
+            rebuild_window.destroy()
+            self._start_rebuild(python_path, selected, parallelism)
         
         tk.Button(
-            button_frame,
-            text="Apply Colors",
-            command=lambda: self.apply_custom_colors(color_vars, color_window),
+            options_frame,
+            text="Rebuild Selected",
+            command=start,
             bg=self.colors["primary"],
             fg="white",
             relief=tk.RAISED,
             padx=10
         ).pack(side=tk.RIGHT, padx=5)
-        
         tk.Button(
-            button_frame,
+            options_frame,
             text="Cancel",
-            command=color_window.destroy,
+            command=rebuild_window.destroy,
             bg=self.colors["background"],
             fg=self.colors["text"],
             relief=tk.RAISED,
             padx=10
         ).pack(side=tk.RIGHT, padx=5)
     
-    def pick_color(self, color_var):
-        """Open color chooser and update the color variable"""
-        color = colorchooser.askcolor(color_var.get())[1]
-        if color:
-            color_var.set(color)
-    
-    def apply_custom_colors(self, color_vars, window):
-        """Apply the custom colors to the UI"""
-        custom_colors = {k: v.get() for k, v in color_vars.items()}
-        self.settings["custom_colors"] = custom_colors
-        self.colors.update(custom_colors)
-        self.apply_theme()
-        window.destroy()
-    
-    def start_title_animation(self):
-        """Start an animation for the title"""
-        if not self.animation_running:
-            self.animation_running = True
-            self.animation_thread = threading.Thread(target=self.run_title_animation)
-            self.animation_thread.daemon = True
-            self.animation_thread.start()
+    def _start_rebuild(self, python_path, records, parallelism):
+        """Rebuild environments as a batch with a live per-environment report"""
+        # Names are only unique within a root
+        counts = collections.Counter(record["name"] for record in records)
+        entries = [{"name": record["name"] if counts[record["name"]] == 1 else record["path"], "path": record["path"]}
+                   for record in records]
+        entry = self.interpreters.find(python_path)
+        interpreter = f"Python {entry['version']}" if entry else os.path.basename(python_path)
+        batch = {
+            "title": f"Rebuild against {interpreter} ({python_path})",
+            "report_name": "rebuild",
+            "job_title": "Rebuild '{name}'",
+            "work": self._batch_rebuild,
+            "python": python_path,
+            "entries": entries,
+            "pending": collections.deque(entries),
+            "results": {entry["name"]: {"status": "Pending", "duration": None, "detail": ""} for entry in entries},
+            "running": 0,
+            "jobs": [],
+            "cap": parallelism,
+            "lock": threading.Lock(),
+            # One download cache for the whole batch, next to the wheelhouse
+            "pip_env": dict(os.environ, PIP_CACHE_DIR=os.path.join(os.path.dirname(self.settings_file), "pip-cache")),
+            "started": time.time(),
+            "summary": lambda counts, elapsed: (f"Rebuild finished in {elapsed}: {counts['Rebuilt']} rebuilt, "
+                                                f"{counts['Failed']} failed (old copies kept)")
+        }
+        self._show_batch_report(batch)
+        self._batch_next(batch)
+        self.status_var.set(f"Rebuilding {len(entries)} environments against {interpreter}...")
     
-    def run_title_animation(self):
-        """Run the title animation"""
-        colors = [self.colors["primary"], self.colors["secondary"], self.colors["accent"]]
-        i = 0
+    def _batch_rebuild(self, batch, entry, job):
+        """Job function rebuilding one environment and recording its result"""
+        name, env_path = entry["name"], entry["path"]
+        result = batch["results"][name]
+        result["status"] = "Running"
+        self.root.after(0, lambda: self._update_batch_report(batch))
+        started = time.time()
+        stream = ProcessStream(on_line=lambda line: self.log_pane.write(f"[{name}] {line}"))
+        job.on_cancel(stream.cancel)
         try:
-            while self.animation_running and hasattr(self, "title_label"):
-                color = colors[i % len(colors)]
-                self.root.after(0, lambda c=color: self.title_label.config(foreground=c))
-                time.sleep(2)
-                i += 1
+            # An environment created without pip has nothing pip could reinstall, and gets no pip now
+            no_pip = read_env_settings(env_path).get("spec", {}).get("no_pip", False)
+            requirements = [] if no_pip else freeze_requirements(env_path)
+            self._rebuild_env(env_path, batch["python"], requirements, stream, batch["pip_env"], no_pip=no_pip)
+            result["status"], result["detail"] = "Rebuilt", ("created without pip" if no_pip else
+                                                             f"{len(requirements)} packages reinstalled")
+        except CopyCancelled:
+            result["status"], result["detail"] = "Cancelled", "Old copy kept"
+            raise
+        except subprocess.CalledProcessError as e:
+            output = (e.stderr or "").strip().splitlines()
+            result["status"], result["detail"] = "Failed", "Old copy kept: " + (output[-1] if output else str(e))
+            raise
         except Exception as e:
-            print(f"Animation error: {e}")
+            result["status"], result["detail"] = "Failed", f"Old copy kept: {e}"
+            raise
         finally:
-            self.animation_running = False
+            stream.finished = True
+            result["duration"] = time.time() - started
     
-    def show_loading(self, message="Loading..."):
-        """Show a modal progress dialog with a progress bar"""
-        if getattr(self, 'progress_dialog', None) is not None:
-            return  # Already showing
-        def create_dialog():
-            self.progress_dialog = tk.Toplevel(self.root)
-            self.progress_dialog.title("Please Wait")
-            self.progress_dialog.geometry("350x100")
-            self.progress_dialog.resizable(False, False)
-            self.progress_dialog.transient(self.root)
-            self.progress_dialog.grab_set()
-            self.progress_dialog.protocol("WM_DELETE_WINDOW", lambda: None)  # Disable close
-            label = ttk.Label(self.progress_dialog, text=message, anchor=tk.CENTER, font=("Segoe UI", 11))
-            label.pack(pady=(20, 10), padx=10)
-            self.progress = ttk.Progressbar(self.progress_dialog, mode="indeterminate")
-            self.progress.pack(fill=tk.X, padx=20, pady=(0, 15))
-            self.progress.start(10)
-        self.root.after(0, create_dialog)
-        self.loading = True
-        self.loading_thread = threading.Thread(target=self.run_loading_animation, args=(message,))
-        self.loading_thread.daemon = True
-        self.loading_thread.start()
+    def _rebuild_env(self, env_path, python_path, requirements, stream, pip_env=None, no_pip=False):
+        """Recreate an environment for python_path in a staging folder and swap it into place
 
-    def stop_loading(self):
-        """Stop the loading animation and close the progress dialog"""
-        self.loading = False
-        def close_dialog():
-            if getattr(self, 'progress', None) is not None:
-                self.progress.stop()
-            if getattr(self, 'progress_dialog', None) is not None:
-                self.progress_dialog.grab_release()
-                self.progress_dialog.destroy()
-                self.progress_dialog = None
-            self.progress = None
-        self.root.after(0, close_dialog)
+        The staging folder sits next to the environment so the swap is a
+        rename on one filesystem. Files that are not part of the venv itself
+        (project files, .env_settings) move over to the new copy. If anything
+        fails before the swap completes, the old environment stays as it was.
+        no_pip creates the new copy with --without-pip, matching its recorded spec.
+        """
+        name = os.path.basename(env_path)
+        staging = os.path.join(os.path.dirname(env_path), f".{name}.rebuild-{time.time_ns()}")
+        cmd = [python_path, "-m", "venv"]
+        if read_pyvenv_cfg(env_path).get("include-system-site-packages", "").lower() == "true":
+            cmd.append("--system-site-packages")
+        if no_pip:
+            cmd.append("--without-pip")
+        pip_args = []
+        for requirement in requirements:
+            pip_args += ["-e", requirement[3:]] if requirement.startswith("-e ") else [requirement]
+        
+        try:
+            stream.run(cmd + [staging], f"Creating a new '{name}' in a staging folder")
+            offline = True
+            if pip_args:
+                pip_path = os.path.join(env_scripts_dir(staging), "pip.exe" if os.name == "nt" else "pip")
+                # Wheels from the wheelhouse and the shared pip cache make this mostly a local install
+                offline = self.wheelhouse.install([pip_path], pip_args, run=lambda pip_cmd: stream.run(
+                    pip_cmd, f"Reinstalling packages in '{name}'", PipProgress(len(pip_args)), env=pip_env))
+            self._swap_in_rebuild(env_path, staging)
+        except BaseException:
+            if os.path.lexists(staging):
+                self._discard_partial(staging)
+            raise
+        
+        self.package_inventory.forget([env_path])
+        self.disk_usage.forget([env_path])
+        self.health.forget([env_path])
+        settings = read_env_settings(env_path)
+        if settings.get("spec"):
+            update_env_settings(env_path, spec=dict(settings["spec"], python=os.path.realpath(python_path)))
+        if not offline:
+            pinned = [r for r in requirements if re.match(r"^[A-Za-z0-9._-]+==", r)]
+            self._fill_wheelhouse_later(env_path, pinned)
+        self._dedupe_later(env_path)
     
-    def run_loading_animation(self, message):
-        """Run the loading animation for the modal progress dialog"""
-        dots = [".", "..", "..."]
-        i = 0
+    def _swap_in_rebuild(self, env_path, staging):
+        """Swap a rebuilt environment into place, carrying over the user's files; undone on failure"""
+        exchange_dirs(staging, env_path)
+        # staging now holds the old environment
+        carried = []
         try:
-            while self.loading and getattr(self, 'progress_dialog', None) is not None:
-                if getattr(self, 'progress_dialog', None) is not None:
-                    for widget in self.progress_dialog.winfo_children():
-                        if isinstance(widget, ttk.Label):
-                            widget.config(text=f"{message} {dots[i % len(dots)]}")
-                time.sleep(0.3)
-                i += 1
-        except Exception:
-            pass
+            for entry in os.listdir(staging):
+                if entry not in VENV_LAYOUT and not os.path.lexists(os.path.join(env_path, entry)):
+                    os.rename(os.path.join(staging, entry), os.path.join(env_path, entry))
+                    carried.append(entry)
+            relocate_env(env_path, staging)
+        except BaseException:
+            for entry in carried:
+                os.rename(os.path.join(env_path, entry), os.path.join(staging, entry))
+            exchange_dirs(staging, env_path)
+            raise
+        # Snapshots hold the old interpreter's packages and can't be restored into the new one
+        snapshots_dir = os.path.join(env_path, ".env_settings", EnvSnapshots.DIR_NAME)
+        if os.path.isdir(snapshots_dir):
+            self.trash.move_to_trash(snapshots_dir, os.path.dirname(env_path))
+        self.trash.move_to_trash(staging, os.path.dirname(env_path))
     
-    def refresh_env_list(self):
-        """Refresh the list of available virtual environments"""
-        self.show_loading("Refreshing environment list")
-        self.env_listbox.delete(0, tk.END)
-        self.envs = []
-        
-        try:
-            # List all directories in the venv_dir
-            if os.path.exists(self.venv_dir):
-                for d in os.listdir(self.venv_dir):
-                    full_path = os.path.join(self.venv_dir, d)
-                    # Check if it's a directory and has activation script (basic check)
-                    if os.path.isdir(full_path):
-                        scripts_dir = os.path.join(full_path, "Scripts" if os.name == "nt" else "bin")
-                        if os.path.exists(scripts_dir):
-                            self.envs.append(d)
-                
-                for i, env in enumerate(self.envs, 1):
-                    self.env_listbox.insert(tk.END, f"{i}. {env}")
-                    # Add alternating row colors
-                    if i % 2 == 0:
-                        self.env_listbox.itemconfig(i-1, bg="#f0f0f0" if self.settings.get("theme") == "light" else "#3a3a3a")
-                
-                self.stop_loading()
-                if not self.envs:
-                    self.status_var.set("No virtual environments found")
-                else:
-                    self.status_var.set(f"Found {len(self.envs)} virtual environments")
-            else:
-                self.stop_loading()
-                self.status_var.set(f"Directory not found: {self.venv_dir}")
-        except Exception as e:
-            self.stop_loading()
-            self.status_var.set(f"Error: {str(e)}")
-            messagebox.showerror("Error", f"Failed to list environments: {str(e)}")
+    def _fill_wheelhouse_later(self, env_path, packages):
+        """Add wheels for the installed packages the wheelhouse lacks in the background"""
+        # Only what was not served from the wheelhouse, pinned to the installed versions
+        packages = self.wheelhouse.missing(packages, env_path)
+        if not packages:
+            return
+        python_path = os.path.join(env_scripts_dir(env_path), "python.exe" if os.name == "nt" else "python")
+        def fill(job):
+            try:
+                self.wheelhouse.populate(python_path, packages=packages)
+            except Exception as e:
+                print(f"Could not add wheels to wheelhouse: {e}")
+                raise
+        self.jobs.submit("Add wheels to wheelhouse", fill, priority=JobScheduler.LOW)
     
-    def activate_environment(self):
-        """Activate the selected virtual environment"""
-        selection = self.env_listbox.curselection()
-        if not selection:
-            messagebox.showinfo("Selection Required", "Please select a virtual environment to activate")
+    def _dedupe_later(self, env_path):
+        """Hardlink a new environment's packages into the package store in the background"""
+        def dedupe(job):
+            cancel_event = threading.Event()
+            job.on_cancel(cancel_event.set)
+            try:
+                self.package_store.dedupe_env(env_path, cancel_event)
+            except CopyCancelled:
+                raise
+            except Exception as e:
+                print(f"Could not dedupe {env_path}: {e}")
+                raise
+        self.jobs.submit(f"Link '{os.path.basename(env_path)}' into package store", dedupe,
+                         envs=[env_path], priority=JobScheduler.LOW)
+    
+    def dedupe_environments(self):
+        """Convert all listed environments to share package files through the store"""
+        env_paths = [record["path"] for record in self.env_model.records]
+        if not env_paths:
+            messagebox.showinfo("Deduplicate", "There are no environments to deduplicate")
             return
-        
-        # Get the selected environment name (removing the number prefix)
-        selected_idx = selection[0]
-        env_name = self.envs[selected_idx]
-        
-        # Find activation script based on OS
-        if os.name == "nt":  # Windows
-            activate_script = os.path.join(self.venv_dir, env_name, "Scripts", "activate.bat")
-        else:  # Unix/Linux/Mac
-            activate_script = os.path.join(self.venv_dir, env_name, "bin", "activate")
-        
-        if not os.path.exists(activate_script):
-            messagebox.showerror("Error", f"Activation script not found at:\n{activate_script}")
+        if not messagebox.askyesno("Deduplicate Environments",
+                                   f"Replace identical package files in {len(env_paths)} environments with "
+                                   f"hardlinks into the shared package store?\n\n"
+                                   f"Files modified after installation are left untouched."):
             return
-        
+        cancel_event = threading.Event()
+        window = ProgressWindow(self.root, "Deduplicating", "Linking package files into the store...",
+                                on_cancel=cancel_event.set)
+        window.update(0, detail=f"Waiting for other jobs on these environments...")
+        self.jobs.submit("Deduplicate environments",
+                         lambda job: self._dedupe_envs_thread(env_paths, window, cancel_event, job),
+                         envs=env_paths, priority=JobScheduler.LOW)
+    
+    def _dedupe_envs_thread(self, env_paths, window, cancel_event, job=None):
+        """Job function to dedupe environments and report the bytes reclaimed"""
+        if job is not None:
+            job.on_cancel(cancel_event.set)
+        def on_progress(done, total, env_path):
+            detail = f"{done} of {total} environments\n{os.path.basename(env_path)}"
+            self.root.after(0, lambda: window.update(done / total, detail=detail))
         try:
-            self.show_loading(f"Activating {env_name}")
-            
-            # Check if environment has a main file
-            env_settings_file = os.path.join(self.venv_dir, env_name, ".env_settings", "settings.json")
-            main_file = None
-            
-            if os.path.exists(env_settings_file):
-                try:
-                    with open(env_settings_file, 'r') as f:
-                        env_settings = json.load(f)
-                        main_file = env_settings.get("main_file")
-                except:
-                    pass
-            
-            # Start a new terminal window with the activated environment
-            if os.name == "nt":  # Windows
-                if main_file and os.path.exists(main_file):
-                    # Run with main file
-                    cmd_command = f'start cmd.exe /K "{activate_script} && echo Virtual environment \'{env_name}\' activated. && python "{main_file}""'
-                else:
-                    # Normal activation without main file
-                    cmd_command = f'start cmd.exe /K "{activate_script} && echo Virtual environment \'{env_name}\' activated. Type \'deactivate\' to exit."'
-                
-                subprocess.run(cmd_command, shell=True)
-            else:  # Unix/Linux/Mac
-                terminal_cmd = f"gnome-terminal --" if shutil.which("gnome-terminal") else "xterm -e"
-                
-                if main_file and os.path.exists(main_file):
-                    # Run with main file
-                    cmd = f'{terminal_cmd} bash -c \'source "{activate_script}"; echo "Virtual environment \'{env_name}\' activated."; python "{main_file}"; exec bash\''
-                else:
-                    # Normal activation without main file
-                    cmd = f'{terminal_cmd} bash -c \'source "{activate_script}"; echo "Virtual environment \'{env_name}\' activated. Type \'deactivate\' to exit."; exec bash\''
-                
-                subprocess.run(cmd, shell=True)
-            
-            self.stop_loading()
-            self.status_var.set(f"Activated '{env_name}' environment")
-            
-            # Add message if main file was executed
-            if main_file and os.path.exists(main_file):
-                self.status_var.set(f"Activated '{env_name}' and running {os.path.basename(main_file)}")
-                
+            report = self.package_store.dedupe(env_paths, on_progress, cancel_event)
+        except Exception as e:
+            self.root.after(0, lambda: messagebox.showerror("Deduplicate Error", str(e)))
+            self.root.after(0, lambda: self.status_var.set("Deduplication failed"))
+            raise
+        finally:
+            self.root.after(0, window.close)
+        
+        reclaimed = format_size(report["reclaimed"] + report["collected_bytes"])
+        summary = (f"Environments processed: {report['environments']}\n"
+                   f"Files replaced by links: {report['linked']:,}\n"
+                   f"Files added to the store: {report['adopted']:,}\n"
+                   f"Unused stored files removed: {report['collected']:,}\n"
+                   f"Disk space reclaimed: {reclaimed}\n"
+                   f"Package store size: {format_size(report['store_bytes'])}")
+        if report["skipped"]:
+            summary += f"\n\nSkipped (other filesystem or errors): {len(report['skipped'])}"
+        cancelled = " (cancelled)" if cancel_event.is_set() else ""
+        self.root.after(0, lambda: messagebox.showinfo("Deduplication Complete" + cancelled, summary))
+        self.root.after(0, lambda: self.status_var.set(f"Deduplication reclaimed {reclaimed}{cancelled}"))
+    
+    def clear_resolution_cache(self):
+        """Forget all cached pinned resolutions so the next installs resolve fresh"""
+        count = len(self.resolution_cache.entries)
+        if not messagebox.askyesno("Clear Resolution Cache",
+                                   f"Forget {count} cached resolutions? Later installs will run pip's resolver again."):
+            return
+        self.resolution_cache.invalidate()
+        self.status_var.set(f"Cleared {count} cached resolutions")
+    
+    def populate_wheelhouse(self):
+        """Pre-populate the wheelhouse from a requirements file"""
+        requirements_file = filedialog.askopenfilename(
+            title="Select Requirements File",
+            filetypes=[("Requirements", "*.txt"), ("All files", "*.*")]
+        )
+        if not requirements_file:
+            return
+        self.jobs.submit(f"Populate wheelhouse from {os.path.basename(requirements_file)}",
+                         lambda job: self._populate_wheelhouse_thread(requirements_file, job))
+    
+    def _populate_wheelhouse_thread(self, requirements_file, job=None):
+        """Job function to build wheels for a requirements file"""
+        stream = ProcessStream(on_line=self.log_pane.write)
+        stream.message = "Building wheels into the wheelhouse"
+        if job is not None:
+            job.on_cancel(stream.cancel)
+        self.root.after(0, lambda: self._track_process(stream, "Wheelhouse"))
+        try:
+            added = self.wheelhouse.populate(self.settings["python_path"], requirements_file, run=stream.run)
+            count = len(self.wheelhouse.projects())
+            self.root.after(0, lambda: self.status_var.set(
+                f"Wheelhouse updated: {count} projects available offline ({added} new wheels)"))
+        except subprocess.CalledProcessError as e:
+            error_msg = f"Could not build wheels: {e}\n{e.stderr}"
+            self.root.after(0, lambda: messagebox.showerror("Wheelhouse Error", error_msg))
+            self.root.after(0, lambda: self.status_var.set("Wheelhouse update failed"))
+            raise
+        except CopyCancelled:
+            self.root.after(0, lambda: self.status_var.set("Wheelhouse update cancelled"))
+            raise
         except Exception as e:
-            self.stop_loading()
-            self.status_var.set(f"Error: {str(e)}")
-            messagebox.showerror("Activation Error", f"Failed to activate environment: {str(e)}")
+            self.root.after(0, lambda: messagebox.showerror("Wheelhouse Error", str(e)))
+            self.root.after(0, lambda: self.status_var.set("Wheelhouse update failed"))
+            raise
+        finally:
+            stream.finished = True
     
-    def show_create_dialog(self):
-        """Show dialog to create a new virtual environment"""
-        create_window = tk.Toplevel(self.root)
-        create_window.title("Create New Virtual Environment")
-        create_window.geometry("450x300")
-        create_window.transient(self.root)
-        create_window.grab_set()
+    def _jobs_changed(self):
+        """Schedule a Jobs panel refresh (called from worker threads)"""
+        if self.jobs_refresh_scheduled:
+            return
+        self.jobs_refresh_scheduled = True
+        self.root.after(100, self.refresh_jobs_panel)
+    
+    def refresh_jobs_panel(self):
+        """Redraw the Jobs panel; ticks every second while jobs are running"""
+        self.jobs_refresh_scheduled = False
+        if getattr(self, "jobs_tree", None) is None:
+            return
+        selected = self.jobs_tree.selection()
+        jobs = self.jobs.jobs()
+        self.jobs_tree.delete(*self.jobs_tree.get_children())
+        for job in jobs:
+            duration = job.duration()
+            self.jobs_tree.insert("", tk.END, iid=str(job.id), text=job.title, values=(
+                job.state,
+                format_duration(duration) if duration is not None else "",
+                job.error
+            ))
+        if selected and self.jobs_tree.exists(selected[0]):
+            self.jobs_tree.selection_set(selected[0])
+        if any(job.state == Job.RUNNING for job in jobs) and not self.jobs_refresh_scheduled:
+            self.jobs_refresh_scheduled = True
+            self.root.after(1000, self.refresh_jobs_panel)
+    
+    def cancel_selected_job(self):
+        """Cancel the job selected in the Jobs panel"""
+        selected = self.jobs_tree.selection()
+        if not selected:
+            messagebox.showinfo("Selection Required", "Please select a job to cancel")
+            return
+        for job in self.jobs.jobs():
+            if str(job.id) == selected[0]:
+                self.jobs.cancel(job)
+                self.status_var.set(f"Cancelling '{job.title}'")
+                return
+    
+    def show_packages(self):
+        """Show the packages installed in the selected environment"""
+        record = self.env_view.selected_record()
+        if record is None:
+            messagebox.showinfo("Selection Required", "Please select a virtual environment to view its packages")
+            return
         
-        frame = ttk.Frame(create_window, padding=10)
-        frame.pack(fill=tk.BOTH, expand=True)
+        packages_window = tk.Toplevel(self.root)
+        packages_window.title(f"Packages - {record['name']}")
+        packages_window.geometry("650x450")
+        packages_window.transient(self.root)
         
-        # Environment name
-        ttk.Label(frame, text="Environment Name:").pack(anchor=tk.W, pady=(10, 5))
-        name_var = tk.StringVar()
-        name_entry = ttk.Entry(frame, textvariable=name_var, width=40)
-        name_entry.pack(fill=tk.X, padx=5, pady=5)
-        name_entry.focus()
+        frame = ttk.Frame(packages_window, padding=10)
+        frame.pack(fill=tk.BOTH, expand=True)
         
-        # Python version selection
-        ttk.Label(frame, text="Python Executable:").pack(anchor=tk.W, pady=(10, 5))
+        filter_frame = ttk.Frame(frame)
+        filter_frame.pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(filter_frame, text="Filter:").pack(side=tk.LEFT)
+        filter_var = tk.StringVar()
+        ttk.Entry(filter_frame, textvariable=filter_var).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
         
-        path_frame = ttk.Frame(frame)
-        path_frame.pack(fill=tk.X, pady=5)
+        tree_frame = ttk.Frame(frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True)
+        tree = ttk.Treeview(tree_frame, columns=("version", "files", "size", "summary"), selectmode="browse")
+        tree.heading("#0", text="Package", anchor=tk.W)
+        tree.heading("version", text="Version", anchor=tk.W)
+        tree.heading("files", text="Files", anchor=tk.E)
+        tree.heading("size", text="Size", anchor=tk.E)
+        tree.heading("summary", text="Summary", anchor=tk.W)
+        tree.column("#0", width=160)
+        tree.column("version", width=80, stretch=False)
+        tree.column("files", width=50, stretch=False, anchor=tk.E)
+        tree.column("size", width=70, stretch=False, anchor=tk.E)
+        tree.column("summary", width=260)
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
-        py_path_var = tk.StringVar(value=self.settings["python_path"])
-        py_entry = ttk.Entry(path_frame, textvariable=py_path_var, width=40)
-        py_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        summary_var = tk.StringVar(value="Reading installed packages...")
+        ttk.Label(frame, textvariable=summary_var, anchor=tk.W).pack(fill=tk.X, pady=(5, 0))
         
-        ttk.Button(
-            path_frame,
-            text="Browse",
-            command=lambda: self.browse_file(py_path_var, [("Python", "python.exe"), ("All files", "*.*")])
+        btn_frame = ttk.Frame(frame)
+        btn_frame.pack(fill=tk.X, pady=(5, 0))
+        tk.Button(
+            btn_frame,
+            text="Sync to Requirements...",
+            command=lambda: self.sync_environment(record),
+            bg=self.colors["secondary"],
+            fg="white",
+            relief=tk.RAISED,
+            padx=10
+        ).pack(side=tk.RIGHT, padx=5)
+        tk.Button(
+            btn_frame,
+            text="Snapshots...",
+            command=lambda: self.show_snapshots(record),
+            bg=self.colors["background"],
+            fg=self.colors["text"],
+            relief=tk.RAISED,
+            padx=10
         ).pack(side=tk.RIGHT, padx=5)
         
-        # Packages to install
-        ttk.Label(frame, text="Packages to Install (space separated):").pack(anchor=tk.W, pady=(10, 5))
-        packages_var = tk.StringVar()
-        packages_entry = ttk.Entry(frame, textvariable=packages_var, width=40)
-        packages_entry.pack(fill=tk.X, padx=5, pady=5)
+        state = {"packages": []}
         
-        # Options
-        options_frame = ttk.Frame(frame)
-        options_frame.pack(fill=tk.X, pady=10)
+        def populate(*_):
+            needle = filter_var.get().strip().lower()
+            tree.delete(*tree.get_children())
+            shown = [p for p in state["packages"] if needle in p["name"].lower()]
+            for info in shown:
+                tree.insert("", tk.END, text=info["name"], values=(
+                    info["version"], info["files"], format_size(info["size"]), info["summary"]))
+            total = sum(info["size"] for info in state["packages"])
+            summary_var.set(f"{len(shown)} of {len(state['packages'])} packages, {format_size(total)} installed")
+        filter_var.trace_add("write", populate)
         
-        system_site_var = tk.BooleanVar(value=False)
-        ttk.Checkbutton(
-            options_frame, 
-            text="System site packages", 
-            variable=system_site_var
-        ).pack(side=tk.LEFT, padx=5)
+        def load():
+            try:
+                packages = self.package_inventory.get(record["path"])
+                self.package_inventory.save()
+            except Exception as e:
+                error_msg = f"Could not read packages: {e}"
+                self.root.after(0, lambda: summary_var.set(error_msg))
+                return
+            def show():
+                state["packages"] = packages
+                try:
+                    populate()
+                except tk.TclError:
+                    pass  # window closed while loading
+            self.root.after(0, show)
+        threading.Thread(target=load, daemon=True).start()
+    
+    def sync_package_index(self, then=None):
+        """Update the package index for the listed environments in the background
+
+        then() is called on the main thread once the index is current.
+        """
+        if self.index_sync_running:
+            # Coalesce; the follow-up sync picks up whatever changed meanwhile
+            self.index_sync_pending = True
+            if then is not None:
+                self.root.after(200, lambda: self.sync_package_index(then))
+            return
+        self.index_sync_running = True
+        env_paths = [record["path"] for record in self.env_model.records]
         
-        no_pip_var = tk.BooleanVar(value=False)
-        ttk.Checkbutton(
-            options_frame, 
-            text="Without pip", 
-            variable=no_pip_var
-        ).pack(side=tk.LEFT, padx=5)
+        def sync():
+            try:
+                self.package_index.sync(self.package_inventory, env_paths)
+            except Exception as e:
+                print(f"Error updating package index: {e}")
+            self.root.after(0, finish)
+        
+        def finish():
+            self.index_sync_running = False
+            if then is not None:
+                then()
+            if self.index_sync_pending:
+                self.index_sync_pending = False
+                self.sync_package_index()
+        threading.Thread(target=sync, daemon=True).start()
+    
+    def search_packages(self, event=None):
+        """Search every environment for packages matching the query"""
+        query = self.package_query_var.get().strip()
+        if not query:
+            return
+        try:
+            parse_package_query(query)
+        except ValueError as e:
+            self.search_status_var.set(str(e))
+            return
+        if not self.package_index.by_env:
+            self.search_status_var.set(f"Indexing {len(self.env_model.records):,} environments...")
+        self.sync_package_index(lambda: self._show_package_matches(query))
+    
+    def _show_package_matches(self, query):
+        """Run a query against the (current) index and show the results"""
+        started = time.perf_counter()
+        matches = self.package_index.search(query)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        names = {record["path"]: record["name"] for record in self.env_model.records}
+        
+        self.search_tree.delete(*self.search_tree.get_children())
+        for name, version, env_path in matches:
+            self.search_tree.insert("", tk.END, text=names.get(env_path, os.path.basename(env_path)),
+                                    values=(name, version, os.path.dirname(env_path)))
+        env_count = len({env_path for _name, _version, env_path in matches})
+        self.search_status_var.set(f"{len(matches):,} matches in {env_count:,} of "
+                                   f"{len(self.package_index.by_env):,} environments ({elapsed_ms:.1f} ms)")
+    
+    def sync_environment(self, record=None):
+        """Sync an environment to a requirements or lock file, installing only the differences"""
+        record = record or self.env_view.selected_record()
+        if record is None:
+            messagebox.showinfo("Selection Required", "Please select a virtual environment to sync")
+            return
+        requirements_file = filedialog.askopenfilename(
+            title=f"Sync '{record['name']}' to Requirements",
+            filetypes=[("Requirements", "*.txt *.lock *.in"), ("All files", "*.*")]
+        )
+        if not requirements_file:
+            return
+        self.jobs.submit(f"Plan sync of '{record['name']}'",
+                         lambda job: self._plan_sync_thread(record, requirements_file, job),
+                         envs=[record["path"]])
+        self.status_var.set(f"Comparing '{record['name']}' with {os.path.basename(requirements_file)}...")
+    
+    def _sync_pip_args(self, plan):
+        """Return the pip install arguments for a sync plan's installs, changes and direct references"""
+        args = plan["install"] + [requirement for requirement, _old in plan["change"]]
+        for requirement in plan["direct"]:
+            editable = re.match(r"(?:-e|--editable)[\s=]+(.+)$", requirement)
+            args += ["-e", editable.group(1).strip()] if editable else [requirement]
+        return args
+    
+    def _plan_sync_thread(self, record, requirements_file, job=None):
+        """Job function that diffs the environment and dry-runs the install to estimate downloads"""
+        env_path = record["path"]
+        try:
+            requirements = parse_requirements_file(requirements_file)
+            packages = self.package_inventory.get(env_path)
+            environment = marker_environment(env_path)
+            direct_names = direct_requirement_names(requirements, env_path, os.path.dirname(requirements_file))
+            plan = plan_sync(requirements, packages, environment, direct_names)
+        except Exception as e:
+            error_msg = f"Could not compare with {requirements_file}: {e}"
+            self.root.after(0, lambda: messagebox.showerror("Sync Error", error_msg))
+            raise
+        
+        plan["resolved"], plan["download"], plan["note"] = [], None, ""
+        pip_args = self._sync_pip_args(plan)
+        if pip_args:
+            pip_path = os.path.join(env_scripts_dir(env_path), "pip.exe" if os.name == "nt" else "pip")
+            if version_tuple(installed_version(env_path, "pip")) < REPORT_PIP:
+                plan["note"] = "pip in this environment is too old for a dry run (22.2+ needed)"
+            else:
+                stream = ProcessStream(on_line=self.log_pane.write)
+                if job is not None:
+                    job.on_cancel(stream.cancel)
+                try:
+                    plan["resolved"], plan["download"], dists = estimate_download_size(
+                        pip_path, pip_args, find_links=self.wheelhouse.path,
+                        run=lambda cmd: stream.run(cmd, cwd=os.path.dirname(requirements_file)))
+                    # Removals as they will be once pip installed the resolved versions, whose
+                    # dependencies may differ, and the direct requirements it resolved by name
+                    for dist in dists:
+                        if dist["direct"]:
+                            direct_names.setdefault(canonical_name(dist["name"]), set()).update(dist["extras"])
+                    plan["remove"] = sync_removals(plan["remove"], requirements, packages + dists, environment,
+                                                   direct_names)
+                except subprocess.CalledProcessError as e:
+                    output = (e.stderr or "").strip().splitlines()
+                    plan["note"] = "Dry run failed: " + (output[-1] if output else str(e))
+                finally:
+                    stream.finished = True
+        self.root.after(0, lambda: self._show_sync_plan(record, requirements_file, plan))
+    
+    def _show_sync_plan(self, record, requirements_file, plan):
+        """Show the dry-run summary of a sync and let the user apply it"""
+        pip_args = self._sync_pip_args(plan)
+        if not pip_args and not plan["remove"]:
+            self.status_var.set(f"'{record['name']}' is already in sync with {os.path.basename(requirements_file)}")
+            messagebox.showinfo("Already in Sync", f"'{record['name']}' already matches {os.path.basename(requirements_file)}")
+            return
+        
+        lines = [f"Environment: {record['name']}", f"Target: {requirements_file}", ""]
+        if plan["install"]:
+            lines += [f"Install ({len(plan['install'])}):"] + [f"  + {r}" for r in plan["install"]] + [""]
+        if plan["change"]:
+            lines += [f"Upgrade/downgrade ({len(plan['change'])}):"]
+            lines += [f"  ~ {r}  (installed {old})" for r, old in plan["change"]] + [""]
+        if plan["direct"]:
+            lines += [f"Reinstall from URL/path ({len(plan['direct'])}):"] + [f"  * {r}" for r in plan["direct"]] + [""]
+        if plan["remove"]:
+            lines += [f"Uninstall ({len(plan['remove'])}):"] + [f"  - {name}" for name in plan["remove"]] + [""]
+        lines.append(f"Unchanged: {len(plan['unchanged'])}")
+        if plan["resolved"]:
+            lines.append(f"pip will install {len(plan['resolved'])} distributions including new dependencies")
+        if plan["download"] is not None:
+            lines.append(f"Estimated download: {format_size(plan['download'])}")
+        elif pip_args:
+            lines.append("Estimated download: unknown")
+        if plan["note"]:
+            lines.append(plan["note"])
+        
+        plan_window = tk.Toplevel(self.root)
+        plan_window.title(f"Sync '{record['name']}' - Dry Run")
+        plan_window.geometry("550x420")
+        plan_window.transient(self.root)
+        
+        frame = ttk.Frame(plan_window, padding=10)
+        frame.pack(fill=tk.BOTH, expand=True)
+        text = tk.Text(frame, wrap=tk.NONE, font=("Courier", 9), height=18)
+        text.insert("1.0", "\n".join(lines))
+        text.configure(state=tk.DISABLED)
+        text.pack(fill=tk.BOTH, expand=True)
         
-        # Buttons
         btn_frame = ttk.Frame(frame)
-        btn_frame.pack(fill=tk.X, pady=10, side=tk.BOTTOM)
+        btn_frame.pack(fill=tk.X, pady=(10, 0))
+        
+        def apply():
+            plan_window.destroy()
+            self.jobs.submit(f"Sync '{record['name']}'",
+                             lambda job: self._apply_sync_thread(record, requirements_file, plan, job),
+                             envs=[record["path"]])
         
         tk.Button(
             btn_frame,
-            text="Create",
+            text="Apply",
+            command=apply,
             bg=self.colors["primary"],
             fg="white",
             relief=tk.RAISED,
-            padx=10,
-            command=lambda: self.create_environment(
-                name_var.get().strip(),
-                py_path_var.get(),
-                packages_var.get(),
-                system_site_var.get(),
-                no_pip_var.get(),
-                create_window
-            )
+            padx=10
         ).pack(side=tk.RIGHT, padx=5)
-        
         tk.Button(
             btn_frame,
             text="Cancel",
-            command=create_window.destroy,
+            command=plan_window.destroy,
             bg=self.colors["background"],
             fg=self.colors["text"],
             relief=tk.RAISED,
             padx=10
         ).pack(side=tk.RIGHT, padx=5)
+        self.status_var.set(f"Review the sync plan for '{record['name']}'")
     
-    def create_environment(self, name, python_path, packages, system_site, no_pip, window):
-        """Create a new virtual environment"""
-        if not name:
-            messagebox.showerror("Error", "Please enter a name for the environment")
+    def _apply_sync_thread(self, record, requirements_file, plan, job=None):
+        """Job function that applies a sync plan: one pip install and one pip uninstall"""
+        env_path = record["path"]
+        name = record["name"]
+        pip_path = os.path.join(env_scripts_dir(env_path), "pip.exe" if os.name == "nt" else "pip")
+        stream = ProcessStream(on_line=self.log_pane.write)
+        if job is not None:
+            job.on_cancel(stream.cancel)
+        self.root.after(0, lambda: self._track_process(stream, "Syncing Environment"))
+        snapshot_id = None
+        try:
+            snapshot_id = self._snapshot_env(env_path, f"Before sync to {os.path.basename(requirements_file)}")
+            pip_args = self._sync_pip_args(plan)
+            if pip_args:
+                self.wheelhouse.install([pip_path], pip_args, run=lambda cmd: stream.run(
+                    cmd, f"Installing changes in '{name}'", PipProgress(len(pip_args)),
+                    cwd=os.path.dirname(requirements_file)))
+            remove = plan["remove"]
+            if remove:
+                # Decide from what is installed now: the new versions and direct requirements
+                # may depend on packages that looked unused before pip ran
+                self.package_inventory.forget([env_path])
+                requirements = parse_requirements_file(requirements_file)
+                remove = sync_removals(remove, requirements, self.package_inventory.get(env_path),
+                                       marker_environment(env_path),
+                                       direct_requirement_names(requirements, env_path, os.path.dirname(requirements_file)))
+                kept = len(plan["remove"]) - len(remove)
+                if kept:
+                    stream.on_line(f"Keeping {kept} planned removals that the installed packages now depend on")
+            if remove:
+                stream.run([pip_path, "uninstall", "-y"] + remove, f"Removing packages from '{name}'")
+            summary = (f"'{name}' synced: {len(plan['install'])} installed, {len(plan['change'])} changed, "
+                       f"{len(remove)} removed")
+            self.root.after(0, lambda: self.status_var.set(summary))
+        except subprocess.CalledProcessError as e:
+            rolled_back = self._roll_back_env(env_path, snapshot_id)
+            error_msg = f"Sync failed: {e}\n{e.stderr}"
+            if rolled_back:
+                error_msg += "\n\nThe environment was rolled back to its state before the sync."
+            self.root.after(0, lambda: messagebox.showerror("Sync Failed", error_msg))
+            self.root.after(0, lambda: self.status_var.set(f"Sync of '{name}' failed"))
+            raise
+        except CopyCancelled:
+            self._roll_back_env(env_path, snapshot_id)
+            self.root.after(0, lambda: self.status_var.set(f"Sync of '{name}' cancelled"))
+            raise
+        finally:
+            stream.finished = True
+            self.root.after(0, self.sync_package_index)
+            self.root.after(0, lambda: self.measure_disk_usage([env_path]))
+    
+    def env_snapshots(self, env_path):
+        """Return an environment's snapshots; removed snapshot folders go to the trash"""
+        def discard(path):
+            if os.path.lexists(path):
+                self.trash.move_to_trash(path, os.path.dirname(env_path))
+        return EnvSnapshots(env_path, discard=discard)
+    
+    def _snapshot_env(self, env_path, label):
+        """Snapshot an environment before changing its packages; returns the id or None"""
+        keep = int(self.settings.get("snapshot_retention", 3))
+        if keep <= 0:
+            return None
+        snapshots = self.env_snapshots(env_path)
+        try:
+            snapshot_id = snapshots.take(label)
+            snapshots.prune(keep)
+        except Exception as e:
+            # Not being able to snapshot shouldn't stop the operation itself
+            print(f"Could not snapshot {env_path}: {e}")
+            return None
+        self.log_pane.write(f"Snapshot taken: {label}")
+        return snapshot_id
+    
+    def _roll_back_env(self, env_path, snapshot_id):
+        """Restore the snapshot taken before a failed package operation; returns True on success"""
+        if snapshot_id is None:
+            return False
+        try:
+            self.env_snapshots(env_path).restore(snapshot_id, keep_current=False)
+        except Exception as e:
+            self.log_pane.write(f"Could not roll back '{os.path.basename(env_path)}': {e}")
+            return False
+        self.package_inventory.forget([env_path])
+        self.log_pane.write(f"Rolled '{os.path.basename(env_path)}' back to its state before the failed operation")
+        return True
+    
+    def show_snapshots(self, record=None):
+        """Show an environment's snapshots with their disk usage, and take or roll back to one"""
+        record = record or self.env_view.selected_record()
+        if record is None:
+            messagebox.showinfo("Selection Required", "Please select a virtual environment to view its snapshots")
             return
+        env_path = record["path"]
         
-        # Check if environment already exists
-        env_path = os.path.join(self.venv_dir, name)
-        if os.path.exists(env_path):
-            messagebox.showerror("Error", f"Environment '{name}' already exists")
-            return
+        snapshots_window = tk.Toplevel(self.root)
+        snapshots_window.title(f"Snapshots - {record['name']}")
+        snapshots_window.geometry("600x350")
+        snapshots_window.transient(self.root)
         
-        # Build command
-        cmd = [python_path, "-m", "venv"]
+        frame = ttk.Frame(snapshots_window, padding=10)
+        frame.pack(fill=tk.BOTH, expand=True)
         
-        if system_site:
-            cmd.append("--system-site-packages")
-            
-        if no_pip:
-            cmd.append("--without-pip")
-            
-        cmd.append(env_path)
+        tree_frame = ttk.Frame(frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True)
+        tree = ttk.Treeview(tree_frame, columns=("created", "size", "exclusive"), selectmode="browse")
+        tree.heading("#0", text="Snapshot", anchor=tk.W)
+        tree.heading("created", text="Created", anchor=tk.W)
+        tree.heading("size", text="Size", anchor=tk.E)
+        tree.heading("exclusive", text="Exclusive", anchor=tk.E)
+        tree.column("#0", width=250)
+        tree.column("created", width=130, stretch=False)
+        tree.column("size", width=80, stretch=False, anchor=tk.E)
+        tree.column("exclusive", width=80, stretch=False, anchor=tk.E)
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
-        # Close the window
-        window.destroy()
+        summary_var = tk.StringVar(value="Reading snapshots...")
+        ttk.Label(frame, textvariable=summary_var, anchor=tk.W).pack(fill=tk.X, pady=(5, 0))
+        
+        def load():
+            try:
+                snapshots = self.env_snapshots(env_path)
+                listed = snapshots.list()
+                sizes, total = snapshots.usage()
+            except Exception as e:
+                error_msg = f"Could not read snapshots: {e}"
+                self.root.after(0, lambda: summary_var.set(error_msg))
+                return
+            def show():
+                try:
+                    tree.delete(*tree.get_children())
+                    for meta in listed:
+                        size, exclusive = sizes.get(meta["id"], (0, 0))
+                        created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(meta.get("created", 0)))
+                        tree.insert("", tk.END, iid=meta["id"], text=meta.get("label", meta["id"]),
+                                    values=(created, format_size(size), format_size(exclusive)))
+                    summary_var.set(f"{len(listed)} snapshots using {format_size(total)} of extra disk space "
+                                    f"(keeping {self.settings.get('snapshot_retention', 3)} per environment)")
+                except tk.TclError:
+                    pass  # window closed while loading
+            self.root.after(0, show)
+        
+        def reload(_job=None):
+            threading.Thread(target=load, daemon=True).start()
+        
+        def run_job(title, func):
+            def job_func(job):
+                try:
+                    func()
+                except Exception as e:
+                    error_msg = f"{title} failed: {e}"
+                    self.root.after(0, lambda: messagebox.showerror("Snapshot Error", error_msg))
+                    raise
+                self.root.after(0, lambda: self.status_var.set(f"{title} finished"))
+            self.jobs.submit(title, job_func, envs=[env_path], on_done=lambda job: self.root.after(0, reload))
+            self.status_var.set(f"{title}...")
         
-        # Start creation in a separate thread
-        threading.Thread(target=self._create_env_thread, args=(cmd, name, packages)).start()
+        def take():
+            label = simpledialog.askstring("Take Snapshot", "Label for the snapshot:",
+                                           initialvalue="Manual snapshot", parent=snapshots_window)
+            if label:
+                run_job(f"Snapshot '{record['name']}'", lambda: self.env_snapshots(env_path).take(label))
+        
+        def roll_back():
+            selection = tree.selection()
+            if not selection:
+                messagebox.showinfo("Selection Required", "Please select a snapshot to roll back to",
+                                    parent=snapshots_window)
+                return
+            if not messagebox.askyesno("Roll Back",
+                                       f"Roll '{record['name']}' back to '{tree.item(selection[0], 'text')}'?\n\n"
+                                       "The current packages are kept as a new snapshot.",
+                                       parent=snapshots_window):
+                return
+            def restore():
+                self.env_snapshots(env_path).restore(selection[0])
+                self.package_inventory.forget([env_path])
+                self.root.after(0, self.sync_package_index)
+            run_job(f"Roll back '{record['name']}'", restore)
+        
+        def delete():
+            selection = tree.selection()
+            if selection:
+                run_job(f"Delete snapshot of '{record['name']}'",
+                        lambda: self.env_snapshots(env_path).delete(selection[0]))
+        
+        btn_frame = ttk.Frame(frame)
+        btn_frame.pack(fill=tk.X, pady=(5, 0))
+        for text, command, bg in (("Delete", delete, self.colors["accent"]),
+                                  ("Roll Back", roll_back, self.colors["secondary"]),
+                                  ("Take Snapshot", take, self.colors["primary"])):
+            tk.Button(
+                btn_frame,
+                text=text,
+                command=command,
+                bg=bg,
+                fg="white",
+                relief=tk.RAISED,
+                padx=10
+            ).pack(side=tk.RIGHT, padx=5)
+        reload()
     
-    def _create_env_thread(self, cmd, name, packages):
-        """Thread function to create environment and install packages"""
-        self.show_loading(f"Creating environment '{name}'")
+    def find_env_path(self, name_or_path):
+        """Resolve an environment name from the list, or a directory path, to a path"""
+        for record in self.env_model.records:
+            if record["name"] == name_or_path:
+                return record["path"]
+        if os.path.isdir(name_or_path) and os.path.exists(os.path.join(name_or_path, "pyvenv.cfg")):
+            return os.path.abspath(name_or_path)
+        return None
+    
+    def clone_environment(self):
+        """Clone the selected environment into a new one"""
+        record = self.env_view.selected_record()
+        if record is None:
+            messagebox.showinfo("Selection Required", "Please select a virtual environment to clone")
+            return
+        
+        name = simpledialog.askstring("Clone Environment", f"Enter name for the clone of '{record['name']}':")
+        if not name:
+            return
+        
+        env_path = os.path.join(self.venv_dir, name)
+        if os.path.exists(env_path) or self.jobs.is_busy(env_path):
+            messagebox.showerror("Error", f"Environment '{name}' already exists")
+            return
         
+        template_path = record["path"]
+        self.jobs.submit(f"Clone '{record['name']}' as '{name}'",
+                         lambda job: self._clone_env_thread(template_path, env_path, name, job),
+                         envs=[template_path, env_path])
+    
+    def _clone_env_thread(self, template_path, env_path, name, job=None):
+        """Job function to clone an environment"""
         try:
-            # Create the environment
-            subprocess.run(cmd, check=True, capture_output=True, text=True)
-            
-            # Install packages if specified
-            if packages.strip():
-                self.status_var.set(f"Installing packages in '{name}'...")
-                
-                # Get pip path
-                if os.name == "nt":
-                    pip_path = os.path.join(self.venv_dir, name, "Scripts", "pip.exe")
-                else:
-                    pip_path = os.path.join(self.venv_dir, name, "bin", "pip")
-                
-                package_list = packages.split()
-                pip_cmd = [pip_path, "install"] + package_list
-                
-                process = subprocess.run(pip_cmd, check=True, capture_output=True, text=True)
-            
-            self.root.after(0, lambda: self.status_var.set(f"Environment '{name}' created successfully"))
+            self._clone_env(template_path, env_path, name, job)
+            self.root.after(0, lambda: self.status_var.set(f"Environment cloned as '{name}'"))
             self.root.after(0, self.refresh_env_list)
-            
-        except subprocess.CalledProcessError as e:
-            error_msg = f"Error creating environment: {e}\n{e.stderr}"
-            self.root.after(0, lambda: messagebox.showerror("Creation Failed", error_msg))
-            self.root.after(0, lambda: self.status_var.set("Environment creation failed"))
+        except CopyCancelled:
+            self.root.after(0, lambda: self.status_var.set(f"Clone '{name}' cancelled"))
+            raise
         except Exception as e:
-            self.root.after(0, lambda: messagebox.showerror("Error", str(e)))
-            self.root.after(0, lambda: self.status_var.set("Environment creation failed"))
+            self.root.after(0, lambda: messagebox.showerror("Clone Failed", str(e)))
+            self.root.after(0, lambda: self.status_var.set("Environment clone failed"))
+            raise
+    
+    def _clone_env(self, template_path, env_path, name, job=None):
+        """Copy template_path to env_path, linking site-packages, and fix up its paths
+
+        Runs on a worker thread. site-packages files are reflinked or
+        hardlinked; later installs in either environment leave the other
+        alone (see TreeCopier).
+        """
+        copier = TreeCopier(template_path, env_path, link=in_site_packages, exclude=(".env_settings",))
+        if job is not None:
+            job.on_cancel(copier.cancel)
+        self.root.after(0, lambda: self._track_copy(copier, f"Cloning into '{name}'"))
+        try:
+            copier.plan()
+            copier.run()
+            relocate_env(env_path, detect_env_origin(template_path) or template_path)
+        except BaseException:
+            self._discard_partial(env_path)
+            raise
         finally:
-            self.stop_loading()
+            copier.finished = True
+        return copier
     
     def browse_file(self, var, filetypes):
         """Browse for a file and update the variable"""
@@ -835,8 +6839,9 @@ class VirtualEnvManager:
         if filename:
             var.set(filename)
     
-    def browse_python_executable(self):
+    def browse_python_executable(self, var=None):
         """Browse for Python executable"""
+        var = var or self.python_path_var
         if os.name == "nt":
             filetypes = [("Python", "python.exe"), ("All files", "*.*")]
         else:
@@ -844,7 +6849,46 @@ class VirtualEnvManager:
             
         filename = filedialog.askopenfilename(filetypes=filetypes)
         if filename:
-            self.python_path_var.set(filename)
+            # Remember it in the interpreter list; the probe runs in the background
+            threading.Thread(target=self.interpreters.add, args=(filename,), daemon=True).start()
+            var.set(filename)
+    
+    def _interpreter_combobox(self, parent, var, width):
+        """Return a combobox listing the known interpreters, filled from the cache at once
+
+        The list is refreshed in the background, which only probes interpreters
+        that are new or changed since the last time.
+        """
+        combobox = ttk.Combobox(parent, textvariable=var, width=width)
+        choices = {}
+        
+        def fill(interpreters):
+            choices.clear()
+            for entry in interpreters:
+                choices[f"{entry['path']}  ({InterpreterRegistry.describe(entry)})"] = entry["path"]
+            try:
+                combobox.configure(values=list(choices))
+            except tk.TclError:
+                pass  # dialog closed meanwhile
+        
+        def select(event=None):
+            # Show only the path once an interpreter is picked
+            path = choices.get(var.get())
+            if path:
+                var.set(path)
+        
+        def refresh():
+            try:
+                interpreters = self.interpreters.refresh()
+            except Exception as e:
+                print(f"Error discovering interpreters: {e}")
+                return
+            self.root.after(0, lambda: fill(interpreters))
+        
+        combobox.bind("<<ComboboxSelected>>", select)
+        fill(self.interpreters.interpreters())
+        threading.Thread(target=refresh, daemon=True).start()
+        return combobox
     
     def import_environment(self):
         """Import an existing virtual environment"""
@@ -859,22 +6903,60 @@ class VirtualEnvManager:
             
         # Check if environment already exists
         target_dir = os.path.join(self.venv_dir, name)
-        if os.path.exists(target_dir):
+        if os.path.exists(target_dir) or self.jobs.is_busy(target_dir):
             messagebox.showerror("Error", f"Environment '{name}' already exists")
             return
+        
+        # On the same filesystem the environment can be moved with a single rename
+        move = False
+        try:
+            same_device = os.stat(source_dir).st_dev == os.stat(self.venv_dir).st_dev
+        except OSError:
+            same_device = False
+        if same_device:
+            choice = messagebox.askyesnocancel(
+                "Move or Copy",
+                f"'{source_dir}' is on the same drive as your environments.\n\n"
+                "Move it instead of copying? Moving is instant, but the original location will no longer exist.\n\n"
+                "Yes = Move, No = Copy"
+            )
+            if choice is None:
+                return
+            move = choice
             
-        # Start import in a separate thread
-        threading.Thread(target=self._import_env_thread, args=(source_dir, target_dir, name)).start()
-    
-    def _import_env_thread(self, source_dir, target_dir, name):
-        """Thread function to import environment"""
-        # Always show loading from main thread
-        self.root.after(0, lambda: self.show_loading(f"Importing environment as '{name}'"))
-        try:
-            # Small delay to ensure loading animation appears
-            time.sleep(0.5)
-            # Copy the environment (this can take time for larger environments)
-            shutil.copytree(source_dir, target_dir)
+        # Start import as a job holding both the source and the target
+        self.jobs.submit(f"{'Move' if move else 'Import'} '{os.path.basename(source_dir)}' as '{name}'",
+                         lambda job: self._import_env_thread(source_dir, target_dir, name, move, job),
+                         envs=[source_dir, target_dir])
+    
+    def _import_env_thread(self, source_dir, target_dir, name, move=False, job=None):
+        """Job function to import environment"""
+        copier = None
+        try:
+            old_path = detect_env_origin(source_dir) or source_dir
+            if move:
+                self.root.after(0, lambda: self.status_var.set(f"Moving environment to '{name}'..."))
+                # Atomic rename, then patch only the files that embed the old path
+                os.rename(source_dir, target_dir)
+                try:
+                    relocate_env(target_dir, old_path)
+                except Exception:
+                    # Put the environment back where it was
+                    os.rename(target_dir, source_dir)
+                    relocate_env(source_dir, target_dir)
+                    raise
+            else:
+                # Copy the environment in parallel with a live progress dialog
+                copier = TreeCopier(source_dir, target_dir)
+                if job is not None:
+                    job.on_cancel(copier.cancel)
+                self.root.after(0, lambda: self._track_copy(copier, f"Importing environment as '{name}'"))
+                try:
+                    copier.plan()
+                    copier.run()
+                finally:
+                    copier.finished = True
+                relocate_env(target_dir, old_path)
             
             # Find main Python file if exists (common names)
             main_file = None
@@ -896,84 +6978,131 @@ class VirtualEnvManager:
                 with open(os.path.join(env_settings_dir, "settings.json"), 'w') as f:
                     json.dump(env_settings, f)
             
-            # Stop loading and update UI in the main thread
-            self.root.after(0, self.stop_loading)
-            self.root.after(0, lambda: self.status_var.set(f"Environment imported as '{name}'"))
+            # Update UI in the main thread
+            self.root.after(0, lambda: self.status_var.set(f"Environment {'moved' if move else 'imported'} as '{name}'"))
             self.root.after(0, self.refresh_env_list)
             
             # Ask if user wants to delete the original environment
-            self.root.after(100, lambda: self._ask_delete_original(source_dir, name))
+            if not move:
+                self.root.after(100, lambda: self._ask_delete_original(source_dir, name))
             
+        except CopyCancelled:
+            self._discard_partial(target_dir)
+            self.root.after(0, lambda: self.status_var.set(f"Import of '{name}' cancelled"))
+            raise
         except Exception as e:
-            self.root.after(0, self.stop_loading)
+            # Don't leave a half-copied environment behind
+            if copier is not None:
+                self._discard_partial(target_dir)
             self.root.after(0, lambda: messagebox.showerror("Import Failed", str(e)))
             self.root.after(0, lambda: self.status_var.set("Environment import failed"))
+            raise
+    
+    def _discard_partial(self, path):
+        """Throw away a partially created environment"""
+        try:
+            if os.path.lexists(path):
+                self.trash.move_to_trash(path, self.venv_dir)
+        except OSError:
+            shutil.rmtree(path, ignore_errors=True)
+    
+    def _track_copy(self, copier, message):
+        """Show a progress dialog for a TreeCopier and poll it until it finishes"""
+        window = ProgressWindow(self.root, "Copying", message, on_cancel=copier.cancel)
+        
+        def poll():
+            if copier.finished:
+                window.close()
+                return
+            progress = copier.snapshot()
+            if not progress["planned"]:
+                window.update(None, detail=f"Scanning... {len(copier.files):,} files found")
+            else:
+                total = progress["total_bytes"] or 1
+                files_left = progress["total_files"] - progress["copied_files"]
+                eta = format_duration(progress["eta"]) if progress["eta"] is not None else "--:--"
+                window.update(
+                    progress["copied_bytes"] / total,
+                    detail=(f"{format_size(progress['copied_bytes'])} of {format_size(progress['total_bytes'])}"
+                            f" at {format_size(progress['rate'])}/s\n"
+                            f"{files_left:,} files remaining, ETA {eta}")
+                )
+            self.root.after(250, poll)
+        poll()
         
+    def _track_process(self, stream, title):
+        """Show a progress dialog for a ProcessStream and poll it until it finishes"""
+        if stream.finished:
+            return
+        window = ProgressWindow(self.root, title, stream.message, on_cancel=stream.cancel)
+        
+        def poll():
+            if stream.finished:
+                window.close()
+                return
+            message, fraction, detail = stream.snapshot()
+            window.update(fraction, message=message, detail=detail[-60:])
+            self.root.after(150, poll)
+        poll()
+    
     def _ask_delete_original(self, source_dir, env_name):
         """Ask if user wants to delete the original environment after import"""
         if messagebox.askyesno("Delete Original", 
                                f"Environment '{env_name}' has been imported successfully. "
                                f"Do you want to delete the original environment at:\n{source_dir}?"):
-            # Show loading animation before starting deletion
-            self.root.after(0, lambda: self.show_loading(f"Deleting original environment at {source_dir}"))
-            
-            # Use a separate thread for deletion to keep UI responsive
-            threading.Thread(target=self._delete_original_thread, args=(source_dir, env_name)).start()
+            self.jobs.submit(f"Delete original of '{env_name}'",
+                             lambda job: self._delete_original_thread(source_dir, env_name),
+                             envs=[source_dir], priority=JobScheduler.HIGH)
     
     def _delete_original_thread(self, source_dir, env_name):
-        """Thread to delete original environment after import"""
+        """Job function to delete the original environment after import"""
         try:
-            # Small delay to ensure loading animation appears
-            time.sleep(0.5)
-            
-            # Delete the environment
-            shutil.rmtree(source_dir)
-            
-            self.root.after(0, self.stop_loading)
-            self.root.after(0, lambda: self.status_var.set(f"Original environment deleted. '{env_name}' imported successfully."))
+            # Renaming into trash is instant; the files are removed in the background
+            self.trash.move_to_trash(source_dir, self.venv_dir)
+            self.root.after(0, lambda: self.status_var.set(
+                f"Original environment deleted. '{env_name}' imported successfully."))
         except Exception as e:
-            self.root.after(0, self.stop_loading)
-            self.root.after(0, lambda: messagebox.showerror("Deletion Error", f"Could not delete original environment: {e}"))
-            self.root.after(0, lambda: self.status_var.set(f"Import successful, but could not delete original environment."))
+            error_msg = f"Could not delete original environment: {e}"
+            self.root.after(0, lambda: messagebox.showerror("Deletion Error", error_msg))
+            self.root.after(0, lambda: self.status_var.set(
+                f"Import successful, but could not delete original environment."))
+            raise
     
     def delete_environment(self):
         """Delete the selected environment"""
-        selection = self.env_listbox.curselection()
-        if not selection:
+        record = self.env_view.selected_record()
+        if record is None:
             messagebox.showinfo("Selection Required", "Please select a virtual environment to delete")
             return
             
-        selected_idx = selection[0]
-        env_name = self.envs[selected_idx]
+        env_name = record["name"]
+        env_path = record["path"]
         
         # Confirm deletion
         if not messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete '{env_name}'?"):
             return
-            
-        env_path = os.path.join(self.venv_dir, env_name)
         
-        # Start deletion in a separate thread
-        threading.Thread(target=self._delete_env_thread, args=(env_path, env_name)).start()
+        # The delete waits for any running job on this environment (e.g. its creation)
+        if self.jobs.is_busy(env_path):
+            self.status_var.set(f"Delete of '{env_name}' queued until its running operations finish")
+        self.jobs.submit(f"Delete '{env_name}'", lambda job: self._delete_env_thread(env_path, env_name),
+                         envs=[env_path], priority=JobScheduler.HIGH)
     
     def _delete_env_thread(self, env_path, env_name):
-        """Thread function to delete environment"""
-        # Always show loading from main thread
-        self.root.after(0, lambda: self.show_loading(f"Deleting environment '{env_name}'"))
+        """Job function to delete an environment"""
         try:
-            # Small delay to ensure loading animation appears
-            time.sleep(0.5)
-            
-            # Delete the environment
-            shutil.rmtree(env_path)
-            
-            self.root.after(0, self.stop_loading)
+            # Renaming into trash is instant; the files are removed in the background
+            self.trash.move_to_trash(env_path, self.venv_dir)
+            self.package_inventory.forget([env_path])
+            self.disk_usage.forget([env_path])
+            self.health.forget([env_path])
             self.root.after(0, lambda: self.status_var.set(f"Environment '{env_name}' deleted"))
             self.root.after(0, self.refresh_env_list)
-            
         except Exception as e:
-            self.root.after(0, self.stop_loading)
-            self.root.after(0, lambda: messagebox.showerror("Deletion Failed", str(e)))
+            error_msg = str(e)
+            self.root.after(0, lambda: messagebox.showerror("Deletion Failed", error_msg))
             self.root.after(0, lambda: self.status_var.set("Environment deletion failed"))
+            raise
     
     def change_venv_dir(self):
         """Change the directory where virtual environments are stored"""
@@ -992,6 +7121,9 @@ class VirtualEnvManager:
         if self.save_settings():
             self.status_var.set(f"Environment directory changed to {new_dir}")
             self.refresh_env_list()
+            self.start_env_watchers()
+            self.setup_spare_pool()
+            self.package_store = PackageStore(os.path.join(self.venv_dir, PackageStore.STORE_NAME))
               # Update the display in settings tab
             for child in self.root.winfo_children():
                 if isinstance(child, ttk.Notebook):
@@ -1002,12 +7134,82 @@ class VirtualEnvManager:
                                     if isinstance(label, ttk.Label) and self.venv_dir in str(label.cget("text")):
                                         label.config(text=self.venv_dir)
     
+    def populate_roots_listbox(self):
+        """Show the configured extra environment roots in the settings tab"""
+        self.roots_listbox.delete(0, tk.END)
+        for root in self.settings.get("env_roots", []):
+            ignore = " ".join(root.get("ignore", [])) or "none"
+            self.roots_listbox.insert(tk.END, f"{root['path']}  (depth {root.get('depth', 1)}, ignore: {ignore})")
+    
+    def add_env_root(self):
+        """Add a directory that is searched for environments in addition to venv_dir"""
+        path = filedialog.askdirectory(title="Select a Directory Containing Environments")
+        if not path:
+            return
+        
+        depth = simpledialog.askinteger(
+            "Search Depth",
+            "How many directory levels below this root should be searched?\n"
+            "(1 = direct children, 2 = e.g. project/.venv)",
+            initialvalue=1, minvalue=1, maxvalue=6
+        )
+        if depth is None:
+            return
+        
+        ignore = simpledialog.askstring(
+            "Ignore Patterns",
+            "Space separated name patterns to skip:",
+            initialvalue="node_modules .git __pycache__"
+        )
+        if ignore is None:
+            return
+        
+        self.settings.setdefault("env_roots", []).append({
+            "path": os.path.abspath(path),
+            "depth": depth,
+            "ignore": ignore.split()
+        })
+        self._env_roots_changed()
+    
+    def remove_env_root(self):
+        """Remove the selected extra environment root"""
+        selection = self.roots_listbox.curselection()
+        if not selection:
+            messagebox.showinfo("Selection Required", "Please select a root to remove")
+            return
+        del self.settings["env_roots"][selection[0]]
+        self._env_roots_changed()
+    
+    def _env_roots_changed(self):
+        """Persist the root list and rescan"""
+        self.populate_roots_listbox()
+        if self.save_settings():
+            self.refresh_env_list()
+            self.start_env_watchers()
+    
     def save_settings_from_ui(self):
         """Save settings from UI elements"""
         self.settings["python_path"] = self.python_path_var.get()
         self.settings["theme"] = self.theme_var.get()
+        try:
+            self.settings["spare_pool_size"] = max(0, int(self.spare_pool_size_var.get()))
+        except (tk.TclError, ValueError):
+            self.settings["spare_pool_size"] = 0
+        self.settings["spare_pool_presets"] = [p.strip() for p in self.spare_pool_presets_var.get().split(";") if p.strip()]
+        try:
+            self.settings["max_parallel_jobs"] = max(1, int(self.max_jobs_var.get()))
+        except (tk.TclError, ValueError):
+            self.settings["max_parallel_jobs"] = 4
+        self.jobs.resize(self.settings["max_parallel_jobs"])
+        try:
+            self.settings["snapshot_retention"] = max(0, int(self.snapshot_retention_var.get()))
+        except (tk.TclError, ValueError):
+            self.settings["snapshot_retention"] = 3
+        self.settings["wheelhouse_dir"] = self.wheelhouse_dir_var.get().strip() or default_wheelhouse_dir()
+        self.wheelhouse.path = self.settings["wheelhouse_dir"]
         
         if self.save_settings():
+            self.setup_spare_pool()
             messagebox.showinfo("Settings Saved", "Your settings have been saved successfully")
             self.status_var.set("Settings saved")
     
@@ -1080,7 +7282,46 @@ with an easy-to-use graphical interface.
         # 2. Run: pyinstaller --onefile --windowed --icon=icon.ico PyVenvManager.py
         # 3. The .exe will be in the 'dist' folder.
 
+def default_wheelhouse_dir():
+    """Return the default wheelhouse location next to settings.json"""
+    return os.path.join(os.path.expanduser("~"), ".pyenvmanager", "wheelhouse")
+
+
+def load_saved_settings():
+    """Read settings.json without starting the GUI (empty dict if missing)"""
+    try:
+        with open(os.path.join(os.path.expanduser("~"), ".pyenvmanager", "settings.json"), 'r') as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def run_cli(args):
+    """Handle command line actions that don't need the GUI; returns an exit code"""
+    settings = load_saved_settings()
+    if args.populate_wheelhouse:
+        wheelhouse = Wheelhouse(settings.get("wheelhouse_dir") or default_wheelhouse_dir())
+        python_path = args.python or settings.get("python_path") or sys.executable
+        try:
+            added = wheelhouse.populate(python_path, args.populate_wheelhouse)
+        except subprocess.CalledProcessError as e:
+            print(f"Could not build wheels: {e}\n{e.stderr}", file=sys.stderr)
+            return 1
+        print(f"Wheelhouse {wheelhouse.path}: {len(wheelhouse.projects())} projects "
+              f"({added} new wheels)")
+    return 0
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Python Virtual Environment Manager")
+    parser.add_argument("--populate-wheelhouse", metavar="REQUIREMENTS",
+                        help="build wheels for a requirements file into the wheelhouse and exit")
+    parser.add_argument("--python", help="interpreter used for command line actions")
+    args = parser.parse_args()
+    
+    if args.populate_wheelhouse:
+        sys.exit(run_cli(args))
+    
     root = tk.Tk()
     app = VirtualEnvManager(root)
     root.mainloop()
@@ -0,0 +1,94 @@
+"""Cold vs warm refresh benchmark for EnvIndex
+
+Creates N fake environments (bin/ plus pyvenv.cfg) in a temporary folder
+and times the original listdir + isdir/exists scan against an EnvIndex
+scan with an empty index (cold) and with a saved index (warm), both when the index is read from disk (app
+start) and when it is already in memory (later refreshes).
+
+    python benchmarks/bench_env_index.py [--envs 1500] [--root DIR] [--repeat 5]
+
+Pass --root to run against an existing folder (e.g. an NFS mount); the
+fake environments are then created inside it and removed afterwards.
+"""
+import argparse
+import importlib.util
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+spec = importlib.util.spec_from_file_location("PyVenvManager", os.path.join(HERE, "..", "PyVenvManager.py"))
+pvm = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(pvm)
+
+
+def make_envs(root, count):
+    for i in range(count):
+        env = os.path.join(root, f"env{i:05d}")
+        os.makedirs(os.path.join(env, "Scripts" if os.name == "nt" else "bin"))
+        with open(os.path.join(env, "pyvenv.cfg"), 'w') as f:
+            f.write("home = /usr/bin\nversion = 3.11.7\n")
+
+
+def legacy_scan(root):
+    """The scan refresh_env_list did before the index"""
+    envs = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if os.path.isdir(path) and os.path.exists(os.path.join(path, "Scripts" if os.name == "nt" else "bin")):
+            envs.append(name)
+    return envs
+
+
+def timed(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--envs", type=int, default=1500)
+    parser.add_argument("--root", help="folder to create the environments in (default: a temp folder)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(dir=args.root)
+    try:
+        root = os.path.join(work, "venvs")
+        os.makedirs(root)
+        make_envs(root, args.envs)
+        index_file = os.path.join(work, "env_index.json")
+
+        def cold():
+            if os.path.exists(index_file):
+                os.remove(index_file)
+            index = pvm.EnvIndex(index_file)
+            index.scan(root)
+            index.save()
+
+        def warm():
+            pvm.EnvIndex(index_file).scan(root)
+
+        loaded = pvm.EnvIndex(index_file)
+
+        legacy = timed(lambda: legacy_scan(root), args.repeat)
+        cold_ms = timed(cold, args.repeat)
+        warm_ms = timed(warm, args.repeat)
+        loaded_ms = timed(lambda: loaded.scan(root), args.repeat)
+        print(f"{args.envs} environments in {root}")
+        print(f"  legacy listdir + isdir/exists  {legacy:8.1f} ms")
+        print(f"  index cold (probe + write)     {cold_ms:8.1f} ms")
+        print(f"  index warm (load + stat)       {warm_ms:8.1f} ms")
+        print(f"  index warm, already loaded     {loaded_ms:8.1f} ms")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
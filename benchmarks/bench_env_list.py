@@ -0,0 +1,116 @@
+"""Render time and memory benchmark for the virtualized environment list
+
+For each size, a fresh process fills an EnvListModel with synthetic
+records and reports the model build time, a single-environment patch and
+the RSS growth. With a display available it also creates the
+VirtualEnvList and times the first draw, a redraw and scrolling through
+the list, and the RSS after drawing.
+
+    python benchmarks/bench_env_list.py [--sizes 1000 10000 50000]
+
+Without a display (e.g. over SSH without X forwarding) only the model
+numbers are reported; use xvfb-run to get the Tk numbers headless.
+"""
+import argparse
+import importlib.util
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_module():
+    spec = importlib.util.spec_from_file_location("PyVenvManager", os.path.join(HERE, "..", "PyVenvManager.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def rss_mib():
+    """Current resident set size in MiB (peak RSS where /proc is missing)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        return float("nan")
+
+
+def make_records(count):
+    return [{
+        "name": f"env{i:06d}", "root": "/venvs", "path": f"/venvs/env{i:06d}", "version": "3.11.7",
+        "mtime": i, "ino": i + 1, "dir": True, "valid": True,
+    } for i in range(count)]
+
+
+def ms(start):
+    return (time.perf_counter() - start) * 1000
+
+
+def run_single(count):
+    pvm = load_module()
+    base_rss = rss_mib()
+    records = make_records(count)
+
+    model = pvm.EnvListModel()
+    start = time.perf_counter()
+    model.update(records)
+    build = ms(start)
+    extra = dict(records[count // 2], path="/venvs/zz-new", name="zz-new", ino=0)
+    start = time.perf_counter()
+    model.patch([extra], [])
+    patch = ms(start)
+    model_rss = rss_mib() - base_rss
+    line = f"{count:>8,}  {build:9.1f} ms  {patch:7.2f} ms  {model_rss:8.1f} MiB"
+
+    try:
+        root = pvm.tk.Tk()
+    except pvm.tk.TclError:
+        print(line + "  (no display: Tk not measured)")
+        return
+    root.geometry("800x600")
+    view = pvm.VirtualEnvList(root, model, lambda: None)
+    view.pack(fill=pvm.tk.BOTH, expand=True)
+    start = time.perf_counter()
+    root.update()
+    view.on_resize()
+    root.update()
+    first = ms(start)
+    start = time.perf_counter()
+    view.redraw()
+    root.update_idletasks()
+    redraw = ms(start)
+    steps = 200
+    start = time.perf_counter()
+    for _ in range(steps):
+        view.scroll(1, "pages")
+        root.update_idletasks()
+    scroll = ms(start) / steps
+    tk_rss = rss_mib() - base_rss
+    root.destroy()
+    print(line + f"  {view.rows:4d}  {first:8.1f} ms  {redraw:6.2f} ms  {scroll:6.2f} ms  {tk_rss:8.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.single:
+        run_single(args.single)
+        return
+    print(" entries      build     patch  model RSS  rows    first draw  redraw  page scroll  total RSS")
+    for count in args.sizes:
+        # One process per size so RSS growth is not masked by earlier runs
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--single", str(count)], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Removals planned by a sync must never break what the requirements need"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from PyVenvManager import direct_requirement_names, plan_sync, sync_removals  # noqa: E402
+
+ENVIRONMENT = {
+    "python_version": "3.11", "python_full_version": "3.11.7", "os_name": "posix", "sys_platform": "linux",
+    "platform_system": "Linux", "platform_machine": "x86_64", "platform_release": "",
+    "implementation_name": "cpython", "platform_python_implementation": "CPython", "extra": "",
+}
+
+
+def dist(name, version, *requires):
+    return {"name": name, "version": version, "requires": list(requires)}
+
+
+class ExtrasTest(unittest.TestCase):
+    """A package reached again with new extras gets those extras' dependencies kept"""
+
+    PACKAGES = [
+        dist("app", "1.0", "requests[socks]"),
+        dist("requests", "2.31.0", "idna", 'PySocks!=1.5.7,>=1.5.6; extra == "socks"'),
+        dist("idna", "3.6"),
+        dist("PySocks", "1.7.1"),
+    ]
+
+    def test_extras_are_kept_in_either_order(self):
+        for requirements in (["app", "requests"], ["requests", "app"]):
+            plan = plan_sync(requirements, self.PACKAGES, ENVIRONMENT)
+            self.assertEqual(plan["remove"], [], requirements)
+
+    def test_unrequested_extra_is_removed(self):
+        plan = plan_sync(["requests"], self.PACKAGES, ENVIRONMENT)
+        self.assertEqual(plan["remove"], ["PySocks", "app"])
+
+
+class UpgradeTest(unittest.TestCase):
+    """A dependency the upgraded version newly needs survives the sync"""
+
+    BEFORE = [dist("foo", "1.0"), dist("bar", "1.0")]
+    AFTER = [dist("foo", "2.0", "bar>=1"), dist("bar", "1.0")]
+
+    def test_planned_removal_is_dropped_after_install(self):
+        plan = plan_sync(["foo==2"], self.BEFORE, ENVIRONMENT)
+        self.assertEqual(plan["change"], [("foo==2", "1.0")])
+        self.assertEqual(plan["remove"], ["bar"])
+        self.assertEqual(sync_removals(plan["remove"], ["foo==2"], self.AFTER, ENVIRONMENT), [])
+
+    def test_nothing_outside_the_plan_is_removed(self):
+        after = [dist("foo", "2.0"), dist("bar", "1.0"), dist("baz", "1.0")]
+        self.assertEqual(sync_removals(["bar"], ["foo==2"], after, ENVIRONMENT), ["bar"])
+
+
+class DirectRequirementTest(unittest.TestCase):
+    """Dependencies of -e . and other unnamed direct references are kept"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.project = os.path.join(self.tmp, "project")
+        os.makedirs(self.project)
+        self.env = os.path.join(self.tmp, "env")
+        site_packages = os.path.join(self.env, "lib", "python3.11", "site-packages")
+        dist_info = os.path.join(site_packages, "my_project-0.1.dist-info")
+        os.makedirs(dist_info)
+        with open(os.path.join(dist_info, "direct_url.json"), 'w') as f:
+            json.dump({"url": "file://" + self.project.replace(os.sep, "/"), "dir_info": {"editable": True}}, f)
+        self.packages = [dist("my-project", "0.1", "click", 'rich; extra == "fancy"'),
+                         dist("click", "8.1.7"), dist("rich", "13.7.0"), dist("unused", "1.0")]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    @unittest.skipIf(os.name == "nt", "file URL layout differs on Windows")
+    def test_editable_dependencies_are_kept(self):
+        requirements = ["-e .[fancy]"]
+        names = direct_requirement_names(requirements, self.env, self.project)
+        self.assertEqual(names, {"my-project": {"fancy"}})
+        plan = plan_sync(requirements, self.packages, ENVIRONMENT, names)
+        self.assertEqual(plan["remove"], ["unused"])
+        self.assertEqual(plan["direct"], ["-e .[fancy]"])
+
+    def test_unknown_direct_requirement_keeps_nothing_extra(self):
+        names = direct_requirement_names(["./elsewhere"], self.env, self.project)
+        self.assertEqual(names, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+"""version_matches() must agree with pip's vendored packaging (prereleases=True)"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from PyVenvManager import version_matches  # noqa: E402
+
+
+class ExclusiveOrderingTest(unittest.TestCase):
+    """> and < exclude post, local and pre-releases of the specifier's base release"""
+
+    def assertMatches(self, version, op, spec, expected):
+        self.assertEqual(version_matches(version, [(op, spec)]), expected, f"{version} {op}{spec}")
+
+    def test_greater_than_excludes_post_releases_of_the_same_release(self):
+        self.assertMatches("1.0.post1", ">", "1.0a1", False)
+        self.assertMatches("1.0.post1", ">", "1.0.dev0", False)
+        self.assertMatches("1.0.post1", ">", "1.0rc1", False)
+        self.assertMatches("1.0.post1", ">", "1.0", False)
+        self.assertMatches("1.0.post2", ">", "1.0.post1", True)
+        self.assertMatches("1.0", ">", "1.0a1", True)
+
+    def test_greater_than_excludes_local_versions_of_the_same_release(self):
+        self.assertMatches("1.0+local", ">", "1.0a1", False)
+        self.assertMatches("1.0+local", ">", "1.0", False)
+        self.assertMatches("1.0.post1+local", ">", "1.0.post1", False)
+        self.assertMatches("1.1+local", ">", "1.0", True)
+
+    def test_less_than_excludes_pre_releases_of_the_same_release(self):
+        self.assertMatches("1.0.post1.dev0", "<", "1.0.post1", False)
+        self.assertMatches("1.0a1", "<", "1.0", False)
+        self.assertMatches("1.0.dev0", "<", "1.0", False)
+        self.assertMatches("1.0a1", "<", "1.0b1", True)
+        self.assertMatches("0.9", "<", "1.0", True)
+        self.assertMatches("1.0", "<", "1.0.post1", True)
+
+    def test_compatible_release_compares_epochs(self):
+        self.assertMatches("1!1.0", "~=", "1.0", False)
+        self.assertMatches("1.0.5", "~=", "1.0.2", True)
+
+    def test_wildcard_only_after_release_segment(self):
+        self.assertMatches("1.0.post1", "==", "1.0.*", True)
+        self.assertMatches("1.0a1", "==", "1.0a1.*", False)
+
+
+if __name__ == "__main__":
+    unittest.main()